@@ -12,6 +12,10 @@ import os
 from typing import Optional
 from pydantic import BaseModel
 
+from common.instrumentation import Instrumentation
+from common.inference import CompiledPredictor, TFLitePredictor
+from common.quantize import served_variant
+
 app = FastAPI(title="AHRC Cervical Cancer Detection API")
 
 # CORS middleware
@@ -23,6 +27,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request/stage timings, served at /metrics
+metrics = Instrumentation("cervic")
+metrics.install(app)
+
 def create_inception_cancer_model():
     """Recreate the InceptionV3-based cancer detection model"""
     
@@ -82,15 +90,33 @@ def load_model_safe(weights_path):
     )
     return model
 
+MODEL_PATH = "model_iv3.h5"
+# "float32" serves the Keras graph; float16, dynamic or int8 serve the TFLite
+# export model_iv3_<variant>.tflite written by quantize_model.py
+MODEL_VARIANT = os.environ.get("CERVIC_MODEL_VARIANT", "float32")
+# Checked outside the try below: a bad setting must stop the service, not
+# leave it running without a model
+TFLITE_PATH = served_variant(MODEL_PATH, MODEL_VARIANT)
+
 # Load model at startup
 print("Loading cancer detection model...")
 try:
    # model = load_model_safe("model_iv3.h5")
-    model = load_model("model_iv3.h5") 
+    with metrics.model_loading("inception_v3"):
+        model = load_model(MODEL_PATH) 
     print("Model loaded successfully!")
+    # One image per request: trace a (1, 299, 299, 3) graph and warm it up before serving
+    with metrics.model_loading("inception_v3_warmup"):
+        if TFLITE_PATH is None:
+            predictor = CompiledPredictor(model, batch_size=1, input_shape=(299, 299, 3))
+        else:
+            predictor = TFLitePredictor(TFLITE_PATH)
+            print(f"Serving the {MODEL_VARIANT} variant of the model")
+        predictor.warm_up()
 except Exception as e:
     print(f"Error loading model: {e}")
     model = None
+    predictor = None
 
 # Pydantic models
 class PredictionOutput(BaseModel):
@@ -110,27 +136,31 @@ async def predict_cancer(file: UploadFile = File(...)):
     try:
         # Read and process image
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Preprocess for InceptionV3 (299x299, NOT grayscale)
-        image_rgb = image.convert('RGB')
-        image_resized = image_rgb.resize((299, 299))
+        with metrics.span("decode"):
+            image = Image.open(io.BytesIO(contents))
+            image_rgb = image.convert('RGB')
         
-        # Convert to array and preprocess
-        image_array = np.array(image_resized)
-        image_array = tf.keras.applications.inception_v3.preprocess_input(image_array)
-        image_expanded = np.expand_dims(image_array, axis=0)
+        with metrics.span("preprocess"):
+            # Preprocess for InceptionV3 (299x299, NOT grayscale)
+            image_resized = image_rgb.resize((299, 299))
+            
+            # Convert to array and preprocess
+            image_array = np.array(image_resized)
+            image_array = tf.keras.applications.inception_v3.preprocess_input(image_array)
+            image_expanded = np.expand_dims(image_array, axis=0)
         
         # Make prediction
-        prediction = model.predict(image_expanded)
+        with metrics.span("predict"):
+            prediction = predictor(image_expanded)
         predicted_class_idx = np.argmax(prediction)
         confidence = float(prediction[0][predicted_class_idx])
         predicted_class = labels[predicted_class_idx]
         
         # Save prediction
-        os.makedirs(f"./predictions/{predicted_class}/predicted/", exist_ok=True)
-        file_path = f"./predictions/{predicted_class}/predicted/{file.filename}"
-        image.save(file_path)
+        with metrics.span("save"):
+            os.makedirs(f"./predictions/{predicted_class}/predicted/", exist_ok=True)
+            file_path = f"./predictions/{predicted_class}/predicted/{file.filename}"
+            image.save(file_path)
         
         return PredictionOutput(
             predicted_class=predicted_class,
@@ -148,7 +178,8 @@ async def health_check():
         "status": "healthy",
         "model_loaded": model is not None,
         "tensorflow_version": tf.__version__,
-        "model_type": "InceptionV3-based"
+        "model_type": "InceptionV3-based",
+        "model_variant": MODEL_VARIANT
     }
 
 @app.get("/model/info")
@@ -0,0 +1,86 @@
+"""
+Export and evaluate reduced-precision variants of the InceptionV3 classifier.
+
+    python quantize_model.py export --variant int8 --calibration-dir images/
+    python quantize_model.py compare --variant int8 --holdout-dir heldout/ --out int8.json
+
+export writes model_iv3_<variant>.tflite next to model_iv3.h5. compare runs
+the float model and that variant over a held-out folder of images,
+preprocessed as /predict does, and reports latency, speedup and top-1
+agreement with the float predictions. Serve a variant with
+CERVIC_MODEL_VARIANT=<variant>.
+
+Outside the Docker image, run it with backend/ on the path (PYTHONPATH=..).
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from common.inference import CompiledPredictor, TFLitePredictor
+from common.quantize import VARIANTS, compare, convert, image_files, variant_path
+
+MODEL_PATH = "model_iv3.h5"
+
+
+def load_inputs(folder, limit):
+    """Images from a folder as (1, 299, 299, 3) InceptionV3 inputs, as /predict prepares them"""
+    inputs = []
+    for path in image_files(folder, limit):
+        with Image.open(path) as image:
+            image_array = np.array(image.convert('RGB').resize((299, 299)))
+        image_array = tf.keras.applications.inception_v3.preprocess_input(image_array.astype(np.float32))
+        inputs.append(image_array[None])
+    if not inputs:
+        raise SystemExit(f"No images found in {folder}")
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the cervical cancer classifier and compare it against the float model")
+    parser.add_argument('command', choices=('export', 'compare'))
+    parser.add_argument('--variant', choices=VARIANTS, default='int8')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--calibration-dir', help="Representative images for int8 calibration")
+    parser.add_argument('--calibration-samples', type=int, default=100)
+    parser.add_argument('--holdout-dir', help="Held-out images for compare")
+    parser.add_argument('--holdout-samples', type=int)
+    parser.add_argument('--out', help="Where to write the compare report (JSON)")
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    output = variant_path(args.model, args.variant)
+
+    if args.command == 'export':
+        calibration = None
+        if args.variant == 'int8':
+            if not args.calibration_dir:
+                parser.error("int8 export needs --calibration-dir")
+            samples = load_inputs(args.calibration_dir, args.calibration_samples)
+            calibration = lambda: samples
+        with open(output, 'wb') as f:
+            f.write(convert(model, args.variant, calibration))
+        print(f"Wrote {output} ({os.path.getsize(output) / 1e6:.2f} MB)")
+        return
+
+    if not args.holdout_dir:
+        parser.error("compare needs --holdout-dir")
+    report = compare(
+        CompiledPredictor(model, batch_size=1, input_shape=(299, 299, 3)),
+        TFLitePredictor(output),
+        load_inputs(args.holdout_dir, args.holdout_samples),
+        task="classification"
+    )
+    report = {"variant": args.variant, "model": output, **report}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
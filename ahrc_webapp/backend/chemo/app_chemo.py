@@ -13,15 +13,28 @@ import json
 from typing import Optional
 import io
 
+from common.instrumentation import Instrumentation
+from common.inference import CompiledPredictor
+
 # Initialize FastAPI app
 app = FastAPI(title="Chemotherapy Toxicity Prediction API")
 
+# Request/stage timings, served at /metrics
+metrics = Instrumentation("chemo")
+metrics.install(app)
+
 # Load the model
 try:
-    savedModel = load_model('model.h5')
+    with metrics.model_loading("toxicity"):
+        savedModel = load_model('model.h5')
+    # One patient per request: trace a (1, 28) graph and warm it up before serving
+    with metrics.model_loading("toxicity_warmup"):
+        predictor = CompiledPredictor(savedModel, batch_size=1, input_shape=(28,))
+        predictor.warm_up()
 except Exception as e:
     print(f"Error loading model: {e}")
     savedModel = None
+    predictor = None
 
 # Request/Response models
 class PredictionRequest(BaseModel):
@@ -46,7 +59,8 @@ async def predict(file: UploadFile = File(...), file_number: str = Form(...)):
     
     try:
         contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
+        with metrics.span("decode"):
+            df = pd.read_excel(io.BytesIO(contents))
         # Check if the file number exists in the data
         if 'FILE NO' not in df.columns:
             raise HTTPException(status_code=400, detail="Excel file must contain 'FILE NO' column")
@@ -84,10 +98,13 @@ async def predict(file: UploadFile = File(...), file_number: str = Form(...)):
         print(savedModel.input_shape)
         
         # Process the data
-        processed_df = map_dataprocess(inputdata)
+        with metrics.span("preprocess"):
+            processed_df = map_dataprocess(inputdata)
         # print(processed_df)
         
-        result = savedModel.predict(processed_df)
+        with metrics.span("predict"):
+            # Only the first matching row is reported, which also fits the fixed (1, 28) signature
+            result = predictor(processed_df.to_numpy(dtype=np.float32)[:1])
         label = np.argmax(result, axis=1)[0]
         print(result)
         
@@ -0,0 +1,171 @@
+"""
+Compiled, pre-warmed inference for the Keras models served by the backends.
+
+model.predict() builds a data adapter and looks up its step function on
+every call. That is tens of milliseconds of fixed overhead for a single
+image or patient, and the first request after startup also pays for
+tracing the graph. CompiledPredictor instead wraps the model in a
+tf.function with a fixed input signature, traces it once and runs a warm-up
+pass at startup, so the hot path is a single graph call:
+
+    predictor = CompiledPredictor(model, batch_size=1)
+    probabilities = predictor(batch)   # numpy in, numpy out
+
+Leaving batch_size as None keeps the batch dimension dynamic, which still
+needs only one trace; services that batch requests use that and warm up
+each batch size they expect to run.
+
+TFLitePredictor has the same interface for reduced-precision TFLite
+exports (see common/quantize.py), so a service can switch between the
+float graph and a quantized variant by configuration.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+# The standalone LiteRT runtime replaces tf.lite.Interpreter in newer TensorFlow releases
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    Interpreter = tf.lite.Interpreter
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledPredictor:
+    """Keras model wrapped in a tf.function with a fixed input signature"""
+
+    def __init__(
+        self,
+        model,
+        batch_size: Optional[int] = None,
+        input_shape: Optional[Tuple[int, ...]] = None,
+        dtype=tf.float32
+    ):
+        """
+        Args:
+            model: Keras model with a single input
+            batch_size: Fixed batch dimension, or None for any batch size
+            input_shape: Per-example shape; defaults to the model's input shape
+            dtype: Input dtype the model is called with
+        """
+        if input_shape is None:
+            input_shape = tuple(model.input_shape[1:])
+        self.model = model
+        self.dtype = tf.as_dtype(dtype)
+        self.signature = tf.TensorSpec((batch_size,) + tuple(input_shape), self.dtype)
+        self._fn = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[self.signature]
+        )
+        # Trace now rather than on the first request
+        self._concrete = self._fn.get_concrete_function()
+
+    def __call__(self, batch) -> np.ndarray:
+        """
+        Run the model on a batch
+
+        Args:
+            batch: Array matching the input signature (cast to its dtype)
+
+        Returns:
+            np.ndarray: Model output
+        """
+        return self._concrete(tf.convert_to_tensor(np.asarray(batch), dtype=self.dtype)).numpy()
+
+    def warm_up(self, batch_sizes: Iterable[int] = (1,)) -> float:
+        """
+        Run zero inputs through the model so kernels and buffers are ready
+
+        Args:
+            batch_sizes: Batch sizes to run; ignored when the batch size is fixed
+
+        Returns:
+            float: Seconds spent warming up
+        """
+        fixed = self.signature.shape[0]
+        sizes = [fixed] if fixed is not None else list(batch_sizes)
+        start = time.perf_counter()
+        for size in sizes:
+            self(np.zeros((size,) + tuple(self.signature.shape[1:]), dtype=self.dtype.as_numpy_dtype))
+        elapsed = time.perf_counter() - start
+        logger.info(f"Warmed up {self.model.name} for batch sizes {sizes} in {elapsed:.2f}s")
+        return elapsed
+
+
+class TFLitePredictor:
+    """TFLite model (such as a quantized export) with the CompiledPredictor interface"""
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_path: Path to the .tflite file
+            num_threads: Interpreter threads; defaults to the CPU count
+        """
+        with open(model_path, 'rb') as f:
+            self._content = f.read()
+        self.name = os.path.basename(model_path)
+        self.num_threads = num_threads or os.cpu_count()
+        # One interpreter per batch size: resizing a single interpreter reallocates on every change
+        self._interpreters: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+        interpreter = Interpreter(model_content=self._content, num_threads=self.num_threads)
+        input_detail = interpreter.get_input_details()[0]
+        self._input_index = input_detail['index']
+        self._output_index = interpreter.get_output_details()[0]['index']
+        self.input_shape = tuple(int(d) for d in input_detail['shape'][1:])
+        # -1 in the signature means the batch dimension can be resized
+        self.batch_size = None if input_detail['shape_signature'][0] == -1 else int(input_detail['shape'][0])
+
+    def _interpreter(self, batch_size: int):
+        interpreter = self._interpreters.get(batch_size)
+        if interpreter is None:
+            if self.batch_size is not None and batch_size != self.batch_size:
+                raise ValueError(f"{self.name} was exported for batch size {self.batch_size}, got {batch_size}")
+            interpreter = Interpreter(model_content=self._content, num_threads=self.num_threads)
+            interpreter.resize_tensor_input(self._input_index, [batch_size, *self.input_shape])
+            interpreter.allocate_tensors()
+            self._interpreters[batch_size] = interpreter
+        return interpreter
+
+    def __call__(self, batch) -> np.ndarray:
+        """
+        Run the model on a batch
+
+        Args:
+            batch: Float array shaped (B,) + input_shape
+
+        Returns:
+            np.ndarray: Model output
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        # Interpreters are not thread-safe
+        with self._lock:
+            interpreter = self._interpreter(batch.shape[0])
+            interpreter.set_tensor(self._input_index, batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(self._output_index)
+
+    def warm_up(self, batch_sizes: Iterable[int] = (1,)) -> float:
+        """
+        Create and run the interpreter for each batch size
+
+        Args:
+            batch_sizes: Batch sizes to run; ignored when the batch size is fixed
+
+        Returns:
+            float: Seconds spent warming up
+        """
+        sizes = [self.batch_size] if self.batch_size is not None else list(batch_sizes)
+        start = time.perf_counter()
+        for size in sizes:
+            self(np.zeros((size,) + self.input_shape, dtype=np.float32))
+        elapsed = time.perf_counter() - start
+        logger.info(f"Warmed up {self.name} for batch sizes {sizes} in {elapsed:.2f}s")
+        return elapsed
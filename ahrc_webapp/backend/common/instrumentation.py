@@ -0,0 +1,221 @@
+"""
+Request and stage instrumentation shared by the backend services.
+
+Each service creates one Instrumentation, installs it on its FastAPI app
+and wraps the expensive steps of a request in spans:
+
+    metrics = Instrumentation("oct")
+    metrics.install(app)
+
+    with metrics.span("predict"):
+        prediction = model.predict(image)
+
+The app then serves Prometheus text format at /metrics:
+
+    http_request_duration_seconds   histogram by method, route and status
+    http_requests_in_flight         gauge
+    stage_duration_seconds          histogram by stage
+    model_load_seconds              gauge by model
+    plus any gauges registered with gauge_callback (queue depths etc.)
+
+There is no dependency on prometheus_client. Recording a sample takes
+one lock and a bisect into the bucket bounds, a few microseconds. The
+request middleware is plain ASGI rather than BaseHTTPMiddleware, so
+streaming responses are untouched.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers sub-millisecond lookups up to multi-second inference
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge keyed by label values; values may also come from a callback"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), callback: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, amount: float = 1.0, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labelvalues: str):
+        self.inc(-amount, *labelvalues)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.callback is not None:
+            try:
+                lines.append(f"{self.name} {_format_value(self.callback())}")
+            except Exception:
+                # A failing callback must not break the whole scrape
+                pass
+            return lines
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Instrumentation:
+    """Metrics for one service: request/stage histograms, in-flight and model-load gauges"""
+
+    def __init__(self, service: str, buckets=DEFAULT_BUCKETS):
+        self.service = service
+        self.request_duration = Histogram(
+            "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"), buckets
+        )
+        self.stage_duration = Histogram(
+            "stage_duration_seconds", "Time spent in each processing stage", ("stage",), buckets
+        )
+        self.in_flight = Gauge("http_requests_in_flight", "Requests currently being handled")
+        self.model_load = Gauge("model_load_seconds", "Time taken to load each model", ("model",))
+        self.in_flight.set(0)
+        self.info = Gauge("service_info", "Service this process belongs to", ("service",))
+        self.info.set(1, service)
+        self._metrics: List = [self.info, self.request_duration, self.stage_duration, self.in_flight, self.model_load]
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a block of code as one stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_duration.observe(time.perf_counter() - start, stage)
+
+    @contextmanager
+    def model_loading(self, model: str):
+        """Time a model load and record it in model_load_seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.model_load.set(time.perf_counter() - start, model)
+
+    def gauge_callback(self, name: str, help_text: str, callback: Callable[[], float]):
+        """Expose a value read at scrape time, such as a queue depth"""
+        self._metrics.append(Gauge(name, help_text, callback=callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def install(self, app, path: str = "/metrics"):
+        """Add the request-timing middleware and the metrics route to a FastAPI app"""
+        from fastapi import Response
+
+        app.add_middleware(_MetricsMiddleware, instrumentation=self, skip_path=path)
+
+        @app.get(path, include_in_schema=False)
+        async def metrics():
+            return Response(content=self.render(), media_type=CONTENT_TYPE)
+
+
+class _MetricsMiddleware:
+    """ASGI middleware recording request latency and in-flight count"""
+
+    def __init__(self, app, instrumentation: Instrumentation, skip_path: str = "/metrics"):
+        self.app = app
+        self.instrumentation = instrumentation
+        self.skip_path = skip_path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == self.skip_path:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        metrics = self.instrumentation
+        metrics.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight.dec()
+            # The router stores the matched route in the scope; the template keeps label cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            metrics.request_duration.observe(
+                time.perf_counter() - start, scope.get("method", ""), route_path, str(status["code"])
+            )
@@ -0,0 +1,158 @@
+"""
+Reduced-precision TFLite exports of the backend Keras models.
+
+Variants:
+
+    float16   weights stored as float16; half the size, float32 compute on CPU
+    dynamic   int8 weights, activations quantized on the fly (no calibration data)
+    int8      int8 weights and activations, calibrated on representative inputs;
+              float32 input and output so callers are unchanged
+
+Each service has a quantize_model.py script that builds its float model,
+calls convert() and then compare() on a held-out folder. compare() runs the
+float and quantized predictors over the same inputs and reports per-call
+latency for both, plus how closely the outputs agree. The service serves a
+variant when <SERVICE>_MODEL_VARIANT names it (see TFLitePredictor).
+"""
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import tensorflow as tf
+
+VARIANTS = ('float16', 'dynamic', 'int8')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+
+def variant_path(float_path: str, variant: str) -> str:
+    """model_iv3.h5 -> model_iv3_int8.tflite, in the same directory"""
+    return f"{os.path.splitext(float_path)[0]}_{variant}.tflite"
+
+
+def served_variant(float_path: str, variant: str) -> Optional[str]:
+    """
+    Check a <SERVICE>_MODEL_VARIANT setting before the model is loaded
+
+    Args:
+        float_path: Path of the float Keras model
+        variant: "float32" or one of VARIANTS
+
+    Returns:
+        str: Path of the .tflite export to serve, or None for the float model
+
+    Raises:
+        ValueError: If the variant is unknown
+        FileNotFoundError: If the variant's .tflite export does not exist
+    """
+    if variant == 'float32':
+        return None
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant {variant!r}; expected one of float32, {', '.join(VARIANTS)}")
+    path = variant_path(float_path, variant)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model variant {variant} not found at {path}; export it with quantize_model.py")
+    return path
+
+
+def image_files(folder: str, limit: Optional[int] = None) -> List[str]:
+    """Sorted image paths in a folder, optionally only the first limit"""
+    names = sorted(name for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    paths = [os.path.join(folder, name) for name in names]
+    return paths[:limit] if limit else paths
+
+
+def convert(model, variant: str, representative_inputs: Optional[Callable[[], Iterable[np.ndarray]]] = None) -> bytes:
+    """
+    Convert a Keras model to a reduced-precision TFLite flatbuffer
+
+    Args:
+        model: Keras model
+        variant: One of VARIANTS
+        representative_inputs: Returns an iterable of (1, ...) float32 inputs;
+            required for int8 calibration
+
+    Returns:
+        bytes: .tflite file contents
+
+    Raises:
+        ValueError: If the variant is unknown or int8 has no calibration inputs
+    """
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown variant {variant}; expected one of {', '.join(VARIANTS)}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'int8':
+        if representative_inputs is None:
+            raise ValueError("int8 quantization needs representative inputs for calibration")
+        converter.representative_dataset = lambda: ([sample] for sample in representative_inputs())
+    return converter.convert()
+
+
+def _timed_outputs(predictor: Callable, inputs: List[np.ndarray]):
+    """Run every input once after a warm-up call; returns outputs and per-call seconds"""
+    predictor(inputs[0])
+    outputs, seconds = [], []
+    for sample in inputs:
+        start = time.perf_counter()
+        outputs.append(predictor(sample))
+        seconds.append(time.perf_counter() - start)
+    return np.concatenate(outputs), np.array(seconds)
+
+
+def _latency(seconds: np.ndarray) -> Dict[str, float]:
+    return {
+        "mean_ms": round(float(seconds.mean()) * 1000, 2),
+        "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(seconds, 95)) * 1000, 2),
+    }
+
+
+def compare(reference: Callable, candidate: Callable, inputs: List[np.ndarray], task: str) -> Dict:
+    """
+    Compare a quantized predictor against the float model on the same inputs
+
+    Args:
+        reference: Float predictor (numpy in, probabilities out)
+        candidate: Quantized predictor with the same interface
+        inputs: (1, ...) float32 inputs
+        task: "classification" (last axis is classes per sample) or
+            "segmentation" (last axis is classes per pixel)
+
+    Returns:
+        dict: Latency of both predictors, speedup and agreement metrics
+    """
+    reference_out, reference_seconds = _timed_outputs(reference, inputs)
+    candidate_out, candidate_seconds = _timed_outputs(candidate, inputs)
+
+    reference_labels = np.argmax(reference_out, axis=-1)
+    candidate_labels = np.argmax(candidate_out, axis=-1)
+    difference = np.abs(reference_out.astype(np.float32) - candidate_out.astype(np.float32))
+
+    report = {
+        "samples": len(inputs),
+        "float_latency": _latency(reference_seconds),
+        "quantized_latency": _latency(candidate_seconds),
+        "speedup": round(float(reference_seconds.mean() / candidate_seconds.mean()), 2),
+        "max_abs_probability_difference": round(float(difference.max()), 5),
+        "mean_abs_probability_difference": round(float(difference.mean()), 6),
+    }
+
+    if task == "classification":
+        report["top1_agreement"] = round(float((reference_labels == candidate_labels).mean()), 4)
+    else:
+        n_classes = reference_out.shape[-1]
+        ious = {}
+        for label in range(n_classes):
+            in_reference = reference_labels == label
+            in_candidate = candidate_labels == label
+            union = np.logical_or(in_reference, in_candidate).sum()
+            if union:
+                ious[str(label)] = round(float(np.logical_and(in_reference, in_candidate).sum() / union), 4)
+        report["pixel_agreement"] = round(float((reference_labels == candidate_labels).mean()), 4)
+        report["mean_iou"] = round(float(np.mean(list(ious.values()))), 4) if ious else None
+        report["per_class_iou"] = ious
+    return report
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Body, Request, HTTPException
+from fastapi import FastAPI, Body, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
@@ -8,7 +8,6 @@ import json
 import os
 import uuid
 import math
-import rasterio
 from rasterio.errors import RasterioIOError
 import h5py
 from rasterio.transform import from_origin
@@ -18,6 +17,20 @@ import numpy as np
 import math
 import logging
 
+from common.instrumentation import Instrumentation
+
+from decision_rasters import decision_raster_paths
+from decision_cache import DecisionCache
+from decision_log import DecisionLog
+from raster_index import RasterDateIndex
+from raster_sampling import NoDataAtLocation, PixelOutOfBounds, RasterPool, pixel_index
+from reference_data import ReferenceDataStore
+from sm_cube import SoilMoistureCube
+from scheduler import schedule_irrigation
+from sm_timeseries import SoilMoistureTimeSeries
+from workers import BoundedWorkerPool, PoolSaturated
+from water_requirements import UNKNOWN_CROP, CropTable, pump_discharge_rate, round3, water_requirements
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,6 +51,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request/stage timings and queue depths, served at /metrics
+metrics = Instrumentation("irrigation")
+metrics.install(app)
+
 # Input model matching the data sent from Next.js
 class IrrigationInput(BaseModel):
     latitude: float
@@ -53,6 +70,7 @@ class IrrigationInput(BaseModel):
     # pumpDischargeRate: float = Field(gt=0, description="Pump discharge rate must be positive")
     pumpType: str
     irrigationMethod: str
+    fieldId: Optional[str] = Field(default=None, description="Caller's field identifier, stored with the decision history")
     
     @validator('sowingDate', 'lastIrrigationDate')
     def validate_date_format(cls, v):
@@ -77,8 +95,57 @@ class ProcessedIrrigationData(BaseModel):
     irrigationMethod: str
     turnOnPump: bool
     pumpRunningTime: float
+    rasterDate: Optional[str] = None
     timestamp: str
 
+# Batch request/response models
+class BatchIrrigationInput(BaseModel):
+    fields: List[IrrigationInput] = Field(min_items=1, description="Fields to process")
+
+class BatchIrrigationResult(BaseModel):
+    index: int
+    result: Optional[ProcessedIrrigationData] = None
+    error: Optional[str] = None
+
+class BatchProcessedIrrigationData(BaseModel):
+    rasterDate: str
+    results: List[BatchIrrigationResult]
+
+# Schedule request/response models
+class ScheduleInput(BaseModel):
+    fields: List[IrrigationInput] = Field(min_items=1, description="Fields to schedule")
+    horizonDays: int = Field(14, ge=7, le=14, description="Days to schedule, starting today")
+    referenceET: Optional[float] = Field(None, gt=0, description="Reference evapotranspiration in mm/day")
+
+class ScheduledIrrigation(BaseModel):
+    date: str
+    depth: float
+
+class FieldSchedule(BaseModel):
+    index: int
+    irrigations: List[ScheduledIrrigation] = []
+    rootZoneMoisture: List[float] = []
+    error: Optional[str] = None
+
+class ScheduleResponse(BaseModel):
+    rasterDate: str
+    startDate: str
+    horizonDays: int
+    results: List[FieldSchedule]
+
+# Time series models
+class TimeSeriesPoint(BaseModel):
+    date: str
+    ssm: float
+    rzsm: float
+
+class TimeSeriesResponse(BaseModel):
+    latitude: float
+    longitude: float
+    fromDate: str
+    toDate: str
+    points: List[TimeSeriesPoint]
+
 # Error response model
 class ErrorResponse(BaseModel):
     error: str
@@ -86,14 +153,89 @@ class ErrorResponse(BaseModel):
     timestamp: str
 
 # File path constants
-RASTER_BASE_PATH = '/app/sm_tif'
-EXCEL_PATH = 'Lat_long_SM_RZSM.xlsx'
-P_TABLE_PATH = 'p table.xlsx'
-MODEL_PATH = 'rf_rzsm_model.pkl'
+RASTER_BASE_PATH = os.environ.get('RASTER_BASE_PATH', '/app/sm_tif')
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))
+EXCEL_PATH = os.environ.get('EXCEL_PATH', 'Lat_long_SM_RZSM.xlsx')
+P_TABLE_PATH = os.environ.get('P_TABLE_PATH', 'p table.xlsx')
+MODEL_PATH = os.environ.get('MODEL_PATH', 'rf_rzsm_model.pkl')
+COMPILED_MODEL_PATH = os.environ.get('COMPILED_MODEL_PATH', 'rf_rzsm_model.npz')
+REFERENCE_RELOAD_INTERVAL = float(os.environ.get('REFERENCE_RELOAD_INTERVAL', '60'))
+SOIL_MAX_DISTANCE_KM = float(os.environ.get('SOIL_MAX_DISTANCE_KM', '10'))
+SOIL_NEIGHBOURS = int(os.environ.get('SOIL_NEIGHBOURS', '1'))
+
+# Soil table, p-table and RF model, loaded once at startup and hot-reloaded on change
+reference_store = ReferenceDataStore(
+    EXCEL_PATH,
+    P_TABLE_PATH,
+    MODEL_PATH,
+    reload_interval=REFERENCE_RELOAD_INTERVAL,
+    soil_max_distance_km=SOIL_MAX_DISTANCE_KM,
+    soil_neighbours=SOIL_NEIGHBOURS,
+    compiled_model_path=COMPILED_MODEL_PATH
+)
+
+# Open raster handles, reused across requests for the same date
+RASTER_POOL_SIZE = int(os.environ.get('RASTER_POOL_SIZE', '8'))
+# Largest single window /process/batch reads; wider batches are read block by block
+RASTER_MAX_WINDOW_PIXELS = int(os.environ.get('RASTER_MAX_WINDOW_PIXELS', '1000000'))
+raster_pool = RasterPool(max_open=RASTER_POOL_SIZE, max_window_pixels=RASTER_MAX_WINDOW_PIXELS)
+
+# Memory-mapped daily grids written by `python sm_cube.py`; GeoTIFFs are the fallback
+SM_CUBE_PATH = os.environ.get('SM_CUBE_PATH', '/app/data/sm_cube')
+SM_CUBE_DAYS = int(os.environ.get('SM_CUBE_DAYS', '30'))
+sm_cube = SoilMoistureCube(SM_CUBE_PATH, max_days=SM_CUBE_DAYS)
+
+# Available raster dates; requests fall back to the newest day within the window
+RASTER_MAX_STALENESS_DAYS = int(os.environ.get('RASTER_MAX_STALENESS_DAYS', '7'))
+RASTER_INDEX_REFRESH_INTERVAL = float(os.environ.get('RASTER_INDEX_REFRESH_INTERVAL', '300'))
+raster_index = RasterDateIndex(
+    RASTER_BASE_PATH,
+    SM_CUBE_PATH,
+    max_staleness_days=RASTER_MAX_STALENESS_DAYS,
+    refresh_interval=RASTER_INDEX_REFRESH_INTERVAL
+)
+
+# Pixel-major archive written by `python sm_timeseries.py`, used by /timeseries
+SM_TIMESERIES_PATH = os.environ.get('SM_TIMESERIES_PATH', '/app/data/sm_timeseries')
+MAX_TIMESERIES_DAYS = int(os.environ.get('MAX_TIMESERIES_DAYS', '3660'))
+sm_timeseries = SoilMoistureTimeSeries(SM_TIMESERIES_PATH)
+
+# Blocking raster/model work runs here, never on the event loop
+WORKER_THREADS = int(os.environ.get('WORKER_THREADS', '4'))
+WORKER_QUEUE_DEPTH = int(os.environ.get('WORKER_QUEUE_DEPTH', '32'))
+WORKER_RETRY_AFTER = int(os.environ.get('WORKER_RETRY_AFTER', '1'))
+worker_pool = BoundedWorkerPool(max_workers=WORKER_THREADS, max_queue=WORKER_QUEUE_DEPTH)
+
+# Decisions shared by fields in the same pixel with the same crop and well
+DECISION_CACHE_SIZE = int(os.environ.get('DECISION_CACHE_SIZE', '10000'))
+DECISION_CACHE_TTL = float(os.environ.get('DECISION_CACHE_TTL', str(6 * 3600)))
+decision_cache = DecisionCache(max_entries=DECISION_CACHE_SIZE, ttl_seconds=DECISION_CACHE_TTL)
+
+# Append-only history of served decisions, written by a background thread
+# data/ next to app.py: /app/data in the image, and writable for a local checkout
+DECISION_LOG_PATH = os.environ.get(
+    'DECISION_LOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'irrigation_decisions.sqlite3')
+)
+DECISION_LOG_QUEUE = int(os.environ.get('DECISION_LOG_QUEUE', '10000'))
+decision_log = DecisionLog(DECISION_LOG_PATH, max_queue=DECISION_LOG_QUEUE)
+
+# Multi-day scheduling
+MAX_SCHEDULE_FIELDS = int(os.environ.get('MAX_SCHEDULE_FIELDS', '5000'))
+SCHEDULE_REFERENCE_ET = float(os.environ.get('SCHEDULE_REFERENCE_ET', '5.0'))
+
+# Queue depths, read when /metrics is scraped
+metrics.gauge_callback("worker_pool_in_flight", "Blocking jobs running on the worker pool", lambda: worker_pool.in_flight)
+metrics.gauge_callback("worker_pool_queued", "Blocking jobs waiting for a worker", lambda: worker_pool.queued)
+metrics.gauge_callback("decision_log_queued", "Decision records waiting to be written", lambda: decision_log.stats()["queued"])
+metrics.gauge_callback("decision_cache_entries", "Entries in the decision cache", lambda: decision_cache.stats()["size"])
+
+# Per-crop decision/depth rasters written nightly by `python decision_rasters.py`
+DECISION_RASTER_PATH = os.environ.get('DECISION_RASTER_PATH', '/app/data/decision_rasters')
 
 def get_raster_value(raster_path: str, latitude: float, longitude: float) -> float:
     """
-    Extract raster value at given coordinates
+    Extract raster value at given coordinates, reading only the pixel's window
     
     Args:
         raster_path: Path to the raster file
@@ -104,25 +246,21 @@ def get_raster_value(raster_path: str, latitude: float, longitude: float) -> flo
         float: Raster value at the coordinates
         
     Raises:
-        HTTPException: If raster file is not found or coordinates are out of bounds
+        HTTPException: If raster file is not found, coordinates are out of bounds
+            or the pixel holds no data
     """
     try:
-        with rasterio.open(raster_path) as dataset:
-            transform = dataset.transform
-
-            # Convert (longitude, latitude) to (col, row)
-            col, row = ~transform * (longitude, latitude)
-            row, col = int(row), int(col)
-
-            band_data = dataset.read(1)
-
-            if 0 <= row < band_data.shape[0] and 0 <= col < band_data.shape[1]:
-                return band_data[row, col]
-            else:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Coordinates ({latitude}, {longitude}) are out of bounds for the raster"
-                )
+        return raster_pool.sample(raster_path, latitude, longitude)
+    except PixelOutOfBounds as e:
+        raise HTTPException(
+            status_code=400, 
+            detail=str(e)
+        )
+    except NoDataAtLocation as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
     except RasterioIOError:
         raise HTTPException(
             status_code=404, 
@@ -135,8 +273,30 @@ def get_raster_value(raster_path: str, latitude: float, longitude: float) -> flo
             detail=f"Error reading raster data: {str(e)}"
         )
 
+def get_surface_soil_moisture(date_str: str, raster_path: str, latitude: float, longitude: float) -> float:
+    """
+    Read surface soil moisture for a date, preferring the memory-mapped cube
+    
+    Args:
+        date_str: Raster date as YYYYMMDD
+        raster_path: GeoTIFF to fall back to if the day is not in the cube or the cube copy is older
+        latitude: Latitude coordinate
+        longitude: Longitude coordinate
+        
+    Returns:
+        float: Raw raster value at the coordinates
+    """
+    try:
+        return sm_cube.sample(date_str, latitude, longitude, source_path=raster_path)
+    except KeyError:
+        return get_raster_value(raster_path, latitude, longitude)
+    except PixelOutOfBounds as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NoDataAtLocation as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 def calculate_water_requirements(
-    df: pd.DataFrame, 
+    crops: CropTable, 
     sand: float, 
     silt: float, 
     clay: float, 
@@ -148,7 +308,7 @@ def calculate_water_requirements(
     Calculate water requirements for irrigation decision
     
     Args:
-        df: DataFrame containing crop parameters
+        crops: Pre-parsed crop parameters from the p-table
         sand: Sand content percentage
         silt: Silt content percentage  
         clay: Clay content percentage
@@ -162,50 +322,21 @@ def calculate_water_requirements(
     Raises:
         HTTPException: If crop not found in database
     """
-    # Step 1: Compute BD (Mg/m³)
-    BD = 1.66 - 0.063 * math.log10(clay + 1)
-
-    # Step 2: Compute θ_fc (field capacity) in percent
-    theta_fc_percent = 56.37 - 0.51 * sand - 0.27 * silt
-
-    # Step 3: Compute θ_wp (wilting point) in percent
-    theta_wp_percent = 0.71 + 0.44 * clay
-
-    # Step 4: Get crop-specific info (p and Zr) from the DataFrame
-    crop_row = df[df['crop_name'].str.lower() == crop_name.lower()]
-    if crop_row.empty:
+    crop = crops.lookup(crop_name)
+    if crop == UNKNOWN_CROP:
         raise HTTPException(
             status_code=404,
             detail=f"Crop '{crop_name}' not found in the database"
         )
 
     try:
-        p = float(crop_row['p'].values[0])
-        Zr_val = crop_row['Zr'].values[0]
-        
-        if rooting_depth is None:
-            if isinstance(Zr_val, str) and '-' in Zr_val:
-                Zr_range = list(map(float, Zr_val.split('-')))
-                Zr = sum(Zr_range) / len(Zr_range)  # average if range
-            else:
-                Zr = float(Zr_val)
-        else:
-            Zr = rooting_depth
-
-        Zr_mm = Zr * 1000  # convert Zr to mm
-
-        # Step 5: Calculate TAW (mm)
-        TAW = ((theta_fc_percent - theta_wp_percent) / 100) * BD * Zr_mm
-
-        # Step 6: Calculate RAW (mm)
-        RAW = p * TAW
+        Zr = crops.zr[crop] if rooting_depth is None else rooting_depth
+        if math.isnan(Zr):
+            raise ValueError(f"Invalid rooting depth for crop '{crop_name}'")
 
-        pa = ((theta_fc_percent - rsm) / theta_fc_percent)
+        irrigation_needed, RAW = water_requirements(sand, silt, clay, rsm, crops.p[crop], Zr)
 
-        # Step 7: Decide irrigation
-        irrigation_needed = p <= pa
-
-        return irrigation_needed, round(RAW, 3)
+        return bool(irrigation_needed), round(float(RAW), 3)
     
     except Exception as e:
         logger.error(f"Error calculating water requirements: {str(e)}")
@@ -217,16 +348,13 @@ def calculate_water_requirements(
 
 def calculate_pump_discharge_rate(well_depth: float, predicted_water_level: float, well_radius: float) -> float:
     try:
-        numerator = 2.72 * (0.5 * well_depth) * (
-        predicted_water_level - (well_depth - (predicted_water_level / 3))
-    )
-        denominator = math.log10(100 - well_radius)
-        
-        if denominator == 0:
-            raise ValueError("Denominator is zero; check that well_radius is not 100.")
+        if 100 - well_radius <= 0:
+            raise ValueError("math domain error; check that well_radius is below 100.")
+        if 100 - well_radius == 1:
+            raise ValueError("Denominator is zero; check that well_radius is not 99.")
         
-        pump_discharge_rate = numerator / denominator
-        return round(pump_discharge_rate, 3)
+        rate = pump_discharge_rate(well_depth, predicted_water_level, well_radius)
+        return round(float(rate), 3)
 
     except Exception as e:
         logger.error(f"Error calculating pump discharge rate: {str(e)}")
@@ -247,7 +375,7 @@ def validate_files_exist():
 
 @app.on_event("startup")
 async def startup_event():
-    """Validate environment on startup"""
+    """Validate environment and load reference data on startup"""
     try:
         validate_files_exist()
         logger.info("All required files validated")
@@ -255,125 +383,194 @@ async def startup_event():
         logger.error(f"Startup validation failed: {e.detail}")
         raise
 
-@app.post("/process", response_model=ProcessedIrrigationData, responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def process_irrigation_data(data: IrrigationInput):
+    with metrics.model_loading("reference_data"):
+        reference_store.load()
+    reference_store.start_watcher()
+    raster_index.refresh()
+    raster_index.start_watcher()
+    decision_log.open()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background reference data reloads and close raster handles"""
+    reference_store.stop_watcher()
+    raster_index.stop_watcher()
+    decision_log.close()
+    worker_pool.shutdown()
+    raster_pool.close_all()
+
+def resolve_raster_date() -> tuple[datetime, str, str]:
     """
-    Process the irrigation data received from Next.js server action
+    Pick the raster date used for decisions
+    
+    The target is three days ago, to allow for SMAP latency. When that day has
+    not landed yet, the newest indexed day within RASTER_MAX_STALENESS_DAYS of
+    the target is used instead.
     
-    Args:
-        data: Irrigation input data
-        
     Returns:
-        ProcessedIrrigationData: Processed irrigation data with pump decisions
+        tuple: (raster_date, date_str as YYYYMMDD, GeoTIFF path)
         
     Raises:
-        HTTPException: Various errors related to data processing
+        HTTPException: If no raster within the staleness window is available
     """
-    try:
-        # Calculate date for 3 days ago
-        current_date = datetime.now()
-        three_days_ago = current_date - timedelta(days=3)
-        
-        month_padded = f"{three_days_ago.month:02d}"
-        day_padded = f"{three_days_ago.day:02d}"
-        year = three_days_ago.year
+    # Calculate date for 3 days ago
+    current_date = datetime.now()
+    three_days_ago = current_date - timedelta(days=3)
+    
+    resolved = raster_index.resolve(three_days_ago)
+    if resolved is None or resolved[0] != three_days_ago.strftime('%Y%m%d'):
+        # A new day may have landed since the last scan; the index thread rescans
+        # in the background and later requests pick it up
+        raster_index.request_refresh()
+    if resolved is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No raster data within {RASTER_MAX_STALENESS_DAYS} days of {three_days_ago.strftime('%Y-%m-%d')}"
+        )
+    
+    date_str, raster_path = resolved
+    if date_str != three_days_ago.strftime('%Y%m%d'):
+        logger.info(f"Raster for {three_days_ago.strftime('%Y-%m-%d')} not available, using {date_str}")
+    return datetime.strptime(date_str, '%Y%m%d'), date_str, raster_path
 
-        # Get surface soil moisture from raster
-        # Option 1: Static filename
-        # raster_path = f"{RASTER_BASE_PATH}/{month_padded}/{day_padded}/sm_surface_analysis_georeferenced_20250507.tif"
-        
-        # Option 2: Dynamic filename based on three_days_ago date
-        date_str = f"{year}{month_padded}{day_padded}"
-        raster_path = f"{RASTER_BASE_PATH}/{year}/{month_padded}/{day_padded}/sm_surface_analysis_georeferenced_{date_str}.tif"
-        
-        
-        if not os.path.exists(raster_path):
-            raise HTTPException(
-                status_code=404,
-                detail=f"Raster data not found for date: {three_days_ago.strftime('%Y-%m-%d')}"
-            )
-        
-        SSM = get_raster_value(raster_path, data.latitude, data.longitude) / 255
-        
-        # Read Excel data
-        try:
-            df = pd.read_excel(EXCEL_PATH)
-        except FileNotFoundError:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Excel file not found: {EXCEL_PATH}"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error reading Excel file: {str(e)}"
-            )
+def get_reference_data():
+    """Return the current reference data snapshot, or 503 if it is not loaded yet"""
+    try:
+        return reference_store.get()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-        # Find matching row
-        rounded_lat = round(data.latitude, 4)
-        rounded_lon = round(data.longitude, 4)
+def build_processed_data(
+    data: IrrigationInput, 
+    decision: bool, 
+    depth: float, 
+    pump_discharge_rate: float,
+    raster_date: Optional[datetime] = None
+) -> ProcessedIrrigationData:
+    """Echo the request fields back together with the pump decision and the raster date used"""
+    return ProcessedIrrigationData(
+        latitude=data.latitude,
+        longitude=data.longitude,
+        croppedArea=data.croppedArea,
+        cropName=data.cropName,
+        sowingDate=data.sowingDate,
+        basePeriod=data.basePeriod,
+        lastIrrigationDate=data.lastIrrigationDate,
+        pumpHP=data.pumpHP,
+        pumpDischargeRate=pump_discharge_rate,
+        pumpType=data.pumpType,
+        irrigationMethod=data.irrigationMethod,
+        turnOnPump=decision,
+        pumpRunningTime=depth,
+        rasterDate=raster_date.strftime('%Y-%m-%d') if raster_date is not None else None,
+        timestamp=datetime.now().isoformat()
+    )
 
-        df.columns = df.columns.str.strip()
-        matching_row = df[(df['LATITUDE'].round(4) == rounded_lat) & 
-                         (df['LONGITUDE'].round(4) == rounded_lon)]
+def sample_surface_moisture_many(date_str: str, raster_path: str, latitudes: np.ndarray, longitudes: np.ndarray):
+    """
+    Vectorized get_surface_soil_moisture for a batch of locations on one date
+    
+    Returns:
+        tuple: (raw values, in-bounds mask)
+    """
+    grid = sm_cube.get_day(date_str, source_path=raster_path)
+    if grid is not None:
+        return grid.sample_many(latitudes, longitudes)
+    try:
+        return raster_pool.sample_many(raster_path, latitudes, longitudes)
+    except RasterioIOError:
+        raise HTTPException(
+            status_code=404, 
+            detail=f"Raster file not found at path: {raster_path}"
+        )
 
-        if matching_row.empty:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No data found for coordinates: ({data.latitude}, {data.longitude})"
-            )
+def get_precomputed_decision(date_str: str, raster_path: str, crop_name: str, latitude: float, longitude: float) -> Optional[tuple[bool, float]]:
+    """
+    Read the decision and depth from the precomputed rasters, if present
+    
+    The nightly job looks soil up at each SMAP pixel centre, so its answer is
+    only used when the field resolves to the same soil sample as its pixel
+    centre (never with blended soil lookups), and only when the rasters are
+    newer than the loaded reference data and than the day's GeoTIFF and cube
+    copy (a re-delivered day is served live until the rasters are rebuilt).
+    
+    Returns:
+        tuple: (irrigation_needed, depth_of_irrigation), or None if the rasters
+        do not exist, are stale, were built from different soil or have no
+        data at the pixel
+    """
+    ref = get_reference_data()
+    if ref.soil_index.neighbours > 1:
+        return None
+    # Only crops from the p-table name a raster; the request never reaches the path
+    crop = ref.crops.lookup(crop_name)
+    if crop == UNKNOWN_CROP:
+        return None
+    try:
+        decision_path, depth_path = decision_raster_paths(DECISION_RASTER_PATH, date_str, ref.crops.names[crop])
+        built_at = min(os.path.getmtime(decision_path), os.path.getmtime(depth_path))
+    except (OSError, ValueError):
+        return None
+    reference_mtime = max((mtime for mtime in ref.mtimes.values() if mtime is not None), default=0.0)
+    if built_at < reference_mtime:
+        logger.warning(f"Ignoring precomputed decision rasters for {date_str}: older than the reference data")
+        return None
+    source_mtimes = [sm_cube.day_mtime(date_str) or 0.0]
+    try:
+        source_mtimes.append(os.path.getmtime(raster_path))
+    except OSError:
+        pass
+    if built_at < max(source_mtimes):
+        logger.warning(f"Ignoring precomputed decision rasters for {date_str}: older than the day's soil moisture raster")
+        return None
+    try:
+        transform = raster_pool.transform(decision_path)
+        row, col = pixel_index(transform, latitude, longitude)
+        centre_lon, centre_lat = transform * (col + 0.5, row + 0.5)
+        if ref.soil_index.sample_key(latitude, longitude) != ref.soil_index.sample_key(centre_lat, centre_lon):
+            return None
+        decision = raster_pool.sample(decision_path, latitude, longitude)
+        depth = raster_pool.sample(depth_path, latitude, longitude)
+    except NoDataAtLocation:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring precomputed decision rasters for {date_str}: {str(e)}")
+        return None
+    return bool(decision), round(float(depth), 3)
 
-        # Extract soil parameters
-        required_columns = ['SAND', 'SILT', 'CLAY', 'BD', 'HC']
-        for col in required_columns:
-            if col not in matching_row.columns:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Required column '{col}' not found in Excel data"
-                )
+def compute_decision(data: IrrigationInput, date_str: str, raster_path: str) -> tuple[bool, float]:
+    """Run the full SSM -> soil -> RF -> water requirement chain for one field"""
+    with metrics.span("raster_read"):
+        SSM = get_surface_soil_moisture(date_str, raster_path, data.latitude, data.longitude) / 255
+    
+    # All reference data comes from one snapshot, even if a reload lands mid-request
+    ref = get_reference_data()
 
-        SAND = matching_row.iloc[0]['SAND']
-        SILT = matching_row.iloc[0]['SILT']
-        CLAY = matching_row.iloc[0]['CLAY']
-        BD = matching_row.iloc[0]['BD']
-        HC = matching_row.iloc[0]['HC']
+    with metrics.span("soil_lookup"):
+        soil = ref.find_soil(data.latitude, data.longitude)
+    if soil is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No soil data within {SOIL_MAX_DISTANCE_KM} km of coordinates: ({data.latitude}, {data.longitude})"
+        )
 
-        logger.info(f"Soil parameters - SAND: {SAND}, SILT: {SILT}, CLAY: {CLAY}, BD: {BD}, HC: {HC}, SSM: {SSM:.7f}")
+    # Extract soil parameters
+    SAND = soil.sand
+    SILT = soil.silt
+    CLAY = soil.clay
+    BD = soil.bd
+    HC = soil.hc
 
-        # Load and use ML model
-        try:
-            model = joblib.load(MODEL_PATH)
-        except FileNotFoundError:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Model file not found: {MODEL_PATH}"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error loading model: {str(e)}"
-            )
+    logger.info(f"Soil parameters - SAND: {SAND}, SILT: {SILT}, CLAY: {CLAY}, BD: {BD}, HC: {HC}, SSM: {SSM:.7f} (nearest sample {soil.distance_km:.2f} km)")
 
-        input_features = np.array([[SAND, SILT, CLAY, HC, SSM]])
-        rzsm_pred = model.predict(input_features)[0]
-        
-        # Read p-table
-        try:
-            df_p = pd.read_excel(P_TABLE_PATH)
-        except FileNotFoundError:
-            raise HTTPException(
-                status_code=500,
-                detail=f"P-table file not found: {P_TABLE_PATH}"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error reading P-table: {str(e)}"
-            )
-        
-        # Calculate water requirements
+    input_features = np.array([[SAND, SILT, CLAY, HC, SSM]])
+    with metrics.span("rf_predict"):
+        rzsm_pred = ref.model.predict(input_features)[0]
+    
+    # Calculate water requirements
+    with metrics.span("formula"):
         decision, depth = calculate_water_requirements(
-            df_p, 
+            ref.crops, 
             SAND, 
             SILT, 
             CLAY, 
@@ -381,27 +578,79 @@ async def process_irrigation_data(data: IrrigationInput):
             data.cropName
         )
 
-        pump_discharge_rate = calculate_pump_discharge_rate(data.wellDepth, depth, data.wellRadius)
+    return decision, depth
+
+def decision_cache_key(data: IrrigationInput, date_str: str, raster_path: str) -> Optional[tuple]:
+    """
+    Cache key for a field: raster pixel, raster date, reference data version,
+    soil sample, crop and well geometry
+    
+    The reference data version is part of the key, not just the generation:
+    a request that started before a reload can finish after another request
+    has started the new generation, and its result must not be served there.
+    
+    Returns None (no caching) when caching is disabled or the pixel cannot be resolved;
+    the normal path then reports the error.
+    """
+    if not decision_cache.enabled:
+        return None
+    ref = get_reference_data()
+    # A new raster day or a reloaded model starts a fresh cache
+    decision_cache.start_generation((date_str, ref.loaded_at))
+    try:
+        grid = sm_cube.get_day(date_str, source_path=raster_path)
+        transform = grid.transform if grid is not None else raster_pool.transform(raster_path)
+    except Exception:
+        return None
+    soil_key = ref.soil_index.sample_key(data.latitude, data.longitude)
+    if soil_key is None:
+        return None
+    return (
+        pixel_index(transform, data.latitude, data.longitude),
+        date_str,
+        ref.loaded_at,
+        soil_key,
+        data.cropName.lower(),
+        data.wellDepth,
+        data.wellRadius,
+    )
+
+def process_field(data: IrrigationInput) -> ProcessedIrrigationData:
+    """
+    Blocking body of /process; runs on a worker thread
+    
+    Args:
+        data: Irrigation input data
+        
+    Returns:
+        ProcessedIrrigationData: Processed irrigation data with pump decisions
+        
+    Raises:
+        HTTPException: Various errors related to data processing
+    """
+    try:
+        raster_date, date_str, raster_path = resolve_raster_date()
         
-        timestamp = datetime.now().isoformat()
+        # Repeat and neighbour queries skip raster I/O and inference entirely
+        cache_key = decision_cache_key(data, date_str, raster_path)
+        cached = decision_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            decision, depth, pump_discharge_rate = cached
+        else:
+            # Nightly decision rasters turn the whole chain into a pixel read
+            with metrics.span("precomputed_read"):
+                precomputed = get_precomputed_decision(date_str, raster_path, data.cropName, data.latitude, data.longitude)
+            if precomputed is not None:
+                decision, depth = precomputed
+            else:
+                decision, depth = compute_decision(data, date_str, raster_path)
+
+            with metrics.span("formula"):
+                pump_discharge_rate = calculate_pump_discharge_rate(data.wellDepth, depth, data.wellRadius)
+            if cache_key is not None:
+                decision_cache.put(cache_key, (decision, depth, pump_discharge_rate))
         
-        # Prepare the response data
-        processed_data = ProcessedIrrigationData(
-            latitude=data.latitude,
-            longitude=data.longitude,
-            croppedArea=data.croppedArea,
-            cropName=data.cropName,
-            sowingDate=data.sowingDate,
-            basePeriod=data.basePeriod,
-            lastIrrigationDate=data.lastIrrigationDate,
-            pumpHP=data.pumpHP,
-            pumpDischargeRate=pump_discharge_rate,
-            pumpType=data.pumpType,
-            irrigationMethod=data.irrigationMethod,
-            turnOnPump=decision,
-            pumpRunningTime=depth,
-            timestamp=timestamp
-        )
+        processed_data = build_processed_data(data, decision, depth, pump_discharge_rate, raster_date)
         
         logger.info(f"Processing completed for {data.cropName} at ({data.latitude}, {data.longitude})")
         return processed_data
@@ -415,6 +664,417 @@ async def process_irrigation_data(data: IrrigationInput):
             detail=f"Unexpected error during processing: {str(e)}"
         )
 
+def predict_rzsm_many(ref, date_str: str, raster_path: str, fields: List[IrrigationInput]):
+    """
+    Soil lookup and RF RZSM prediction for many fields with one model.predict call
+    
+    Returns:
+        tuple: (soil_values (n, 5), rzsm fraction with NaN where unusable,
+        in-bounds mask, has-data mask, soil-found mask)
+    """
+    latitudes = np.array([f.latitude for f in fields], dtype=np.float64)
+    longitudes = np.array([f.longitude for f in fields], dtype=np.float64)
+
+    with metrics.span("batch_raster_read"):
+        ssm_raw, inside = sample_surface_moisture_many(date_str, raster_path, latitudes, longitudes)
+    with metrics.span("batch_soil_lookup"):
+        soil_values, _, soil_found = ref.soil_index.query(latitudes, longitudes)
+    has_data = np.isfinite(ssm_raw)
+    usable = has_data & soil_found
+
+    # Feature order matches the single-field path: SAND, SILT, CLAY, HC, SSM
+    rzsm_pred = np.full(len(fields), np.nan)
+    if usable.any():
+        features = np.column_stack((
+            soil_values[usable, 0],
+            soil_values[usable, 1],
+            soil_values[usable, 2],
+            soil_values[usable, 4],
+            ssm_raw[usable] / 255,
+        ))
+        with metrics.span("batch_rf_predict"):
+            rzsm_pred[usable] = ref.model.predict(features)
+    return soil_values, rzsm_pred, inside, has_data, soil_found
+
+def field_input_error(data: IrrigationInput, inside: bool, has_data: bool, soil_found: bool, known_crop: bool) -> Optional[str]:
+    """Per-field error message for the batch endpoints, or None if the field is usable"""
+    if not inside:
+        return f"Coordinates ({data.latitude}, {data.longitude}) are out of bounds for the raster"
+    if not has_data:
+        return f"No data at coordinates ({data.latitude}, {data.longitude}) in the raster"
+    if not soil_found:
+        return f"No soil data within {SOIL_MAX_DISTANCE_KM} km of coordinates: ({data.latitude}, {data.longitude})"
+    if not known_crop:
+        return f"Crop '{data.cropName}' not found in the database"
+    return None
+
+def process_batch(batch: BatchIrrigationInput) -> BatchProcessedIrrigationData:
+    """
+    Blocking body of /process/batch; runs on a worker thread
+    
+    Args:
+        batch: List of irrigation inputs
+        
+    Returns:
+        BatchProcessedIrrigationData: One result per input field, in order
+    """
+    fields = batch.fields
+    try:
+        raster_date, date_str, raster_path = resolve_raster_date()
+        ref = get_reference_data()
+
+        soil_values, rzsm_pred, inside, has_data, soil_found = predict_rzsm_many(ref, date_str, raster_path, fields)
+        usable = has_data & soil_found
+
+        # Water requirements and discharge for every usable field in one pass
+        crop_idx = ref.crops.lookup_many(f.cropName for f in fields)
+        known_crop = crop_idx != UNKNOWN_CROP
+        safe_idx = np.where(known_crop, crop_idx, 0)
+        with metrics.span("batch_formula"):
+            decisions, raw = water_requirements(
+                soil_values[:, 0],
+                soil_values[:, 1],
+                soil_values[:, 2],
+                rzsm_pred * 100,
+                ref.crops.p[safe_idx],
+                ref.crops.zr[safe_idx]
+            )
+            # Discharge uses the rounded depth, exactly as the single-field path does
+            depths = np.array(round3(np.nan_to_num(raw)))
+            well_radius = np.array([f.wellRadius for f in fields], dtype=np.float64)
+            discharge = pump_discharge_rate(
+                np.array([f.wellDepth for f in fields], dtype=np.float64),
+                depths,
+                well_radius
+            )
+            discharge[100 - well_radius <= 0] = np.nan
+
+        results = []
+        for i, data in enumerate(fields):
+            error = field_input_error(data, inside[i], has_data[i], soil_found[i], known_crop[i])
+            if error is None and not np.isfinite(raw[i]):
+                error = f"Error calculating water requirements for crop '{data.cropName}'"
+            elif error is None and not np.isfinite(discharge[i]):
+                error = f"Error calculating pump discharge rate for well radius {data.wellRadius}"
+
+            if error is not None:
+                results.append(BatchIrrigationResult(index=i, error=error))
+                continue
+            results.append(BatchIrrigationResult(
+                index=i,
+                result=build_processed_data(
+                    data,
+                    bool(decisions[i]),
+                    float(depths[i]),
+                    round(float(discharge[i]), 3),
+                    raster_date
+                )
+            ))
+
+        logger.info(f"Batch processing completed for {len(fields)} fields ({int(usable.sum())} predicted)")
+        return BatchProcessedIrrigationData(
+            rasterDate=raster_date.strftime('%Y-%m-%d'),
+            results=results
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error during batch processing: {str(e)}"
+        )
+
+def schedule_fields(request: ScheduleInput) -> ScheduleResponse:
+    """
+    Blocking body of /schedule; runs on a worker thread
+    
+    RZSM is predicted for the raster date like /process/batch, then the water
+    balance runs from the raster date, through the days already past (where
+    only the reported lastIrrigationDate is applied), to the end of the horizon.
+    
+    Args:
+        request: Fields and scheduling options
+        
+    Returns:
+        ScheduleResponse: Irrigation days and depths (mm) per field, with the
+        projected root zone moisture (percent) for each day of the horizon
+    """
+    fields = request.fields
+    try:
+        raster_date, date_str, raster_path = resolve_raster_date()
+        ref = get_reference_data()
+
+        soil_values, rzsm_pred, inside, has_data, soil_found = predict_rzsm_many(ref, date_str, raster_path, fields)
+
+        crop_idx = ref.crops.lookup_many(f.cropName for f in fields)
+        known_crop = crop_idx != UNKNOWN_CROP
+        safe_idx = np.where(known_crop, crop_idx, 0)
+
+        start_date = datetime.now().date()
+        first_day = max((start_date - raster_date.date()).days, 0)
+        n_days = first_day + request.horizonDays
+
+        def day_offsets(dates):
+            return np.array([
+                (datetime.strptime(d, '%Y-%m-%d').date() - raster_date.date()).days for d in dates
+            ], dtype=np.int64)
+
+        days_since_sowing = -day_offsets(f.sowingDate for f in fields)
+        last_irrigation = day_offsets(f.lastIrrigationDate for f in fields)
+        known_irrigation = np.where((last_irrigation >= 0) & (last_irrigation < n_days), last_irrigation, -1)
+
+        with metrics.span("water_balance"):
+            schedule = schedule_irrigation(
+                soil_values[:, 0],
+                soil_values[:, 1],
+                soil_values[:, 2],
+                rzsm_pred * 100,
+                ref.crops.p[safe_idx],
+                ref.crops.zr[safe_idx],
+                days_since_sowing,
+                np.array([f.basePeriod for f in fields], dtype=np.float64),
+                n_days,
+                first_schedulable_day=first_day,
+                known_irrigation_day=known_irrigation,
+                et0=request.referenceET or SCHEDULE_REFERENCE_ET
+            )
+
+        results = []
+        for i, data in enumerate(fields):
+            error = field_input_error(data, inside[i], has_data[i], soil_found[i], known_crop[i])
+            if error is None and not np.all(np.isfinite(schedule.theta_percent[i])):
+                error = f"Error calculating water balance for crop '{data.cropName}'"
+            if error is not None:
+                results.append(FieldSchedule(index=i, error=error))
+                continue
+
+            days = np.flatnonzero(schedule.irrigate[i, first_day:]) + first_day
+            results.append(FieldSchedule(
+                index=i,
+                irrigations=[
+                    ScheduledIrrigation(
+                        date=(raster_date + timedelta(days=int(day))).strftime('%Y-%m-%d'),
+                        depth=round(float(schedule.depth_mm[i, day]), 3)
+                    )
+                    for day in days
+                ],
+                rootZoneMoisture=round3(schedule.theta_percent[i, first_day:])
+            ))
+
+        logger.info(f"Scheduled {len(fields)} fields over {request.horizonDays} days from {start_date}")
+        return ScheduleResponse(
+            rasterDate=raster_date.strftime('%Y-%m-%d'),
+            startDate=start_date.isoformat(),
+            horizonDays=request.horizonDays,
+            results=results
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Unexpected error during scheduling: {str(e)}"
+        )
+
+def query_timeseries(latitude: float, longitude: float, start: datetime, end: datetime) -> TimeSeriesResponse:
+    """
+    Blocking body of /timeseries; runs on a worker thread
+    
+    SSM comes from one contiguous read per year of the pixel-major archive and
+    RZSM for every day is predicted with a single model.predict call.
+    """
+    try:
+        dates, raw = sm_timeseries.pixel_series(latitude, longitude, start.date(), end.date())
+    except PixelOutOfBounds as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    ref = get_reference_data()
+    soil = ref.find_soil(latitude, longitude)
+    if soil is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No soil data within {SOIL_MAX_DISTANCE_KM} km of coordinates: ({latitude}, {longitude})"
+        )
+    
+    ssm = raw / 255
+    rzsm = np.empty(0)
+    if len(ssm):
+        features = np.column_stack((
+            np.full(len(ssm), soil.sand),
+            np.full(len(ssm), soil.silt),
+            np.full(len(ssm), soil.clay),
+            np.full(len(ssm), soil.hc),
+            ssm,
+        ))
+        rzsm = ref.model.predict(features)
+    
+    return TimeSeriesResponse(
+        latitude=latitude,
+        longitude=longitude,
+        fromDate=start.strftime('%Y-%m-%d'),
+        toDate=end.strftime('%Y-%m-%d'),
+        points=[
+            TimeSeriesPoint(date=day.isoformat(), ssm=round(float(s), 4), rzsm=round(float(r), 4))
+            for day, s, r in zip(dates, ssm, rzsm)
+        ]
+    )
+
+async def run_in_worker(fn, *args):
+    """Run blocking work on the worker pool, turning saturation into a 503"""
+    try:
+        return await worker_pool.run(fn, *args)
+    except PoolSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(WORKER_RETRY_AFTER)}
+        )
+
+@app.post("/process", response_model=ProcessedIrrigationData, responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def process_irrigation_data(data: IrrigationInput):
+    """
+    Process the irrigation data received from Next.js server action
+    
+    Args:
+        data: Irrigation input data
+        
+    Returns:
+        ProcessedIrrigationData: Processed irrigation data with pump decisions
+        
+    Raises:
+        HTTPException: Various errors related to data processing, 503 when the worker pool is saturated
+    """
+    result = await run_in_worker(process_field, data)
+    decision_log.record(result.dict(), data.fieldId)
+    return result
+
+@app.post("/process/batch", response_model=BatchProcessedIrrigationData, responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 413: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def process_irrigation_batch(batch: BatchIrrigationInput):
+    """
+    Process many fields in one call
+    
+    All fields share the same raster date, so their pixels are sampled in one
+    vectorized read and RZSM is predicted with a single model.predict call.
+    A field that cannot be processed gets an error entry instead of failing
+    the whole batch.
+    
+    Args:
+        batch: List of irrigation inputs
+        
+    Returns:
+        BatchProcessedIrrigationData: One result per input field, in order
+    """
+    if len(batch.fields) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(batch.fields)} fields exceeds the limit of {MAX_BATCH_SIZE}"
+        )
+    response = await run_in_worker(process_batch, batch)
+    for item in response.results:
+        if item.result is not None:
+            decision_log.record(item.result.dict(), batch.fields[item.index].fieldId)
+    return response
+
+@app.post("/schedule", response_model=ScheduleResponse, responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 413: {"model": ErrorResponse}, 500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def schedule_irrigation_fields(request: ScheduleInput):
+    """
+    Plan irrigation for the next 7-14 days with a daily soil water balance
+    
+    Args:
+        request: Fields, horizon and optional reference evapotranspiration
+        
+    Returns:
+        ScheduleResponse: One schedule per input field, in order
+    """
+    if len(request.fields) > MAX_SCHEDULE_FIELDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Schedule request of {len(request.fields)} fields exceeds the limit of {MAX_SCHEDULE_FIELDS}"
+        )
+    return await run_in_worker(schedule_fields, request)
+
+@app.get("/timeseries", response_model=TimeSeriesResponse, responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def get_timeseries(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude"),
+    from_date: str = Query(..., alias="from", description="First day, YYYY-MM-DD"),
+    to_date: str = Query(..., alias="to", description="Last day, YYYY-MM-DD")
+):
+    """
+    Daily surface soil moisture and predicted root-zone soil moisture for a location
+    
+    Days missing from the archive or without data at the pixel are left out.
+    
+    Args:
+        lat: Latitude
+        lon: Longitude
+        from_date: First day (inclusive)
+        to_date: Last day (inclusive)
+        
+    Returns:
+        TimeSeriesResponse: One point per available day, in date order
+    """
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d')
+        end = datetime.strptime(to_date, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (end - start).days + 1 > MAX_TIMESERIES_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Requested range exceeds the limit of {MAX_TIMESERIES_DAYS} days"
+        )
+    return await run_in_worker(query_timeseries, lat, lon, start, end)
+
+@app.get("/decisions", responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def get_decisions(
+    fieldId: Optional[str] = Query(None, description="Field identifier"),
+    crop: Optional[str] = Query(None, description="Crop name"),
+    from_date: Optional[str] = Query(None, alias="from", description="Earliest day, YYYY-MM-DD"),
+    to_date: Optional[str] = Query(None, alias="to", description="Latest day, YYYY-MM-DD"),
+    minLat: Optional[float] = Query(None),
+    minLon: Optional[float] = Query(None),
+    maxLat: Optional[float] = Query(None),
+    maxLon: Optional[float] = Query(None),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Query the decision history
+    
+    Filters are combined; a bounding box needs all four of minLat, minLon,
+    maxLat and maxLon.
+    
+    Returns:
+        dict: Matching decisions, newest first
+    """
+    try:
+        # Normalised to zero-padded ISO dates, which the log compares as text
+        from_date, to_date = (
+            datetime.strptime(value, '%Y-%m-%d').date().isoformat() if value is not None else None
+            for value in (from_date, to_date)
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    
+    bounds = (minLat, minLon, maxLat, maxLon)
+    if any(b is not None for b in bounds) and not all(b is not None for b in bounds):
+        raise HTTPException(status_code=400, detail="Bounding box needs minLat, minLon, maxLat and maxLon")
+    bbox = bounds if all(b is not None for b in bounds) else None
+    
+    if not decision_log.enabled:
+        raise HTTPException(status_code=503, detail="Decision log is disabled; see the startup log")
+    decisions = await run_in_worker(
+        decision_log.query, fieldId, crop, from_date, to_date, bbox, limit
+    )
+    return {"count": len(decisions), "decisions": decisions}
+
 @app.get("/status")
 async def get_system_status():
     """
@@ -426,10 +1086,17 @@ async def get_system_status():
     try:
         validate_files_exist()
         
+        ref = reference_store.get()
+        
         return {
             "status": "operational",
             "timestamp": datetime.now().isoformat(),
-            "files_validated": True
+            "files_validated": True,
+            "reference_data_loaded_at": ref.loaded_at,
+            "worker_pool": worker_pool.stats(),
+            "decision_cache": decision_cache.stats(),
+            "raster_index": raster_index.stats(),
+            "decision_log": decision_log.stats()
         }
     except HTTPException as e:
         return {
@@ -437,6 +1104,22 @@ async def get_system_status():
             "timestamp": datetime.now().isoformat(),
             "error": e.detail
         }
+    except RuntimeError as e:
+        return {
+            "status": "error",
+            "timestamp": datetime.now().isoformat(),
+            "error": str(e)
+        }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Decision cache hit/miss metrics
+    
+    Returns:
+        dict: Cache size and counters
+    """
+    return decision_cache.stats()
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,447 @@
+"""
+Latency benchmark for the irrigation API.
+
+Builds a synthetic environment (soil table, p-table, RF model and daily
+GeoTIFFs of configurable size) in a scratch directory, points the app at it
+through its environment variables and replays a mix of IrrigationInput
+records against it in-process:
+
+    stages      the steps of /process called directly for every field:
+                raster read, soil/crop lookup, RF predict, formulas
+    endpoints   /process and /process/batch driven through the ASGI app
+                at a configurable concurrency
+
+For each stage and endpoint the p50/p95/p99 latency, throughput and RSS
+are reported. Results are written as JSON so runs can be compared;
+--baseline prints the change against an earlier result file.
+
+Usage:
+    python benchmark.py --out bench.json
+    python benchmark.py --raster-size 2000 2000 --soil-points 50000 --requests 2000 --concurrency 16
+    python benchmark.py --out new.json --baseline bench.json
+
+The endpoint runs need httpx, which is in the project's dev dependency group
+(uv sync installs it; with pip, pip install httpx).
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Same extent as the converted SMAP rasters
+BBOX = (81.3, 17.8, 87.6, 22.6)
+
+# (crop, p, Zr); Zr ranges exercise the same parsing as the real p-table
+CROPS = [
+    ('Rice', 0.2, '0.5-1.0'),
+    ('Wheat', 0.55, '1.0-1.5'),
+    ('Maize', 0.55, '1.0-1.7'),
+    ('Groundnut', 0.5, '0.5-1.0'),
+    ('Mustard', 0.6, 1.0),
+    ('Potato', 0.35, '0.4-0.6'),
+]
+CROP_WEIGHTS = [0.4, 0.15, 0.15, 0.1, 0.1, 0.1]
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        # Peak rather than current RSS, but better than nothing off Linux
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def summarize(latencies_s: List[float], wall_s: float, items: int, rss_before: float, errors: int = 0) -> Dict[str, Any]:
+    """Latency percentiles (ms), throughput and RSS for one measured run"""
+    ms = np.asarray(latencies_s, dtype=np.float64) * 1000
+    rss_after = rss_mb()
+    if not len(ms):
+        return {"count": 0, "errors": errors}
+    return {
+        "count": int(len(ms)),
+        "errors": errors,
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "throughput_per_s": round(items / wall_s, 2) if wall_s > 0 else None,
+        "rss_mb": round(rss_after, 1),
+        "rss_delta_mb": round(rss_after - rss_before, 1),
+    }
+
+
+def build_environment(work_dir: str, args) -> Dict[str, str]:
+    """
+    Write synthetic reference files and rasters under work_dir
+
+    Returns:
+        dict: Environment variables that point the app at them
+    """
+    import joblib
+    import pandas as pd
+    import rasterio
+    from rasterio.transform import from_bounds
+    from sklearn.ensemble import RandomForestRegressor
+
+    from forest_compile import CompiledForest, file_sha256
+    from sm_cube import ingest_raster, raster_path_for
+
+    rng = np.random.default_rng(args.seed)
+    min_lon, min_lat, max_lon, max_lat = BBOX
+
+    # Soil samples with texture fractions that sum to 100
+    n = args.soil_points
+    sand = rng.uniform(20, 70, n)
+    clay = rng.uniform(5, 40, n) * (100 - sand) / 100
+    soil = pd.DataFrame({
+        'LATITUDE': rng.uniform(min_lat, max_lat, n),
+        'LONGITUDE': rng.uniform(min_lon, max_lon, n),
+        'SAND': sand,
+        'SILT': 100 - sand - clay,
+        'CLAY': clay,
+        'BD': rng.uniform(1.2, 1.7, n),
+        'HC': rng.uniform(0.5, 30, n),
+    })
+    excel_path = os.path.join(work_dir, 'soil.xlsx')
+    soil.to_excel(excel_path, index=False)
+
+    p_table_path = os.path.join(work_dir, 'p_table.xlsx')
+    pd.DataFrame(CROPS, columns=['crop_name', 'p', 'Zr']).to_excel(p_table_path, index=False)
+
+    # RZSM model over SAND, SILT, CLAY, HC, SSM
+    X = np.column_stack((soil['SAND'], soil['SILT'], soil['CLAY'], soil['HC'], rng.uniform(0, 1, n)))
+    y = 0.6 * X[:, 4] + 0.002 * X[:, 2] + rng.normal(0, 0.02, n)
+    model = RandomForestRegressor(n_estimators=args.trees, max_depth=args.max_depth, random_state=args.seed)
+    model.fit(X, y)
+    model_path = os.path.join(work_dir, 'rf_rzsm_model.pkl')
+    joblib.dump(model, model_path)
+    compiled_path = os.path.join(work_dir, 'rf_rzsm_model.npz')
+    if not args.sklearn_model:
+        CompiledForest.from_sklearn(model, source_sha256=file_sha256(model_path)).save(compiled_path)
+
+    # Daily rasters ending three days ago, where /process looks
+    raster_dir = os.path.join(work_dir, 'sm_tif')
+    cube_dir = os.path.join(work_dir, 'sm_cube')
+    height, width = args.raster_size
+    transform = from_bounds(min_lon, min_lat, max_lon, max_lat, width, height)
+    for offset in range(args.days):
+        date_str = (datetime.now() - timedelta(days=3 + offset)).strftime('%Y%m%d')
+        path = raster_path_for(raster_dir, date_str)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        band = rng.integers(0, 255, size=(height, width), dtype=np.uint8)
+        with rasterio.open(
+            path, 'w', driver='GTiff', height=height, width=width, count=1, dtype='uint8',
+            crs='EPSG:4326', transform=transform, tiled=True, blockxsize=256, blockysize=256,
+        ) as dst:
+            dst.write(band, 1)
+        if args.cube:
+            ingest_raster(path, cube_dir, date_str)
+
+    return {
+        'EXCEL_PATH': excel_path,
+        'P_TABLE_PATH': p_table_path,
+        'MODEL_PATH': model_path,
+        'COMPILED_MODEL_PATH': compiled_path,
+        'RASTER_BASE_PATH': raster_dir,
+        'SM_CUBE_PATH': cube_dir,
+        'SM_TIMESERIES_PATH': os.path.join(work_dir, 'sm_timeseries'),
+        'DECISION_RASTER_PATH': os.path.join(work_dir, 'decision_rasters'),
+        'DECISION_LOG_PATH': os.path.join(work_dir, 'decisions.sqlite3'),
+        'DECISION_CACHE_SIZE': str(args.cache_size),
+        'REFERENCE_RELOAD_INTERVAL': '0',
+        'RASTER_INDEX_REFRESH_INTERVAL': '0',
+        'WORKER_QUEUE_DEPTH': str(max(32, args.concurrency * 2)),
+        'MAX_BATCH_SIZE': str(max(1000, args.batch_size)),
+    }
+
+
+def make_inputs(count: int, args) -> List[Dict[str, Any]]:
+    """
+    IrrigationInput payloads drawn from a fixed pool of farms
+
+    Repeated farms reflect real traffic, where the same fields are checked
+    again through the day.
+    """
+    rng = np.random.default_rng(args.seed + 1)
+    min_lon, min_lat, max_lon, max_lat = BBOX
+    farm_lat = rng.uniform(min_lat, max_lat, args.farms)
+    farm_lon = rng.uniform(min_lon, max_lon, args.farms)
+    farm_crop = rng.choice(len(CROPS), size=args.farms, p=CROP_WEIGHTS)
+    today = datetime.now().date()
+
+    inputs = []
+    for farm in rng.integers(0, args.farms, count):
+        sowing = today - timedelta(days=int(rng.integers(10, 100)))
+        inputs.append({
+            'latitude': float(farm_lat[farm]),
+            'longitude': float(farm_lon[farm]),
+            'croppedArea': float(rng.uniform(0.5, 5)),
+            'cropName': CROPS[farm_crop[farm]][0],
+            'sowingDate': sowing.isoformat(),
+            'basePeriod': 120,
+            'lastIrrigationDate': (today - timedelta(days=int(rng.integers(1, 10)))).isoformat(),
+            'pumpHP': float(rng.choice([3, 5, 7.5])),
+            'wellDepth': float(rng.uniform(10, 60)),
+            'wellRadius': float(rng.uniform(0.5, 5)),
+            'pumpType': 'submersible',
+            'irrigationMethod': 'flood',
+            'fieldId': f"farm-{farm}",
+        })
+    return inputs
+
+
+def bench_stages(app_module, inputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Time each step of the single-field pipeline separately
+
+    Every stage runs over all fields before the next starts, so the RSS
+    reported for a stage is what that stage added.
+    """
+    _, date_str, raster_path = app_module.resolve_raster_date()
+    ref = app_module.get_reference_data()
+    results = {}
+
+    # Raster read
+    rss_before = rss_mb()
+    latencies, ssm, errors = [], [], 0
+    start = time.perf_counter()
+    for field in inputs:
+        t0 = time.perf_counter()
+        try:
+            ssm.append(app_module.get_surface_soil_moisture(date_str, raster_path, field['latitude'], field['longitude']) / 255)
+        except Exception:
+            ssm.append(None)
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+    results['raster_read'] = summarize(latencies, time.perf_counter() - start, len(inputs), rss_before, errors)
+
+    # Soil and crop lookup
+    rss_before = rss_mb()
+    latencies, soils, errors = [], [], 0
+    start = time.perf_counter()
+    for field in inputs:
+        t0 = time.perf_counter()
+        soil = ref.find_soil(field['latitude'], field['longitude'])
+        ref.crops.lookup(field['cropName'])
+        latencies.append(time.perf_counter() - t0)
+        soils.append(soil)
+        errors += soil is None
+    results['lookup'] = summarize(latencies, time.perf_counter() - start, len(inputs), rss_before, errors)
+
+    usable = [i for i in range(len(inputs)) if ssm[i] is not None and soils[i] is not None]
+
+    # RF predict, one row per call as /process does
+    rss_before = rss_mb()
+    latencies, rzsm = [], {}
+    start = time.perf_counter()
+    for i in usable:
+        soil = soils[i]
+        features = np.array([[soil.sand, soil.silt, soil.clay, soil.hc, ssm[i]]])
+        t0 = time.perf_counter()
+        rzsm[i] = ref.model.predict(features)[0]
+        latencies.append(time.perf_counter() - t0)
+    results['rf_predict'] = summarize(latencies, time.perf_counter() - start, len(usable), rss_before)
+
+    # Water requirements and discharge
+    rss_before = rss_mb()
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in usable:
+        soil, field = soils[i], inputs[i]
+        t0 = time.perf_counter()
+        try:
+            _, depth = app_module.calculate_water_requirements(
+                ref.crops, soil.sand, soil.silt, soil.clay, rzsm[i] * 100, field['cropName']
+            )
+            app_module.calculate_pump_discharge_rate(field['wellDepth'], depth, field['wellRadius'])
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+    results['formula'] = summarize(latencies, time.perf_counter() - start, len(usable), rss_before, errors)
+
+    return results
+
+
+async def _drive(client, requests: List[tuple], concurrency: int):
+    """Send (path, body) requests with at most `concurrency` in flight"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    latencies, statuses = [], {}
+
+    async def worker():
+        while True:
+            try:
+                path, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t0 = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append(time.perf_counter() - t0)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses
+
+
+async def bench_endpoints(app_module, inputs: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Replay the inputs through /process and /process/batch"""
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("Endpoint benchmarks need httpx: uv sync (dev group) or pip install httpx")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Warm-up so one-off costs (raster open, first predict) are not in the numbers
+        await _drive(client, [('/process', body) for body in inputs[:args.warmup]], 1)
+
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        latencies, statuses = await _drive(client, [('/process', body) for body in inputs], args.concurrency)
+        wall = time.perf_counter() - start
+        results['process'] = summarize(latencies, wall, len(inputs), rss_before, len(inputs) - statuses.get(200, 0))
+        results['process']['statuses'] = {str(k): v for k, v in statuses.items()}
+
+        batches = [
+            ('/process/batch', {'fields': inputs[i:i + args.batch_size]})
+            for i in range(0, len(inputs), args.batch_size)
+        ]
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        latencies, statuses = await _drive(client, batches, args.concurrency)
+        wall = time.perf_counter() - start
+        results['process_batch'] = summarize(latencies, wall, len(batches), rss_before, len(batches) - statuses.get(200, 0))
+        results['process_batch']['statuses'] = {str(k): v for k, v in statuses.items()}
+        results['process_batch']['fields_per_s'] = round(len(inputs) / wall, 2) if wall > 0 else None
+    return results
+
+
+async def run_benchmark(app_module, args) -> Dict[str, Any]:
+    await app_module.startup_event()
+    try:
+        inputs = make_inputs(args.requests, args)
+        report = {'stages': bench_stages(app_module, inputs)}
+        if not args.skip_endpoints:
+            report['endpoints'] = await bench_endpoints(app_module, inputs, args)
+        if app_module.decision_cache.enabled:
+            report['decision_cache'] = app_module.decision_cache.stats()
+        return report
+    finally:
+        await app_module.shutdown_event()
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Percent change of the latency percentiles against a baseline report"""
+    lines = []
+    for section in ('stages', 'endpoints'):
+        for name, stats in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            changes = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if before.get(key) and stats.get(key) is not None:
+                    changes.append(f"{key[:-3]} {stats[key]:.3f} ms ({(stats[key] / before[key] - 1) * 100:+.1f}%)")
+            lines.append(f"{section}.{name}: {', '.join(changes)}")
+    return lines
+
+
+def benchmark_in(work_dir: str, args) -> Dict[str, Any]:
+    """Build the synthetic environment in work_dir, import the app against it and run the benchmark"""
+    t0 = time.perf_counter()
+    env = build_environment(work_dir, args)
+    setup_s = time.perf_counter() - t0
+
+    # The app reads its configuration at import time
+    os.environ.update(env)
+    app_module = importlib.import_module('app')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = asyncio.run(run_benchmark(app_module, args))
+    report.update({
+        'timestamp': datetime.now().isoformat(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('out', 'baseline')},
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'setup_s': round(setup_s, 2),
+            'work_dir': args.work_dir,
+        },
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the irrigation API on synthetic data")
+    parser.add_argument('--out', default='benchmark.json', help="Where to write the JSON report")
+    parser.add_argument('--baseline', help="Earlier report to compare against")
+    parser.add_argument('--work-dir', help="Keep the synthetic data here instead of a temporary directory")
+    parser.add_argument('--raster-size', type=int, nargs=2, default=(500, 600), metavar=('HEIGHT', 'WIDTH'))
+    parser.add_argument('--days', type=int, default=3, help="Daily rasters to generate")
+    parser.add_argument('--cube', action='store_true', help="Also ingest the rasters into the soil moisture cube")
+    parser.add_argument('--soil-points', type=int, default=5000)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--max-depth', type=int, default=12)
+    parser.add_argument('--sklearn-model', action='store_true', help="Serve the sklearn model instead of the flattened forest")
+    parser.add_argument('--farms', type=int, default=500, help="Distinct farms the requests are drawn from")
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--cache-size', type=int, default=0, help="Decision cache entries; 0 disables it")
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+        report = benchmark_in(args.work_dir, args)
+    else:
+        # Removed afterwards, along with the rasters, cube and decision log written into it
+        with tempfile.TemporaryDirectory(prefix='irrigation-bench-') as work_dir:
+            report = benchmark_in(work_dir, args)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    for section in ('stages', 'endpoints'):
+        for name, stats in report.get(section, {}).items():
+            if stats.get('count'):
+                print(f"{section}.{name}: p50 {stats['p50_ms']:.3f} ms, p95 {stats['p95_ms']:.3f} ms, "
+                      f"p99 {stats['p99_ms']:.3f} ms, {stats['throughput_per_s']}/s, RSS {stats['rss_mb']} MB")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nAgainst {args.baseline}:")
+        for line in compare(report, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
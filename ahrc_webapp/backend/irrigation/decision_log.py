@@ -0,0 +1,250 @@
+"""
+Append-only log of irrigation decisions.
+
+Decisions are stored in SQLite in WAL mode, so history queries can run
+concurrently with writes and a crash never leaves a half-written record.
+Request handlers only put records on an in-memory queue. A background
+writer thread drains the queue and inserts each batch in one transaction,
+keeping disk I/O off the request path. Rows are only ever inserted.
+
+Indexes cover the supported queries: by field, by crop, by date range and
+by a latitude/longitude bounding box.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id TEXT PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    raster_date TEXT,
+    field_id TEXT,
+    crop TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    turn_on_pump INTEGER NOT NULL,
+    pump_running_time REAL,
+    pump_discharge_rate REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decisions_recorded_at ON decisions (recorded_at);
+CREATE INDEX IF NOT EXISTS idx_decisions_field ON decisions (field_id, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_decisions_crop ON decisions (crop, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_decisions_location ON decisions (latitude, longitude);
+"""
+
+COLUMNS = (
+    'id', 'recorded_at', 'raster_date', 'field_id', 'crop', 'latitude', 'longitude',
+    'turn_on_pump', 'pump_running_time', 'pump_discharge_rate', 'payload'
+)
+
+_STOP = object()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL keeps committed transactions across a process crash
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def make_record(payload: Dict[str, Any], field_id: Optional[str] = None) -> Tuple:
+    """Row for one processed field; payload is the full response body"""
+    return (
+        str(uuid.uuid4()),
+        payload.get('timestamp') or datetime.now().isoformat(),
+        payload.get('rasterDate'),
+        field_id,
+        str(payload['cropName']).lower(),
+        float(payload['latitude']),
+        float(payload['longitude']),
+        int(bool(payload['turnOnPump'])),
+        payload.get('pumpRunningTime'),
+        payload.get('pumpDischargeRate'),
+        json.dumps(payload),
+    )
+
+
+class DecisionLog:
+    """SQLite-backed decision history with a background batch writer"""
+
+    def __init__(self, db_path: str, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._local = threading.local()
+        # Cleared when open() fails; records are then discarded
+        self.enabled = True
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def open(self):
+        """
+        Create the schema and start the writer thread
+
+        If the database cannot be created (such as an unwritable directory),
+        the error is logged and decision logging is disabled rather than
+        failing startup.
+        """
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = _connect(self.db_path)
+            try:
+                conn.executescript(SCHEMA)
+                conn.commit()
+            finally:
+                conn.close()
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Decision log disabled, cannot open {self.db_path}: {str(e)}")
+            self.enabled = False
+            return
+        self.enabled = True
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="decision-log-writer", daemon=True)
+            self._writer.start()
+
+    def close(self, timeout: float = 10.0):
+        """Flush queued records and stop the writer"""
+        if self._writer is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Decision log queue full at shutdown; queued records are lost")
+            return
+        self._writer.join(timeout=timeout)
+        self._writer = None
+
+    def record(self, payload: Dict[str, Any], field_id: Optional[str] = None):
+        """
+        Queue one decision for writing; never blocks
+
+        If the writer has fallen behind and the queue is full the record is
+        dropped and counted rather than delaying the request.
+        """
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait(make_record(payload, field_id))
+        except queue.Full:
+            self.dropped += 1
+        except Exception as e:
+            logger.error(f"Could not queue decision record: {str(e)}")
+            self.failed += 1
+
+    def _write_loop(self):
+        conn = _connect(self.db_path)
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        sql = f"INSERT INTO decisions ({', '.join(COLUMNS)}) VALUES ({placeholders})"
+        try:
+            while True:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = any(item is _STOP for item in batch)
+                rows = [item for item in batch if item is not _STOP]
+                if rows:
+                    try:
+                        with conn:
+                            conn.executemany(sql, rows)
+                        self.written += len(rows)
+                    except sqlite3.Error as e:
+                        logger.error(f"Failed to write {len(rows)} decision records: {str(e)}")
+                        self.failed += len(rows)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = _connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def query(
+        self,
+        field_id: Optional[str] = None,
+        crop: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Most recent decisions matching every given filter
+
+        Args:
+            field_id: Field identifier sent with the request
+            crop: Crop name (case-insensitive)
+            start: Earliest recorded_at, ISO date or datetime (inclusive)
+            end: Latest recorded_at, ISO date or datetime (inclusive)
+            bbox: (min_lat, min_lon, max_lat, max_lon)
+            limit: Maximum number of rows
+
+        Returns:
+            list: Stored response bodies, newest first, each with its record id
+        """
+        clauses, params = [], []
+        if field_id is not None:
+            clauses.append("field_id = ?")
+            params.append(field_id)
+        if crop is not None:
+            clauses.append("crop = ?")
+            params.append(crop.lower())
+        if start is not None:
+            clauses.append("recorded_at >= ?")
+            params.append(start)
+        if end is not None:
+            if len(end) == 10:
+                # A bare date covers the whole day: everything before the next midnight
+                clauses.append("recorded_at < ?")
+                params.append((date.fromisoformat(end) + timedelta(days=1)).isoformat())
+            else:
+                clauses.append("recorded_at <= ?")
+                params.append(end)
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            clauses.append("latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?")
+            params.extend((min_lat, max_lat, min_lon, max_lon))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._reader().execute(
+            f"SELECT id, field_id, payload FROM decisions {where} ORDER BY recorded_at DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [{'id': row['id'], 'fieldId': row['field_id'], **json.loads(row['payload'])} for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
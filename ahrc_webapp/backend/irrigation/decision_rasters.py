@@ -0,0 +1,200 @@
+"""
+Precomputed irrigation decision rasters.
+
+Most of the /process pipeline only depends on location and the day's SMAP
+raster. This nightly job runs SSM -> soil lookup -> RF RZSM -> water
+requirements over every pixel of the day's raster and writes, for each day:
+
+    {out_dir}/{date}/rzsm.tif                 predicted RZSM (float32)
+    {out_dir}/{date}/{crop}_decision.tif      1 = irrigate, 0 = don't, 255 = no data
+    {out_dir}/{date}/{crop}_depth.tif         RAW in mm (float64, NaN = no data)
+
+/process then only needs a pixel read from the crop's rasters, and the
+decision rasters can be served directly as map tiles.
+
+Usage:
+    python decision_rasters.py --date 20250507
+"""
+import argparse
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from reference_data import ReferenceData, load_reference_data
+from sm_cube import raster_path_for
+from water_requirements import water_requirements
+
+logger = logging.getLogger(__name__)
+
+DECISION_NODATA = 255
+
+
+def crop_slug(crop_name: str) -> str:
+    """File-name-safe crop name: only [a-z0-9_-] survive, so a name cannot leave the day directory"""
+    slug = re.sub(r'[^a-z0-9_-]+', '_', crop_name.strip().lower()).strip('_')
+    if not slug:
+        raise ValueError(f"Crop name {crop_name!r} has no file-name-safe characters")
+    return slug
+
+
+def decision_raster_paths(out_dir: str, date_str: str, crop_name: str) -> Tuple[str, str]:
+    """Paths of the (decision, depth) rasters for a date and crop"""
+    slug = crop_slug(crop_name)
+    day_dir = os.path.join(out_dir, date_str)
+    return (
+        os.path.join(day_dir, f"{slug}_decision.tif"),
+        os.path.join(day_dir, f"{slug}_depth.tif"),
+    )
+
+
+def _pixel_centres(transform, row0: int, rows: int, width: int):
+    """Latitude/longitude of every pixel centre in a block of rows"""
+    cols, rows_idx = np.meshgrid(np.arange(width) + 0.5, np.arange(row0, row0 + rows) + 0.5)
+    lon, lat = transform * (cols.ravel(), rows_idx.ravel())
+    return np.asarray(lat), np.asarray(lon)
+
+
+def predict_block(ref: ReferenceData, ssm_raw: np.ndarray, lat: np.ndarray, lon: np.ndarray, nodata: Optional[float]):
+    """
+    Run soil lookup and RF prediction for one block of pixels
+
+    Returns:
+        tuple: (soil_values, rzsm, valid) flattened to the block's pixel count
+    """
+    ssm_raw = ssm_raw.ravel().astype(np.float64)
+    valid = np.isfinite(ssm_raw)
+    if nodata is not None:
+        valid &= ssm_raw != nodata
+
+    soil_values, _, soil_found = ref.soil_index.query(lat, lon)
+    valid &= soil_found
+
+    rzsm = np.full(ssm_raw.shape, np.nan)
+    if valid.any():
+        features = np.column_stack((
+            soil_values[valid, 0],
+            soil_values[valid, 1],
+            soil_values[valid, 2],
+            soil_values[valid, 4],
+            ssm_raw[valid] / 255,
+        ))
+        rzsm[valid] = ref.model.predict(features)
+    return soil_values, rzsm, valid
+
+
+def build_decision_rasters(
+    ref: ReferenceData,
+    raster_path: str,
+    out_dir: str,
+    date_str: str,
+    block_rows: int = 256
+) -> str:
+    """
+    Compute decision and depth rasters for every crop in the p-table
+
+    The source raster is processed in blocks of block_rows rows, so memory is
+    bounded by the block size rather than the raster size. Outputs are written
+    under temporary names and renamed into place once complete.
+
+    Returns:
+        str: Directory holding the day's rasters
+    """
+    day_dir = os.path.join(out_dir, date_str)
+    os.makedirs(day_dir, exist_ok=True)
+
+    with rasterio.open(raster_path) as src:
+        profile = {
+            'driver': 'GTiff',
+            'height': src.height,
+            'width': src.width,
+            'count': 1,
+            'crs': src.crs,
+            'transform': src.transform,
+            'tiled': True,
+            'blockxsize': 256,
+            'blockysize': 256,
+            'compress': 'deflate',
+        }
+
+        outputs = {'rzsm': (os.path.join(day_dir, 'rzsm.tif'), 'float32', np.nan)}
+        for crop_name in ref.crops.names:
+            decision_path, depth_path = decision_raster_paths(out_dir, date_str, crop_name)
+            outputs[(crop_name, 'decision')] = (decision_path, 'uint8', DECISION_NODATA)
+            outputs[(crop_name, 'depth')] = (depth_path, 'float64', np.nan)
+
+        sinks = {
+            key: rasterio.open(path + '.tmp', 'w', **profile, dtype=dtype, nodata=nodata)
+            for key, (path, dtype, nodata) in outputs.items()
+        }
+        try:
+            for row0 in range(0, src.height, block_rows):
+                rows = min(block_rows, src.height - row0)
+                window = Window(0, row0, src.width, rows)
+                shape = (rows, src.width)
+
+                ssm_raw = src.read(1, window=window)
+                lat, lon = _pixel_centres(src.transform, row0, rows, src.width)
+                soil_values, rzsm, valid = predict_block(ref, ssm_raw, lat, lon, src.nodata)
+
+                sinks['rzsm'].write(rzsm.reshape(shape).astype(np.float32), 1, window=window)
+
+                for crop_idx, crop_name in enumerate(ref.crops.names):
+                    decision, raw = water_requirements(
+                        soil_values[:, 0],
+                        soil_values[:, 1],
+                        soil_values[:, 2],
+                        rzsm * 100,
+                        ref.crops.p[crop_idx],
+                        ref.crops.zr[crop_idx]
+                    )
+                    ok = valid & np.isfinite(raw)
+                    decision_band = np.where(ok, decision, DECISION_NODATA).astype(np.uint8)
+                    depth_band = np.where(ok, raw, np.nan)
+                    sinks[(crop_name, 'decision')].write(decision_band.reshape(shape), 1, window=window)
+                    sinks[(crop_name, 'depth')].write(depth_band.reshape(shape), 1, window=window)
+        finally:
+            for sink in sinks.values():
+                sink.close()
+
+    for path, _, _ in outputs.values():
+        os.replace(path + '.tmp', path)
+
+    logger.info(f"Decision rasters for {date_str} written to {day_dir} ({len(ref.crops)} crops)")
+    return day_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute irrigation decision rasters for a day")
+    parser.add_argument('--date', help="YYYYMMDD date; defaults to three days ago like /process")
+    parser.add_argument('--raster-dir', default=os.environ.get('RASTER_BASE_PATH', '/app/sm_tif'))
+    parser.add_argument('--out-dir', default=os.environ.get('DECISION_RASTER_PATH', '/app/data/decision_rasters'))
+    parser.add_argument('--excel', default='Lat_long_SM_RZSM.xlsx')
+    parser.add_argument('--p-table', default='p table.xlsx')
+    parser.add_argument('--model', default='rf_rzsm_model.pkl')
+    parser.add_argument('--compiled-model', default=os.environ.get('COMPILED_MODEL_PATH', 'rf_rzsm_model.npz'))
+    parser.add_argument('--soil-max-distance-km', type=float, default=float(os.environ.get('SOIL_MAX_DISTANCE_KM', '10')))
+    parser.add_argument('--soil-neighbours', type=int, default=int(os.environ.get('SOIL_NEIGHBOURS', '1')))
+    parser.add_argument('--block-rows', type=int, default=256)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    date_str = args.date or (datetime.now() - timedelta(days=3)).strftime('%Y%m%d')
+    ref = load_reference_data(
+        args.excel,
+        args.p_table,
+        args.model,
+        soil_max_distance_km=args.soil_max_distance_km,
+        soil_neighbours=args.soil_neighbours,
+        compiled_model_path=args.compiled_model
+    )
+    build_decision_rasters(ref, raster_path_for(args.raster_dir, date_str), args.out_dir, date_str, args.block_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Flattened RandomForest inference for the RZSM model.
+
+All trees of the scikit-learn RandomForestRegressor are packed into
+contiguous NumPy node arrays and saved as a .npz file, which loads in
+milliseconds. Prediction walks every (sample, tree) pair in lock-step with
+vectorized gathers and skips sklearn's per-call validation and joblib
+dispatch.
+
+Output is bit-identical to model.predict: inputs are cast to float32 like
+sklearn's tree code, leaves are summed in estimator order with a sequential
+accumulate (the same order RandomForestRegressor uses when n_jobs is 1 or
+None) and then divided by the number of trees.
+
+Usage:
+    python forest_compile.py rf_rzsm_model.pkl rf_rzsm_model.npz
+"""
+import argparse
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class CompiledForest:
+    """A tree ensemble as flat node arrays; leaves point to themselves"""
+    left: np.ndarray
+    right: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    value: np.ndarray
+    missing_left: np.ndarray
+    roots: np.ndarray
+    max_depth: int
+    n_features: int
+    source_sha256: str = ''
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model, source_sha256: str = '') -> "CompiledForest":
+        """Flatten a fitted single-output RandomForestRegressor"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+
+        lefts, rights, features, thresholds, values, missing, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back on themselves so every walk can run max_depth steps
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            mgl = getattr(tree, 'missing_go_to_left', None)
+            missing.append(np.asarray(mgl, dtype=bool) if mgl is not None else np.zeros(n_nodes, dtype=bool))
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            value=np.concatenate(values),
+            missing_left=np.concatenate(missing),
+            roots=np.array(roots, dtype=np.int64),
+            max_depth=int(max_depth),
+            n_features=int(model.n_features_in_),
+            source_sha256=source_sha256,
+        )
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            format_version=FORMAT_VERSION,
+            left=self.left,
+            right=self.right,
+            feature=self.feature,
+            threshold=self.threshold,
+            value=self.value,
+            missing_left=self.missing_left,
+            roots=self.roots,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            source_sha256=self.source_sha256,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        with np.load(path) as data:
+            if int(data['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled forest format in {path}")
+            return cls(
+                left=data['left'],
+                right=data['right'],
+                feature=data['feature'],
+                threshold=data['threshold'],
+                value=data['value'],
+                missing_left=data['missing_left'],
+                roots=data['roots'],
+                max_depth=int(data['max_depth']),
+                n_features=int(data['n_features']),
+                source_sha256=str(data['source_sha256']),
+            )
+
+    def predict(self, X, chunk_size: int = 4096) -> np.ndarray:
+        """
+        Predict like RandomForestRegressor.predict
+
+        Args:
+            X: (n_samples, n_features) array
+            chunk_size: Samples walked at once, bounding the (samples x trees) work arrays
+
+        Returns:
+            np.ndarray: (n_samples,) float64 predictions
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        # sklearn walks trees on float32 inputs and compares them against float64 thresholds
+        X = X.astype(np.float32).astype(np.float64)
+
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            out[start:start + chunk_size] = self._predict_chunk(X[start:start + chunk_size])
+        return out
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n = X.shape[0]
+        rows = np.arange(n)[:, None]
+        nodes = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # Sequential sum in estimator order, then one division, as sklearn does
+        totals = np.add.accumulate(self.value[nodes], axis=1)[:, -1]
+        return totals / self.n_trees
+
+
+def load_compiled_or_none(compiled_path: str, model_path: str) -> Optional[CompiledForest]:
+    """Load a compiled forest if it exists and was built from the current pickle"""
+    if not os.path.exists(compiled_path):
+        return None
+    try:
+        forest = CompiledForest.load(compiled_path)
+    except Exception as e:
+        logger.warning(f"Ignoring compiled model {compiled_path}: {str(e)}")
+        return None
+    if forest.source_sha256 != file_sha256(model_path):
+        logger.warning(f"Compiled model {compiled_path} is stale for {model_path}; ignoring it")
+        return None
+    return forest
+
+
+def main():
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Export the RZSM RandomForest to flat node arrays")
+    parser.add_argument('model_path', nargs='?', default='rf_rzsm_model.pkl')
+    parser.add_argument('out_path', nargs='?', default='rf_rzsm_model.npz')
+    parser.add_argument('--verify-samples', type=int, default=10000,
+                        help="Random inputs checked for bit-identical output against model.predict")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    model = joblib.load(args.model_path)
+    forest = CompiledForest.from_sklearn(model, source_sha256=file_sha256(args.model_path))
+
+    if args.verify_samples:
+        # SAND, SILT, CLAY, HC, SSM over their plausible ranges
+        rng = np.random.default_rng(0)
+        high = np.array([100, 100, 100, 50, 1], dtype=np.float64)
+        if forest.n_features != len(high):
+            high = np.full(forest.n_features, 100.0)
+        X = rng.uniform(0, high, size=(args.verify_samples, forest.n_features))
+        if not np.array_equal(forest.predict(X), model.predict(X)):
+            raise SystemExit("Compiled forest does not match model.predict")
+        logger.info(f"Verified {args.verify_samples} samples against model.predict")
+
+    forest.save(args.out_path)
+    logger.info(f"Wrote {args.out_path} ({forest.n_trees} trees, {len(forest.value)} nodes)")
+
+
+if __name__ == "__main__":
+    main()
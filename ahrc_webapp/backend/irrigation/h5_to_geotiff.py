@@ -0,0 +1,187 @@
+"""
+Convert SMAP L4 .h5 granules into the GeoTIFFs served by the irrigation API.
+
+SMAP L4 surface soil moisture sits on the global 9 km EASE-Grid 2.0, which is
+cylindrical: every row has one latitude and every column one longitude. The
+converter clips the grid to an area of interest and resamples it (nearest
+neighbour) onto a regular lat/lon grid in EPSG:4326, so the API's
+`~transform * (lon, lat)` lookup keeps working. The output is a tiled,
+deflate-compressed GeoTIFF with internal overviews.
+
+Values are stored as uint8 scaled by 255 (255 = no data), matching
+`SSM = value / 255` in /process.
+
+Only one strip of output rows, plus the matching slab of the source dataset,
+is held in memory at a time, so peak memory does not depend on granule size.
+
+Usage:
+    python h5_to_geotiff.py SMAP_L4_SM_aup_20250507T090000_Vv7031_001.h5
+    python h5_to_geotiff.py granule.h5 --bbox 81.3 17.8 87.6 22.6 --raster-dir /app/sm_tif
+"""
+import argparse
+import logging
+import os
+import re
+from typing import Optional, Tuple
+
+import h5py
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from sm_cube import raster_path_for
+
+logger = logging.getLogger(__name__)
+
+SM_DATASET = 'Analysis_Data/sm_surface_analysis'
+LAT_DATASET = 'cell_lat'
+LON_DATASET = 'cell_lon'
+NODATA = 255
+# Odisha, with a margin
+DEFAULT_BBOX = (81.3, 17.8, 87.6, 22.6)
+GRANULE_DATE_PATTERN = re.compile(r'_(\d{8})T\d{6}_')
+
+
+def granule_date(h5_path: str) -> str:
+    """YYYYMMDD date from a SMAP granule filename"""
+    match = GRANULE_DATE_PATTERN.search(os.path.basename(h5_path))
+    if not match:
+        raise ValueError(f"Cannot find a date in granule name: {h5_path}")
+    return match.group(1)
+
+
+def read_axes(h5: h5py.File) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitude of each EASE row and longitude of each EASE column"""
+    lat_axis = h5[LAT_DATASET][:, 0].astype(np.float64)
+    lon_axis = h5[LON_DATASET][0, :].astype(np.float64)
+    return lat_axis, lon_axis
+
+
+def nearest_indices(axis: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Index of the nearest axis value for each target; axis must be monotonic"""
+    descending = axis[0] > axis[-1]
+    sorted_axis = axis[::-1] if descending else axis
+    pos = np.clip(np.searchsorted(sorted_axis, targets), 1, len(axis) - 1)
+    left = sorted_axis[pos - 1]
+    right = sorted_axis[pos]
+    pos = np.where(np.abs(targets - left) <= np.abs(right - targets), pos - 1, pos)
+    return len(axis) - 1 - pos if descending else pos
+
+
+def scale_to_uint8(values: np.ndarray, fill_value: Optional[float]) -> np.ndarray:
+    valid = np.isfinite(values) & (values >= 0)
+    if fill_value is not None:
+        valid &= values != fill_value
+    scaled = np.clip(np.round(values * 255), 0, NODATA - 1)
+    return np.where(valid, scaled, NODATA).astype(np.uint8)
+
+
+def convert_granule(
+    h5_path: str,
+    out_path: str,
+    bbox: Tuple[float, float, float, float] = DEFAULT_BBOX,
+    resolution: Optional[float] = None,
+    strip_rows: int = 256,
+    overviews: Tuple[int, ...] = (2, 4, 8)
+) -> str:
+    """
+    Convert one granule to a clipped, georeferenced GeoTIFF
+
+    Args:
+        h5_path: SMAP L4 .h5 file
+        out_path: GeoTIFF to write
+        bbox: (min_lon, min_lat, max_lon, max_lat) area of interest
+        resolution: Output pixel size in degrees; defaults to the source column spacing
+        strip_rows: Output rows converted per step
+        overviews: Overview decimation factors
+
+    Returns:
+        str: out_path
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    tmp_path = out_path + '.tmp'
+
+    with h5py.File(h5_path, 'r') as h5:
+        sm = h5[SM_DATASET]
+        fill_value = sm.attrs.get('_FillValue')
+        fill_value = float(np.ravel(fill_value)[0]) if fill_value is not None else None
+        lat_axis, lon_axis = read_axes(h5)
+
+        if resolution is None:
+            resolution = float(np.median(np.abs(np.diff(lon_axis))))
+        width = max(1, int(np.ceil((max_lon - min_lon) / resolution)))
+        height = max(1, int(np.ceil((max_lat - min_lat) / resolution)))
+        transform = from_origin(min_lon, max_lat, resolution, resolution)
+
+        # Column mapping is the same for every row
+        target_lons = min_lon + (np.arange(width) + 0.5) * resolution
+        src_cols = nearest_indices(lon_axis, target_lons)
+        col0, col1 = int(src_cols.min()), int(src_cols.max()) + 1
+
+        profile = {
+            'driver': 'GTiff',
+            'height': height,
+            'width': width,
+            'count': 1,
+            'dtype': 'uint8',
+            'crs': 'EPSG:4326',
+            'transform': transform,
+            'nodata': NODATA,
+            'tiled': True,
+            'blockxsize': 256,
+            'blockysize': 256,
+            'compress': 'deflate',
+        }
+        with rasterio.open(tmp_path, 'w', **profile) as dst:
+            for row_start in range(0, height, strip_rows):
+                rows = min(strip_rows, height - row_start)
+                target_lats = max_lat - (np.arange(row_start, row_start + rows) + 0.5) * resolution
+                src_rows = nearest_indices(lat_axis, target_lats)
+                row0, row1 = int(src_rows.min()), int(src_rows.max()) + 1
+
+                # Hyperslab read: only the source slab under this strip
+                slab = sm[row0:row1, col0:col1].astype(np.float64)
+                strip = slab[np.ix_(src_rows - row0, src_cols - col0)]
+                dst.write(scale_to_uint8(strip, fill_value), 1, window=Window(0, row_start, width, rows))
+
+            factors = [f for f in overviews if min(width, height) // f >= 1]
+            if factors:
+                dst.build_overviews(factors, Resampling.nearest)
+                dst.update_tags(ns='rio_overview', resampling='nearest')
+
+    os.replace(tmp_path, out_path)
+    logger.info(f"Converted {h5_path} -> {out_path} ({width}x{height})")
+    return out_path
+
+
+def convert_to_archive(h5_path: str, raster_dir: str, bbox: Tuple[float, float, float, float] = DEFAULT_BBOX) -> Tuple[str, str]:
+    """
+    Convert a granule into the /app/sm_tif/{year}/{month}/{day} layout
+
+    Returns:
+        tuple: (date_str, GeoTIFF path)
+    """
+    date_str = granule_date(h5_path)
+    out_path = raster_path_for(raster_dir, date_str)
+    convert_granule(h5_path, out_path, bbox)
+    return date_str, out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert SMAP L4 .h5 granules to georeferenced GeoTIFFs")
+    parser.add_argument('h5_files', nargs='+')
+    parser.add_argument('--raster-dir', default=os.environ.get('RASTER_BASE_PATH', '/app/sm_tif'))
+    parser.add_argument('--bbox', type=float, nargs=4, default=DEFAULT_BBOX,
+                        metavar=('MIN_LON', 'MIN_LAT', 'MAX_LON', 'MAX_LAT'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for h5_path in args.h5_files:
+        convert_to_archive(h5_path, args.raster_dir, tuple(args.bbox))
+
+
+if __name__ == "__main__":
+    main()
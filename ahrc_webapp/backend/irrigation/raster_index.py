@@ -0,0 +1,169 @@
+"""
+In-memory index of the soil moisture dates available to the API.
+
+SMAP data regularly arrives later than the three days /process assumes.
+Instead of stat-ing one expected path per request and failing with 404,
+the API keeps a sorted index of every date present in the GeoTIFF archive
+or the soil moisture cube, refreshed by a background thread, and resolves
+each request to the newest date within a staleness window.
+
+Requests never scan the archive themselves: a request that misses the
+expected date only wakes the background thread, and keeps using the
+current snapshot until the rescan lands.
+"""
+import bisect
+import glob
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sm_cube import find_rasters, raster_path_for
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    dates: List[str] = field(default_factory=list)
+    paths: Dict[str, str] = field(default_factory=dict)
+    refreshed_at: Optional[str] = None
+
+
+def scan_dates(raster_dir: str, cube_dir: Optional[str] = None) -> Dict[str, str]:
+    """Map every available YYYYMMDD date to its GeoTIFF path (which may be absent for cube-only days)"""
+    paths = dict(find_rasters(raster_dir))
+    if cube_dir:
+        for npy_path in glob.glob(os.path.join(cube_dir, '*.npy')):
+            date_str = os.path.basename(npy_path)[:-4]
+            if len(date_str) == 8 and date_str.isdigit():
+                paths.setdefault(date_str, raster_path_for(raster_dir, date_str))
+    return paths
+
+
+class RasterDateIndex:
+    """Sorted set of available raster dates, swapped atomically on refresh"""
+
+    def __init__(
+        self,
+        raster_dir: str,
+        cube_dir: Optional[str] = None,
+        max_staleness_days: int = 7,
+        refresh_interval: float = 300.0
+    ):
+        self.raster_dir = raster_dir
+        self.cube_dir = cube_dir
+        self.max_staleness_days = max_staleness_days
+        self.refresh_interval = refresh_interval
+        self._snapshot = _Snapshot()
+        self._refresh_lock = threading.Lock()
+        # Guards the two timestamps; separate from _refresh_lock so requests never wait on a scan
+        self._state_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._last_request = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def refresh(self) -> int:
+        """Rescan the archive and swap in a new snapshot; returns the number of dates"""
+        with self._refresh_lock:
+            paths = scan_dates(self.raster_dir, self.cube_dir)
+            self._snapshot = _Snapshot(
+                dates=sorted(paths),
+                paths=paths,
+                refreshed_at=datetime.now().isoformat()
+            )
+            with self._state_lock:
+                self._last_refresh = time.monotonic()
+        logger.info(f"Raster date index refreshed ({len(paths)} dates, latest {self.latest() or 'none'})")
+        return len(paths)
+
+    def latest(self) -> Optional[str]:
+        dates = self._snapshot.dates
+        return dates[-1] if dates else None
+
+    def resolve(self, target: datetime) -> Optional[Tuple[str, str]]:
+        """
+        Newest available date on or before target, within max_staleness_days
+
+        The exact target is a dict lookup; otherwise the candidate is found by
+        bisecting the sorted dates.
+
+        Returns:
+            tuple: (date_str as YYYYMMDD, GeoTIFF path), or None if no date is recent enough
+        """
+        snapshot = self._snapshot
+        target_str = target.strftime('%Y%m%d')
+        path = snapshot.paths.get(target_str)
+        if path is not None:
+            return target_str, path
+
+        pos = bisect.bisect_right(snapshot.dates, target_str)
+        if pos == 0:
+            return None
+        date_str = snapshot.dates[pos - 1]
+        oldest = (target - timedelta(days=self.max_staleness_days)).strftime('%Y%m%d')
+        if date_str < oldest:
+            return None
+        return date_str, snapshot.paths[date_str]
+
+    def request_refresh(self, min_age: float = 5.0) -> bool:
+        """
+        Ask the watcher thread to rescan, unless a scan was done or requested within min_age seconds
+
+        Returns immediately; the caller keeps using the current snapshot.
+
+        Returns:
+            bool: Whether a rescan was requested
+        """
+        with self._state_lock:
+            now = time.monotonic()
+            if now - max(self._last_refresh, self._last_request) < min_age:
+                return False
+            self._last_request = now
+        self._wake.set()
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        snapshot = self._snapshot
+        return {
+            "dates": len(snapshot.dates),
+            "earliest": snapshot.dates[0] if snapshot.dates else None,
+            "latest": snapshot.dates[-1] if snapshot.dates else None,
+            "refreshed_at": snapshot.refreshed_at,
+            "max_staleness_days": self.max_staleness_days,
+        }
+
+    def start_watcher(self):
+        """
+        Rescan the archive in a daemon thread every refresh_interval seconds
+        (only on request_refresh when the interval is 0)
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="raster-date-index", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        self._wake.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self):
+        timeout = self.refresh_interval if self.refresh_interval > 0 else None
+        while True:
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Raster date index refresh failed, keeping previous index: {str(e)}")
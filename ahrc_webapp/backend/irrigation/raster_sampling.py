@@ -0,0 +1,223 @@
+"""
+Point sampling of soil moisture rasters.
+
+Keeps a small LRU pool of open rasterio datasets, one per raster file, and
+reads only the 1x1 window that holds the requested pixel instead of decoding
+the whole band.
+
+A handle can be evicted (and closed) by another thread between being looked
+up and being used. Handles are only closed under their own lock, and readers
+check for a closed dataset after taking that lock and reopen through the
+pool, so a read never touches a closed dataset.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Tuple
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+logger = logging.getLogger(__name__)
+
+
+class PixelOutOfBounds(ValueError):
+    """Raised when a coordinate falls outside the raster extent"""
+
+
+class NoDataAtLocation(ValueError):
+    """Raised when the pixel at a coordinate holds the raster's nodata value"""
+
+
+def is_nodata(values, nodata) -> np.ndarray:
+    """Mask of values that are NaN or equal to the raster's nodata value"""
+    values = np.asarray(values, dtype=np.float64)
+    missing = ~np.isfinite(values)
+    if nodata is not None:
+        missing |= values == nodata
+    return missing
+
+
+def pixel_index(transform, latitude: float, longitude: float) -> Tuple[int, int]:
+    """Convert (latitude, longitude) to (row, col) using the raster transform"""
+    col, row = ~transform * (longitude, latitude)
+    return int(row), int(col)
+
+
+def pixel_indices(transform, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized pixel_index; truncates toward zero exactly like int()"""
+    cols, rows = ~transform * (np.asarray(longitudes, dtype=np.float64), np.asarray(latitudes, dtype=np.float64))
+    return np.trunc(rows).astype(np.int64), np.trunc(cols).astype(np.int64)
+
+
+def in_bounds(rows: np.ndarray, cols: np.ndarray, height: int, width: int) -> np.ndarray:
+    return (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+
+
+class _OpenRaster:
+    def __init__(self, path: str):
+        self.dataset = rasterio.open(path)
+        # GDAL handles must not be used from two threads at once
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            self.dataset.close()
+
+
+class RasterPool:
+    """LRU pool of open raster datasets keyed by path"""
+
+    def __init__(self, max_open: int = 8, max_window_pixels: int = 1_000_000):
+        """
+        Args:
+            max_open: Datasets kept open at once
+            max_window_pixels: Largest bounding-box window sample_many reads in
+                one go; sparser batches are read block by block
+        """
+        self.max_open = max_open
+        self.max_window_pixels = max_window_pixels
+        self._rasters: "OrderedDict[str, _OpenRaster]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, path: str) -> _OpenRaster:
+        with self._lock:
+            raster = self._rasters.get(path)
+            if raster is not None:
+                self._rasters.move_to_end(path)
+                return raster
+
+        # Open outside the pool lock so a slow open does not block other dates
+        raster = _OpenRaster(path)
+        evicted = []
+        with self._lock:
+            existing = self._rasters.get(path)
+            if existing is not None:
+                self._rasters.move_to_end(path)
+                evicted.append(raster)
+                raster = existing
+            else:
+                self._rasters[path] = raster
+                while len(self._rasters) > self.max_open:
+                    evicted.append(self._rasters.popitem(last=False)[1])
+        # close() waits for in-flight reads on the handle, so never under the pool lock
+        for handle in evicted:
+            handle.close()
+        return raster
+
+    @contextmanager
+    def _dataset(self, path: str):
+        """Yield the pooled dataset for path, locked and guaranteed open"""
+        for _ in range(3):
+            raster = self._get(path)
+            with raster.lock:
+                if not raster.dataset.closed:
+                    yield raster.dataset
+                    return
+            # Evicted or invalidated after _get returned it; the next _get reopens
+        # Pool thrashing: fall back to a private handle for this read
+        raster = _OpenRaster(path)
+        try:
+            with raster.lock:
+                yield raster.dataset
+        finally:
+            raster.close()
+
+    def invalidate(self, path: str):
+        """Close and forget the handle for a raster that changed on disk"""
+        with self._lock:
+            raster = self._rasters.pop(path, None)
+        if raster is not None:
+            raster.close()
+
+    def close_all(self):
+        with self._lock:
+            rasters = list(self._rasters.values())
+            self._rasters.clear()
+        for raster in rasters:
+            raster.close()
+
+    def transform(self, path: str):
+        """Affine transform of a pooled raster"""
+        with self._dataset(path) as dataset:
+            return dataset.transform
+
+    def sample(self, path: str, latitude: float, longitude: float, band: int = 1):
+        """
+        Read a single pixel value
+
+        Args:
+            path: Path to the raster file
+            latitude: Latitude coordinate
+            longitude: Longitude coordinate
+            band: Band index (1-based)
+
+        Returns:
+            Pixel value in the raster's native dtype
+
+        Raises:
+            RasterioIOError: If the raster cannot be opened
+            PixelOutOfBounds: If the coordinates are outside the raster
+            NoDataAtLocation: If the pixel holds the raster's nodata value
+        """
+        with self._dataset(path) as dataset:
+            row, col = pixel_index(dataset.transform, latitude, longitude)
+            if not (0 <= row < dataset.height and 0 <= col < dataset.width):
+                raise PixelOutOfBounds(
+                    f"Coordinates ({latitude}, {longitude}) are out of bounds for the raster"
+                )
+            value = dataset.read(band, window=Window(col, row, 1, 1))[0, 0]
+            if is_nodata(value, dataset.nodata):
+                raise NoDataAtLocation(f"No data at coordinates ({latitude}, {longitude}) in the raster")
+            return value
+
+    def sample_many(self, path: str, latitudes, longitudes, band: int = 1):
+        """
+        Read many pixels with as few windowed reads as possible
+
+        Points are read with one window over their bounding box when that box
+        is at most max_window_pixels. Otherwise, for fields spread far apart,
+        they are grouped by the raster's internal blocks and each block that
+        holds a point is read once.
+
+        Returns:
+            tuple: (values, inside) where values is a float64 array (NaN where the
+            point is outside the raster or its pixel holds nodata) and inside
+            marks in-bounds points
+        """
+        with self._dataset(path) as dataset:
+            rows, cols = pixel_indices(dataset.transform, latitudes, longitudes)
+            inside = in_bounds(rows, cols, dataset.height, dataset.width)
+            values = np.full(rows.shape, np.nan)
+            if not inside.any():
+                return values, inside
+
+            index = np.flatnonzero(inside)
+            rows_in, cols_in = rows[index], cols[index]
+            row0, row1 = rows_in.min(), rows_in.max()
+            col0, col1 = cols_in.min(), cols_in.max()
+            if (row1 - row0 + 1) * (col1 - col0 + 1) <= self.max_window_pixels:
+                window = Window(col0, row0, col1 - col0 + 1, row1 - row0 + 1)
+                block = dataset.read(band, window=window)
+                values[index] = block[rows_in - row0, cols_in - col0]
+                values[is_nodata(values, dataset.nodata)] = np.nan
+                return values, inside
+
+            block_height, block_width = dataset.block_shapes[band - 1]
+            block_cols = -(-dataset.width // block_width)
+            block_ids = (rows_in // block_height) * block_cols + cols_in // block_width
+            for block_id in np.unique(block_ids):
+                selected = block_ids == block_id
+                top = int(block_id // block_cols) * block_height
+                left = int(block_id % block_cols) * block_width
+                window = Window(
+                    left, top,
+                    min(block_width, dataset.width - left),
+                    min(block_height, dataset.height - top)
+                )
+                block = dataset.read(band, window=window)
+                values[index[selected]] = block[rows_in[selected] - top, cols_in[selected] - left]
+            values[is_nodata(values, dataset.nodata)] = np.nan
+        return values, inside
@@ -0,0 +1,201 @@
+"""
+Reference data for the irrigation API.
+
+The soil table, the crop p-table and the RandomForest RZSM model are loaded
+once at startup into an immutable snapshot. Requests only read the current
+snapshot; a background watcher rebuilds it when any of the files change on
+disk and swaps it in atomically.
+"""
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import joblib
+import pandas as pd
+
+from forest_compile import CompiledForest, load_compiled_or_none
+from soil_index import SOIL_COLUMNS, SoilIndex, SoilRecord
+from water_requirements import CropTable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    """A consistent, read-only view of all reference files"""
+    soil_df: pd.DataFrame
+    soil_index: SoilIndex
+    p_table: pd.DataFrame
+    crops: CropTable
+    model: Any
+    mtimes: Dict[str, Optional[float]]
+    loaded_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def find_soil(self, latitude: float, longitude: float) -> Optional[SoilRecord]:
+        """Return the soil record for the given coordinates, if any sample is in range"""
+        return self.soil_index.lookup(latitude, longitude)
+
+
+def _file_mtimes(paths, optional_paths=()) -> Dict[str, Optional[float]]:
+    mtimes = {path: os.path.getmtime(path) for path in paths}
+    for path in optional_paths:
+        mtimes[path] = os.path.getmtime(path) if os.path.exists(path) else None
+    return mtimes
+
+
+def load_model(model_path: str, compiled_model_path: Optional[str] = None):
+    """
+    Load the RZSM model, preferring the flattened forest
+
+    A fresh .npz export is used as-is; otherwise the pickle is loaded and
+    flattened in memory. Models that cannot be flattened are returned as-is.
+    """
+    if compiled_model_path:
+        forest = load_compiled_or_none(compiled_model_path, model_path)
+        if forest is not None:
+            return forest
+
+    model = joblib.load(model_path)
+    try:
+        return CompiledForest.from_sklearn(model)
+    except Exception as e:
+        logger.warning(f"Using sklearn predict; model could not be flattened: {str(e)}")
+        return model
+
+
+def load_soil_table(excel_path: str) -> pd.DataFrame:
+    """Read the soil table and validate the columns the API relies on"""
+    df = pd.read_excel(excel_path)
+    df.columns = df.columns.str.strip()
+
+    missing = [col for col in ['LATITUDE', 'LONGITUDE'] + SOIL_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Required columns {missing} not found in {excel_path}")
+    return df
+
+
+def load_reference_data(
+    excel_path: str,
+    p_table_path: str,
+    model_path: str,
+    soil_max_distance_km: float = 10.0,
+    soil_neighbours: int = 1,
+    compiled_model_path: Optional[str] = None
+) -> ReferenceData:
+    """
+    Load every reference file into a new snapshot
+
+    Args:
+        excel_path: Path to the soil parameter table
+        p_table_path: Path to the crop p-table
+        model_path: Path to the pickled RZSM model
+        soil_max_distance_km: Search radius for the soil index
+        soil_neighbours: Soil samples blended per lookup
+        compiled_model_path: Optional flattened-forest export of the model
+
+    Returns:
+        ReferenceData: Fully loaded snapshot
+
+    Raises:
+        Exception: If any file is missing or malformed
+    """
+    # Take the mtimes first so a write racing with the load triggers another reload
+    mtimes = _file_mtimes([excel_path, p_table_path, model_path], [compiled_model_path] if compiled_model_path else [])
+
+    soil_df = load_soil_table(excel_path)
+    p_table = pd.read_excel(p_table_path)
+    p_table.columns = p_table.columns.str.strip()
+    model = load_model(model_path, compiled_model_path)
+
+    return ReferenceData(
+        soil_df=soil_df,
+        soil_index=SoilIndex(soil_df, max_distance_km=soil_max_distance_km, neighbours=soil_neighbours),
+        p_table=p_table,
+        crops=CropTable.from_dataframe(p_table),
+        model=model,
+        mtimes=mtimes,
+    )
+
+
+class ReferenceDataStore:
+    """Holds the current ReferenceData snapshot and reloads it on file changes"""
+
+    def __init__(
+        self,
+        excel_path: str,
+        p_table_path: str,
+        model_path: str,
+        reload_interval: float = 60.0,
+        soil_max_distance_km: float = 10.0,
+        soil_neighbours: int = 1,
+        compiled_model_path: Optional[str] = None
+    ):
+        self.paths = (excel_path, p_table_path, model_path)
+        self.optional_paths = (compiled_model_path,) if compiled_model_path else ()
+        self.reload_interval = reload_interval
+        self.options = {
+            'soil_max_distance_km': soil_max_distance_km,
+            'soil_neighbours': soil_neighbours,
+            'compiled_model_path': compiled_model_path,
+        }
+        self._data: Optional[ReferenceData] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def load(self) -> ReferenceData:
+        """Load a new snapshot and swap it in"""
+        data = load_reference_data(*self.paths, **self.options)
+        with self._lock:
+            self._data = data
+        logger.info(f"Reference data loaded ({len(data.soil_df)} soil rows, {len(data.p_table)} crops)")
+        return data
+
+    def get(self) -> ReferenceData:
+        """Return the current snapshot"""
+        data = self._data
+        if data is None:
+            raise RuntimeError("Reference data has not been loaded")
+        return data
+
+    def has_changed(self) -> bool:
+        data = self._data
+        if data is None:
+            return True
+        try:
+            return _file_mtimes(self.paths, self.optional_paths) != data.mtimes
+        except OSError:
+            # A file is being replaced; check again on the next tick
+            return False
+
+    def reload_if_changed(self) -> bool:
+        """Reload if any file changed; keep serving the old snapshot on failure"""
+        if not self.has_changed():
+            return False
+        try:
+            self.load()
+            return True
+        except Exception as e:
+            logger.error(f"Reference data reload failed, keeping previous snapshot: {str(e)}")
+            return False
+
+    def start_watcher(self):
+        """Start polling the reference files in a daemon thread"""
+        if self.reload_interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="reference-data-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            self.reload_if_changed()
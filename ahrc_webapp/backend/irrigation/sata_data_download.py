@@ -1,128 +1,347 @@
 #Auto download satellite data from NASA site
 # Download data only for 6-9 hour window for that last available data
+#
+# Date directories are probed concurrently, .h5 files are downloaded to a
+# `.part` file and resumed with HTTP Range requests after a failure, and a
+# finished file is only renamed into place once its size (and checksum, when
+# the server publishes one) has been verified.
+#
+# Usage:
+#   EARTHDATA_USERNAME=... EARTHDATA_PASSWORD=... python sata_data_download.py
+#   python sata_data_download.py --start 2025-05-01 --end 2025-05-10
+#   python sata_data_download.py --base-url http://127.0.0.1:8080/temporal --auth-host 127.0.0.1
+#   python sata_data_download.py --raster-dir /app/sm_tif --cube-dir /app/data/sm_cube
+#
+# With --raster-dir each downloaded granule is converted to the GeoTIFF the API
+# serves (and, with --cube-dir / --timeseries-dir, ingested into the
+# memory-mapped cube and the per-pixel time series), so
+# download -> convert -> serve runs as one pipeline.
+import argparse
+import asyncio
+import base64
+import hashlib
+import logging
 import os
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
 
-from datetime import datetime, timedelta
+import aiohttp
 
-# overriding requests.Session.rebuild_auth to mantain headers when redirected
-class SessionWithHeaderRedirection(requests.Session):
-    AUTH_HOST = 'urs.earthdata.nasa.gov'
+logger = logging.getLogger(__name__)
+
+DATA_FOLDER_URL_BASE = "https://cmr.earthdata.nasa.gov/virtual-directory/collections/C2938665508-NSIDC_CPRD/temporal"
+AUTH_HOST = 'urs.earthdata.nasa.gov'
+HDF5_SIGNATURE = b'\x89HDF\r\n\x1a\n'
+MAX_REDIRECTS = 10
+MD5_PATTERN = re.compile(r'[0-9a-f]{32}')
 
-    def __init__(self, username, password):
-        super().__init__()
-        self.auth = (username, password)
 
-   # Overrides from the library to keep headers when redirected to or from the NASA auth host.
+class DownloadError(Exception):
+    """Raised when a file cannot be downloaded or fails verification"""
 
-    def rebuild_auth(self, prepared_request, response):
-        headers = prepared_request.headers
-        url = prepared_request.url
 
-        if 'Authorization' in headers:
-            original_parsed = requests.utils.urlparse(response.request.url)
-            redirect_parsed = requests.utils.urlparse(url)
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.hrefs: List[str] = []
 
-            if (original_parsed.hostname != redirect_parsed.hostname and  
-                redirect_parsed.hostname != self.AUTH_HOST and 
-                original_parsed.hostname != self.AUTH_HOST):
-                del headers['Authorization']
-        return
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for name, value in attrs:
+                if name == 'href' and value:
+                    self.hrefs.append(value)
 
-def get_h5_file_link(url, specific_file_name_pattern = 'T090000', retry_count=3):
 
+def find_h5_link(html: str, base_url: str, specific_file_name_pattern: str = 'T090000') -> str:
+    """Return the last .h5 link on a directory page that matches the pattern, or ''"""
+    parser = _LinkParser()
+    parser.feed(html)
     h5_link = ''
+    for href in parser.hrefs:
+        if href.endswith('.h5') and specific_file_name_pattern in href:
+            h5_link = urljoin(base_url, href)
+    return h5_link
 
-    # Retry logic
-    for attempt in range(retry_count):
-        try:
-            # Send HTTP GET request
-            response = requests.get(url)
-            response.raise_for_status()  # Raise exception for HTTP errors           
-        except requests.RequestException as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            if attempt == retry_count - 1:
-                return ''  # Return empty list after all retries
-            
-        # If we reach here, the request was successful
-        try:
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Find all <a> tags with href attributes
-            links = soup.find_all('a', href=True)
-
-            # Filter links that end with .h5 and join with base URL if relative
-            for link in links:
-                href = link['href']
-                if href.endswith('.h5') and specific_file_name_pattern in href:
-                    full_url = urljoin(url, href)
-                    h5_link = full_url
-
-            return h5_link
-        except requests.RequestException as e:
-            print(f"Error fetching URL: {e}")
+
+def date_folder_url(data_folder_url_base: str, day: date) -> str:
+    return data_folder_url_base + f'/{day.year}/{day.month}/{day.day}'
+
+
+@dataclass
+class DownloaderConfig:
+    base_url: str = DATA_FOLDER_URL_BASE
+    out_dir: str = './smap_files'
+    username: Optional[str] = None
+    password: Optional[str] = None
+    auth_host: str = AUTH_HOST
+    file_pattern: str = 'T090000'
+    concurrency: int = 4
+    retry_count: int = 3
+    chunk_size: int = 1024 * 1024
+    timeout: float = 300.0
+    checksum_suffix: Optional[str] = '.md5'
+
+
+class SmapDownloader:
+    """Concurrent, resumable SMAP .h5 downloader"""
+
+    def __init__(self, config: DownloaderConfig):
+        self.config = config
+        self._semaphore = asyncio.Semaphore(config.concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=self.config.timeout),
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def _auth_header(self, url: str) -> Dict[str, str]:
+        # Only the auth host ever sees the credentials, as with the old requests session
+        if self.config.username is None or urlparse(url).hostname != self.config.auth_host:
+            return {}
+        token = base64.b64encode(f"{self.config.username}:{self.config.password}".encode()).decode()
+        return {'Authorization': f'Basic {token}'}
+
+    async def _open(self, url: str, headers: Optional[Dict[str, str]] = None) -> aiohttp.ClientResponse:
+        """GET a URL, following redirects by hand so auth is only sent to the auth host"""
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS):
+            response = await self._session.get(
+                url, headers={**headers, **self._auth_header(url)}, allow_redirects=False
+            )
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.headers.get('Location')
+                response.release()
+                if not location:
+                    raise DownloadError(f"Redirect without Location from {url}")
+                url = urljoin(url, location)
+                continue
+            return response
+        raise DownloadError(f"Too many redirects for {url}")
+
+    async def _fetch_text(self, url: str) -> Optional[str]:
+        for attempt in range(self.config.retry_count):
+            try:
+                async with self._semaphore:
+                    response = await self._open(url)
+                    async with response:
+                        if response.status == 404:
+                            return None
+                        response.raise_for_status()
+                        return await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Attempt {attempt + 1} for {url} failed: {e}")
+                await asyncio.sleep(2 ** attempt)
+        return None
+
+    async def get_h5_file_link(self, day: date) -> str:
+        url = date_folder_url(self.config.base_url, day)
+        html = await self._fetch_text(url)
+        if not html:
             return ''
-    
-def get_lastest_data_file_available(data_folder_url_base, retry_count=3):
-    data_file_link = ''
-    #Look back for last 10 days starting today. Break if you find a folder with required data file.
-    for i in range(10):
-        # Get year, month and day of today
-     
-        current_date = datetime.now() - timedelta(days=i)
-        year = current_date.year
-        month = current_date.month
-        day = current_date.day
-
-        data_folder_url = data_folder_url_base + f'/{year}/{month}/{day}'
-        data_file_link = get_h5_file_link(data_folder_url)
-        if (data_file_link):
-            print(f"Data available for {year}-{month:02d}-{day:02d}") 
-            break
-    return data_file_link
+        return find_h5_link(html, url, self.config.file_pattern)
+
+    async def probe_dates(self, days: List[date]) -> Dict[date, str]:
+        """Look up the .h5 link for every date concurrently; dates without data are dropped"""
+        links = await asyncio.gather(*(self.get_h5_file_link(day) for day in days))
+        return {day: link for day, link in zip(days, links) if link}
+
+    async def get_latest_data_file_available(self, lookback_days: int = 10) -> Tuple[Optional[date], str]:
+        """Most recent date within the lookback window that has a matching file"""
+        today = datetime.now().date()
+        found = await self.probe_dates([today - timedelta(days=i) for i in range(lookback_days)])
+        if not found:
+            return None, ''
+        latest = max(found)
+        logger.info(f"Data available for {latest.isoformat()}")
+        return latest, found[latest]
+
+    async def _expected_checksum(self, url: str) -> Optional[str]:
+        if not self.config.checksum_suffix:
+            return None
+        text = await self._fetch_text(url + self.config.checksum_suffix)
+        if not text or not text.split():
+            return None
+        checksum = text.split()[0].strip().lower()
+        # A missing sidecar can come back as an HTML error or login page
+        if not MD5_PATTERN.fullmatch(checksum):
+            logger.warning(f"Ignoring {url}{self.config.checksum_suffix}: not an MD5 checksum")
+            return None
+        return checksum
+
+    async def _download_once(self, url: str, part_path: str) -> int:
+        """Fetch the rest of url into part_path; returns the expected total size"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        async with self._semaphore:
+            response = await self._open(url, headers)
+            async with response:
+                if response.status == 416:
+                    # The partial file already holds every byte
+                    return offset
+                response.raise_for_status()
+
+                if response.status == 206:
+                    content_range = response.headers.get('Content-Range', '')
+                    total = int(content_range.rsplit('/', 1)[-1]) if '/' in content_range else -1
+                    mode = 'ab'
+                else:
+                    # Server ignored the Range header: start over
+                    total = response.content_length if response.content_length is not None else -1
+                    offset = 0
+                    mode = 'wb'
+
+                with open(part_path, mode) as fd:
+                    async for chunk in response.content.iter_chunked(self.config.chunk_size):
+                        fd.write(chunk)
+        return total
+
+    def _verify(self, part_path: str, total: int, checksum: Optional[str]):
+        size = os.path.getsize(part_path)
+        if total >= 0 and size != total:
+            raise DownloadError(f"Size mismatch for {part_path}: {size} != {total}")
+        with open(part_path, 'rb') as f:
+            if f.read(len(HDF5_SIGNATURE)) != HDF5_SIGNATURE:
+                raise DownloadError(f"{part_path} is not an HDF5 file")
+        if checksum:
+            md5 = hashlib.md5()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(self.config.chunk_size), b''):
+                    md5.update(block)
+            if md5.hexdigest() != checksum:
+                raise DownloadError(f"Checksum mismatch for {part_path}")
+
+    async def download(self, url: str) -> str:
+        """
+        Download a file, resuming a previous partial download if there is one
+
+        Returns:
+            str: Path of the verified file
+
+        Raises:
+            DownloadError: If all retries fail or the file does not verify
+        """
+        os.makedirs(self.config.out_dir, exist_ok=True)
+        data_filename = url[url.rfind('/') + 1:]
+        final_path = os.path.join(self.config.out_dir, data_filename)
+        part_path = final_path + '.part'
+        if os.path.exists(final_path):
+            return final_path
+
+        checksum = await self._expected_checksum(url)
+        for attempt in range(self.config.retry_count):
+            try:
+                logger.info(f"Downloading {data_filename} (attempt {attempt + 1}) ...")
+                total = await self._download_once(url, part_path)
+                self._verify(part_path, total, checksum)
+                os.replace(part_path, final_path)
+                return final_path
+            except DownloadError as e:
+                logger.warning(str(e))
+                # A complete but corrupt file cannot be resumed
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Download of {data_filename} interrupted: {e}")
+            await asyncio.sleep(2 ** attempt)
+        raise DownloadError(f"Failed to download {url} after {self.config.retry_count} attempts")
+
+    async def backfill(self, start: date, end: date) -> Dict[date, str]:
+        """Download every available file between start and end (inclusive) in parallel"""
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        links = await self.probe_dates(days)
+        paths = await asyncio.gather(*(self.download(link) for link in links.values()), return_exceptions=True)
+
+        downloaded = {}
+        for day, path in zip(links, paths):
+            if isinstance(path, Exception):
+                logger.error(f"{day.isoformat()}: {path}")
+            else:
+                downloaded[day] = path
+        return downloaded
+
+
+async def convert_downloads(
+    downloaded: Dict[date, str],
+    raster_dir: str,
+    cube_dir: Optional[str] = None,
+    timeseries_dir: Optional[str] = None
+) -> Dict[date, str]:
+    """Convert downloaded granules to GeoTIFFs off the event loop, one at a time"""
+    # Imported here so downloading alone does not need h5py/rasterio
+    from h5_to_geotiff import convert_to_archive
+    from sm_cube import ingest_raster
+    from sm_timeseries import append_day
+
+    rasters = {}
+    for day, h5_path in sorted(downloaded.items()):
+        try:
+            date_str, raster_path = await asyncio.to_thread(convert_to_archive, h5_path, raster_dir)
+            if cube_dir:
+                await asyncio.to_thread(ingest_raster, raster_path, cube_dir, date_str)
+            if timeseries_dir:
+                await asyncio.to_thread(append_day, raster_path, timeseries_dir, date_str)
+            rasters[day] = raster_path
+        except Exception as e:
+            logger.error(f"Conversion of {h5_path} failed: {e}")
+    return rasters
+
+
+async def run(args) -> Dict[date, str]:
+    config = DownloaderConfig(
+        base_url=args.base_url,
+        out_dir=args.out_dir,
+        username=os.environ.get('EARTHDATA_USERNAME'),
+        password=os.environ.get('EARTHDATA_PASSWORD'),
+        auth_host=args.auth_host,
+        concurrency=args.concurrency,
+    )
+    async with SmapDownloader(config) as downloader:
+        if args.start:
+            start = datetime.strptime(args.start, '%Y-%m-%d').date()
+            end = datetime.strptime(args.end, '%Y-%m-%d').date() if args.end else datetime.now().date()
+            downloaded = await downloader.backfill(start, end)
+        else:
+            day, link = await downloader.get_latest_data_file_available(args.days)
+            if not link:
+                logger.error(f"No data found in the last {args.days} days")
+                return {}
+            downloaded = {day: await downloader.download(link)}
+
+    if args.raster_dir:
+        await convert_downloads(downloaded, args.raster_dir, args.cube_dir, args.timeseries_dir)
+    return downloaded
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Download SMAP soil moisture granules")
+    parser.add_argument('--base-url', default=DATA_FOLDER_URL_BASE)
+    parser.add_argument('--auth-host', default=AUTH_HOST)
+    parser.add_argument('--out-dir', default='./smap_files')
+    parser.add_argument('--days', type=int, default=10, help="Look-back window for the latest file")
+    parser.add_argument('--start', help="Backfill from this date (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Backfill up to this date (YYYY-MM-DD), default today")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--raster-dir', help="Convert downloads to GeoTIFFs under this directory")
+    parser.add_argument('--cube-dir', help="Also ingest converted rasters into this soil moisture cube")
+    parser.add_argument('--timeseries-dir', help="Also add converted rasters to this per-pixel time series")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    downloaded = asyncio.run(run(args))
+    for day, path in sorted(downloaded.items()):
+        print(f"{day.isoformat()}: {path}")
 
-    # URL for the login page
-    LOGIN_URL = "https://urs.earthdata.nasa.gov/"
- 
-    # Your login credentials
-    username = "xxxxxxx"
-    password = "yyyyyyy"
-
-    # create session with the user credentials that will be used to authenticate access to the data
-    session = SessionWithHeaderRedirection(username, password)
-    
-    DATA_FOLDER_URL_BASE = "https://cmr.earthdata.nasa.gov/virtual-directory/collections/C2938665508-NSIDC_CPRD/temporal"
-    
-    data_file_url =  get_lastest_data_file_available(DATA_FOLDER_URL_BASE)
-    
-    #Create output directory if it doesn't exist.
-    H5_FILE_DIR = "./smap_files"
-    os.makedirs(H5_FILE_DIR, exist_ok=True)
-
-    # extract the filename from the url to be used when saving the file
-    data_filename = data_file_url[data_file_url.rfind('/')+1:]  
-
-    print(f"Dowloading {data_filename} ...")
-    try:
-        # submit the request using the session
-        response = session.get(data_file_url, stream=True)
-        # print(response.status_code)
-
-        # raise an exception in case of http errors
-        response.raise_for_status()  
-
-        # save the file
-        with open(H5_FILE_DIR + '/' + data_filename, 'wb') as fd:
-            for chunk in response.iter_content(chunk_size=1024*1024):
-                fd.write(chunk)
-
-    except requests.exceptions.HTTPError as e:
-        print(e)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,177 @@
+"""
+Multi-day irrigation scheduling with a root-zone water balance.
+
+/process answers "irrigate today?" with a single p <= pa check. The
+scheduler carries that check forward: starting from the RF RZSM estimate
+for the raster date, it runs a daily root-zone water balance for every field
+at once and returns the days on which the pump should run and how much
+water to apply.
+
+Per field and day, using the soil properties of water_requirements():
+
+    1. On the day of a reported irrigation (lastIrrigationDate) the root
+       zone is refilled to field capacity.
+    2. Otherwise, on a schedulable day within the crop's season, the same
+       trigger as /process applies: irrigate when p <= (FC - theta) / FC.
+       The irrigation depth refills the root zone to field capacity.
+    3. Crop water use Kc * ET0 less effective rain is removed, with theta
+       kept between wilting point and field capacity.
+
+All state is (n_fields,) arrays and the loop runs over days only, so a whole
+block of thousands of fields is rescheduled in milliseconds.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class KcCurve:
+    """
+    Generic FAO-56 style crop coefficient curve over the base period
+
+    Stage lengths are fractions of the base period; the late stage takes
+    whatever is left.
+    """
+    kc_ini: float = 0.4
+    kc_mid: float = 1.15
+    kc_end: float = 0.6
+    ini_fraction: float = 0.2
+    dev_fraction: float = 0.3
+    mid_fraction: float = 0.3
+
+    def kc(self, days_since_sowing: np.ndarray, base_period: np.ndarray) -> np.ndarray:
+        """Crop coefficient per field; 0 before sowing and after the base period"""
+        days = np.asarray(days_since_sowing, dtype=np.float64)
+        period = np.maximum(np.asarray(base_period, dtype=np.float64), 1.0)
+        stage = days / period
+
+        dev_start = self.ini_fraction
+        mid_start = dev_start + self.dev_fraction
+        late_start = mid_start + self.mid_fraction
+        late_length = max(1.0 - late_start, 1e-9)
+
+        kc = np.where(
+            stage < dev_start, self.kc_ini,
+            np.where(
+                stage < mid_start,
+                self.kc_ini + (self.kc_mid - self.kc_ini) * (stage - dev_start) / self.dev_fraction,
+                np.where(
+                    stage < late_start,
+                    self.kc_mid,
+                    self.kc_mid + (self.kc_end - self.kc_mid) * (stage - late_start) / late_length
+                )
+            )
+        )
+        in_season = (days >= 0) & (days <= period)
+        return np.where(in_season, kc, 0.0)
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """Daily water balance results, each (n_fields, n_days)"""
+    irrigate: np.ndarray
+    depth_mm: np.ndarray
+    theta_percent: np.ndarray
+    taw_mm: np.ndarray
+    raw_mm: np.ndarray
+
+
+def soil_water_properties(sand, silt, clay, zr):
+    """
+    Field capacity, wilting point (percent), bulk density and root-zone depth (mm)
+
+    Same pedotransfer functions as water_requirements().
+    """
+    sand = np.asarray(sand, dtype=np.float64)
+    silt = np.asarray(silt, dtype=np.float64)
+    clay = np.asarray(clay, dtype=np.float64)
+    bd = 1.66 - 0.063 * np.log10(clay + 1)
+    theta_fc = 56.37 - 0.51 * sand - 0.27 * silt
+    theta_wp = 0.71 + 0.44 * clay
+    zr_mm = np.asarray(zr, dtype=np.float64) * 1000
+    return theta_fc, theta_wp, bd, zr_mm
+
+
+def schedule_irrigation(
+    sand,
+    silt,
+    clay,
+    rzsm_percent,
+    p,
+    zr,
+    days_since_sowing,
+    base_period,
+    n_days: int,
+    first_schedulable_day: int = 0,
+    known_irrigation_day: Optional[np.ndarray] = None,
+    et0=5.0,
+    rain=None,
+    kc_curve: KcCurve = KcCurve()
+) -> Schedule:
+    """
+    Run the daily water balance for n fields over n_days
+
+    Day 0 is the raster date the RZSM estimate belongs to.
+
+    Args:
+        sand, silt, clay: Soil texture percentages, (n,)
+        rzsm_percent: Root zone soil moisture on day 0 (percent), (n,)
+        p: Crop depletion fraction, (n,)
+        zr: Rooting depth in metres, (n,)
+        days_since_sowing: Crop age on day 0 in days, (n,)
+        base_period: Crop base period in days, (n,)
+        n_days: Number of days to simulate
+        first_schedulable_day: Days before this are only simulated (they are
+            already in the past), never scheduled
+        known_irrigation_day: Day offset of a reported irrigation per field, -1 if none
+        et0: Reference evapotranspiration in mm/day; scalar, (n_days,) or (n, n_days)
+        rain: Effective rainfall in mm/day, same shapes as et0; None for no rain
+        kc_curve: Crop coefficient curve
+
+    Returns:
+        Schedule: Per-day irrigation flags, depths (mm) and moisture after irrigation
+    """
+    theta_fc, theta_wp, bd, zr_mm = soil_water_properties(sand, silt, clay, zr)
+    p = np.asarray(p, dtype=np.float64)
+    n = theta_fc.shape[0]
+
+    taw = ((theta_fc - theta_wp) / 100) * bd * zr_mm
+    raw = p * taw
+    # Millimetres of water per percentage point of moisture in the root zone
+    mm_per_percent = bd * zr_mm / 100
+
+    et0 = np.broadcast_to(np.asarray(et0, dtype=np.float64), (n, n_days))
+    rain = np.zeros((n, n_days)) if rain is None else np.broadcast_to(np.asarray(rain, dtype=np.float64), (n, n_days))
+    known = np.full(n, -1) if known_irrigation_day is None else np.asarray(known_irrigation_day)
+    age = np.asarray(days_since_sowing, dtype=np.float64)
+    period = np.asarray(base_period, dtype=np.float64)
+
+    irrigate = np.zeros((n, n_days), dtype=bool)
+    depth = np.zeros((n, n_days))
+    theta_out = np.empty((n, n_days))
+    theta = np.clip(np.asarray(rzsm_percent, dtype=np.float64), theta_wp, theta_fc)
+
+    for day in range(n_days):
+        crop_age = age + day
+        in_season = (crop_age >= 0) & (crop_age <= period)
+
+        # A reported irrigation refills the root zone; it is not scheduled again
+        reported = known == day
+        theta = np.where(reported, theta_fc, theta)
+        if day >= first_schedulable_day:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pa = (theta_fc - theta) / theta_fc
+            trigger = in_season & ~reported & (p <= pa)
+            irrigate[:, day] = trigger
+            depth[:, day] = np.where(trigger, (theta_fc - theta) * mm_per_percent, 0.0)
+            theta = np.where(trigger, theta_fc, theta)
+        theta_out[:, day] = theta
+
+        etc = kc_curve.kc(crop_age, period) * et0[:, day]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            theta = theta - (etc - rain[:, day]) / mm_per_percent
+        theta = np.clip(theta, theta_wp, theta_fc)
+
+    return Schedule(irrigate=irrigate, depth_mm=depth, theta_percent=theta_out, taw_mm=taw, raw_mm=raw)
@@ -0,0 +1,249 @@
+"""
+Memory-mapped daily soil moisture cube.
+
+The ingest step converts each day's SMAP GeoTIFF into a raw NumPy array
+(`{date}.npy`) plus its affine transform and metadata (`{date}.json`).
+The API maps those arrays read-only with np.load(mmap_mode='r'), so every
+uvicorn worker shares the same OS page cache and a pixel lookup is a plain
+array index with no file open or decode. A mapped day is dropped when its
+.npy is re-ingested, and callers that pass the day's GeoTIFF fall back to it
+while the cube copy is older.
+
+Usage:
+    python sm_cube.py --raster-dir /app/sm_tif --cube-dir /app/data/sm_cube
+    python sm_cube.py --date 20250507
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+from raster_sampling import NoDataAtLocation, PixelOutOfBounds, in_bounds, is_nodata, pixel_index, pixel_indices
+
+logger = logging.getLogger(__name__)
+
+RASTER_FILENAME_PATTERN = re.compile(r'sm_surface_analysis_georeferenced_(\d{8})\.tif$')
+
+
+def raster_path_for(raster_dir: str, date_str: str) -> str:
+    """Path of the GeoTIFF for a YYYYMMDD date in the year/month/day layout"""
+    return os.path.join(
+        raster_dir, date_str[:4], date_str[4:6], date_str[6:8],
+        f"sm_surface_analysis_georeferenced_{date_str}.tif"
+    )
+
+
+def find_rasters(raster_dir: str) -> Dict[str, str]:
+    """Map YYYYMMDD date strings to GeoTIFF paths under raster_dir"""
+    rasters = {}
+    for path in glob.glob(os.path.join(raster_dir, '*', '*', '*', 'sm_surface_analysis_georeferenced_*.tif')):
+        match = RASTER_FILENAME_PATTERN.search(path)
+        if match:
+            rasters[match.group(1)] = path
+    return rasters
+
+
+def ingest_raster(raster_path: str, cube_dir: str, date_str: str) -> str:
+    """
+    Convert one GeoTIFF into a .npy array and a .json metadata sidecar
+
+    Files are written under temporary names and renamed into place, so readers
+    never see a half-written day.
+
+    Returns:
+        str: Path of the written .npy file
+    """
+    os.makedirs(cube_dir, exist_ok=True)
+    npy_path = os.path.join(cube_dir, f"{date_str}.npy")
+    meta_path = os.path.join(cube_dir, f"{date_str}.json")
+
+    with rasterio.open(raster_path) as dataset:
+        band = dataset.read(1)
+        meta = {
+            'date': date_str,
+            'transform': list(dataset.transform)[:6],
+            'height': dataset.height,
+            'width': dataset.width,
+            'dtype': str(band.dtype),
+            'nodata': dataset.nodata,
+            'crs': dataset.crs.to_string() if dataset.crs else None,
+            'source': os.path.abspath(raster_path),
+        }
+
+    tmp_npy = npy_path + '.tmp'
+    with open(tmp_npy, 'wb') as f:
+        np.save(f, np.ascontiguousarray(band))
+    tmp_meta = meta_path + '.tmp'
+    with open(tmp_meta, 'w') as f:
+        json.dump(meta, f)
+
+    # Metadata goes in first: a day is only visible once its .npy exists
+    os.replace(tmp_meta, meta_path)
+    os.replace(tmp_npy, npy_path)
+    logger.info(f"Ingested {raster_path} -> {npy_path}")
+    return npy_path
+
+
+def ingest_all(raster_dir: str, cube_dir: str, overwrite: bool = False) -> List[str]:
+    """Ingest every raster under raster_dir that is not already in the cube"""
+    written = []
+    for date_str, path in sorted(find_rasters(raster_dir).items()):
+        npy_path = os.path.join(cube_dir, f"{date_str}.npy")
+        if not overwrite and os.path.exists(npy_path) and os.path.getmtime(npy_path) >= os.path.getmtime(path):
+            continue
+        written.append(ingest_raster(path, cube_dir, date_str))
+    return written
+
+
+@dataclass(frozen=True)
+class DailyGrid:
+    """One day of surface soil moisture, backed by a read-only memory map"""
+    date: str
+    data: np.ndarray
+    transform: Affine
+    nodata: Optional[float]
+    # mtime of the .npy when it was mapped; a re-ingested day has a newer one
+    mtime: float = 0.0
+
+    def sample(self, latitude: float, longitude: float):
+        row, col = pixel_index(self.transform, latitude, longitude)
+        if not (0 <= row < self.data.shape[0] and 0 <= col < self.data.shape[1]):
+            raise PixelOutOfBounds(
+                f"Coordinates ({latitude}, {longitude}) are out of bounds for the raster"
+            )
+        value = self.data[row, col]
+        if is_nodata(value, self.nodata):
+            raise NoDataAtLocation(f"No data at coordinates ({latitude}, {longitude}) in the raster")
+        return value
+
+    def sample_many(self, latitudes, longitudes):
+        """Vectorized sample; returns (values, inside) with NaN for out-of-bounds and nodata points"""
+        rows, cols = pixel_indices(self.transform, latitudes, longitudes)
+        inside = in_bounds(rows, cols, self.data.shape[0], self.data.shape[1])
+        values = np.full(rows.shape, np.nan)
+        values[inside] = self.data[rows[inside], cols[inside]]
+        values[is_nodata(values, self.nodata)] = np.nan
+        return values, inside
+
+
+class SoilMoistureCube:
+    """LRU of memory-mapped daily grids stored in cube_dir"""
+
+    def __init__(self, cube_dir: str, max_days: int = 30):
+        self.cube_dir = cube_dir
+        self.max_days = max_days
+        self._days: "OrderedDict[str, DailyGrid]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _paths(self, date_str: str):
+        return (
+            os.path.join(self.cube_dir, f"{date_str}.npy"),
+            os.path.join(self.cube_dir, f"{date_str}.json"),
+        )
+
+    def day_mtime(self, date_str: str) -> Optional[float]:
+        """mtime of the day's .npy, or None if the day has not been ingested"""
+        try:
+            return os.path.getmtime(self._paths(date_str)[0])
+        except OSError:
+            return None
+
+    def get_day(self, date_str: str, source_path: Optional[str] = None) -> Optional[DailyGrid]:
+        """
+        Return the grid for a YYYYMMDD date, or None if it has not been ingested
+
+        A cached grid is remapped when the day has been re-ingested since it
+        was loaded.
+
+        Args:
+            date_str: YYYYMMDD date
+            source_path: The day's GeoTIFF; if it is newer than the cube copy
+                (re-delivered but not yet re-ingested), None is returned so the
+                caller reads the GeoTIFF instead
+        """
+        npy_path, meta_path = self._paths(date_str)
+        try:
+            mtime = os.path.getmtime(npy_path)
+        except OSError:
+            self.invalidate(date_str)
+            return None
+        if source_path is not None:
+            try:
+                if os.path.getmtime(source_path) > mtime:
+                    return None
+            except OSError:
+                pass
+
+        with self._lock:
+            grid = self._days.get(date_str)
+            if grid is not None and grid.mtime == mtime:
+                self._days.move_to_end(date_str)
+                return grid
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except OSError:
+            return None
+        grid = DailyGrid(
+            date=date_str,
+            data=np.load(npy_path, mmap_mode='r'),
+            transform=Affine(*meta['transform']),
+            nodata=meta.get('nodata'),
+            mtime=mtime,
+        )
+
+        with self._lock:
+            self._days[date_str] = grid
+            self._days.move_to_end(date_str)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return grid
+
+    def invalidate(self, date_str: str):
+        with self._lock:
+            self._days.pop(date_str, None)
+
+    def sample(self, date_str: str, latitude: float, longitude: float, source_path: Optional[str] = None):
+        """
+        Read a pixel from the day's grid
+
+        Raises:
+            KeyError: If the day has not been ingested, or source_path is newer than the cube copy
+            PixelOutOfBounds: If the coordinates are outside the grid
+            NoDataAtLocation: If the pixel holds the day's nodata value
+        """
+        grid = self.get_day(date_str, source_path)
+        if grid is None:
+            raise KeyError(date_str)
+        return grid.sample(latitude, longitude)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest SMAP GeoTIFFs into the memory-mapped soil moisture cube")
+    parser.add_argument('--raster-dir', default=os.environ.get('RASTER_BASE_PATH', '/app/sm_tif'))
+    parser.add_argument('--cube-dir', default=os.environ.get('SM_CUBE_PATH', '/app/data/sm_cube'))
+    parser.add_argument('--date', help="Only ingest this YYYYMMDD date")
+    parser.add_argument('--overwrite', action='store_true', help="Re-ingest days that are already in the cube")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.date:
+        ingest_raster(raster_path_for(args.raster_dir, args.date), args.cube_dir, args.date)
+    else:
+        written = ingest_all(args.raster_dir, args.cube_dir, overwrite=args.overwrite)
+        logger.info(f"Ingested {len(written)} day(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Pixel-major soil moisture time series.
+
+The daily GeoTIFFs are laid out one file per day, so a one-year series for a
+single pixel would mean opening hundreds of rasters. This store transposes
+the archive into one array per year with shape (height, width, days_in_year):
+
+    {ts_dir}/{year}.npy     raw SSM values, time innermost
+    {ts_dir}/{year}.json    transform, nodata and which days are present
+
+A pixel's whole year is then one contiguous slice of a memory-mapped array,
+and a multi-year query reads one slice per year.
+
+The .json is the commit marker: it is only written once the .npy it
+describes is in place, readers ignore a year without it, and an .npy left
+without one by an interrupted run is rebuilt on the next append.
+
+Usage:
+    python sm_timeseries.py --raster-dir /app/sm_tif --ts-dir /app/data/sm_timeseries
+    python sm_timeseries.py --date 20250507
+"""
+import argparse
+import calendar
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+from raster_sampling import PixelOutOfBounds, pixel_index
+from sm_cube import find_rasters, raster_path_for
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.Lock()
+
+
+def _year_paths(ts_dir: str, year: int) -> Tuple[str, str]:
+    return (
+        os.path.join(ts_dir, f"{year}.npy"),
+        os.path.join(ts_dir, f"{year}.json"),
+    )
+
+
+def _day_of_year(date_str: str) -> Tuple[int, int]:
+    """(year, zero-based day of year) for a YYYYMMDD date"""
+    day = datetime.strptime(date_str, '%Y%m%d')
+    return day.year, day.timetuple().tm_yday - 1
+
+
+def _days_in_year(year: int) -> int:
+    return 366 if calendar.isleap(year) else 365
+
+
+def _write_meta(meta_path: str, meta: dict):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def append_day(raster_path: str, ts_dir: str, date_str: str) -> str:
+    """
+    Write one day's raster into its year's array, creating the year if needed
+
+    The band is written into the memory-mapped array before the day is marked
+    present in the metadata, so readers never see a half-written day. A year
+    whose metadata is missing is created from scratch.
+
+    Returns:
+        str: Path of the year's .npy file
+
+    Raises:
+        ValueError: If the raster's grid does not match the year's grid
+    """
+    year, doy = _day_of_year(date_str)
+    npy_path, meta_path = _year_paths(ts_dir, year)
+
+    with rasterio.open(raster_path) as dataset:
+        band = dataset.read(1)
+        transform = list(dataset.transform)[:6]
+        nodata = dataset.nodata
+
+    with _write_lock:
+        os.makedirs(ts_dir, exist_ok=True)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['height'] != band.shape[0] or meta['width'] != band.shape[1] or meta['transform'] != transform:
+                raise ValueError(f"Raster grid for {date_str} does not match the {year} time series")
+            series = np.load(npy_path, mmap_mode='r+')
+            tmp_path = None
+        else:
+            meta = {
+                'year': year,
+                'transform': transform,
+                'height': band.shape[0],
+                'width': band.shape[1],
+                'dtype': str(band.dtype),
+                'nodata': nodata,
+                'present': [False] * _days_in_year(year),
+            }
+            tmp_path = npy_path + '.tmp'
+            series = np.lib.format.open_memmap(
+                tmp_path, mode='w+', dtype=band.dtype, shape=(band.shape[0], band.shape[1], _days_in_year(year))
+            )
+            series[:] = nodata if nodata is not None else 0
+
+        series[:, :, doy] = band
+        series.flush()
+        del series
+        if tmp_path is not None:
+            # The metadata below commits the year, so the array has to be in place first
+            os.replace(tmp_path, npy_path)
+
+        meta['present'][doy] = True
+        _write_meta(meta_path, meta)
+
+    logger.info(f"Added {date_str} to time series {npy_path}")
+    return npy_path
+
+
+def build_all(raster_dir: str, ts_dir: str, year: Optional[int] = None) -> List[str]:
+    """Add every raster under raster_dir (optionally only one year) to the time series"""
+    written = []
+    for date_str, path in sorted(find_rasters(raster_dir).items()):
+        if year is not None and int(date_str[:4]) != year:
+            continue
+        try:
+            append_day(path, ts_dir, date_str)
+            written.append(date_str)
+        except Exception as e:
+            logger.error(f"Skipping {date_str}: {str(e)}")
+    return written
+
+
+@dataclass(frozen=True)
+class _YearSeries:
+    data: np.ndarray
+    transform: Affine
+    nodata: Optional[float]
+    present: np.ndarray
+    mtime: float
+
+
+class SoilMoistureTimeSeries:
+    """Reader for the per-year pixel-major arrays in ts_dir"""
+
+    def __init__(self, ts_dir: str):
+        self.ts_dir = ts_dir
+        self._years: Dict[int, _YearSeries] = {}
+        self._lock = threading.Lock()
+
+    def _get_year(self, year: int) -> Optional[_YearSeries]:
+        npy_path, meta_path = _year_paths(self.ts_dir, year)
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._years.get(year)
+        # The metadata is rewritten whenever a day is added
+        if cached is not None and cached.mtime == mtime:
+            return cached
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            data = np.load(npy_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping {year} time series: {str(e)}")
+            return None
+        series = _YearSeries(
+            data=data,
+            transform=Affine(*meta['transform']),
+            nodata=meta.get('nodata'),
+            present=np.asarray(meta['present'], dtype=bool),
+            mtime=mtime,
+        )
+        with self._lock:
+            self._years[year] = series
+        return series
+
+    def years(self) -> List[int]:
+        if not os.path.isdir(self.ts_dir):
+            return []
+        # Only years with metadata are complete
+        return sorted(int(name[:-5]) for name in os.listdir(self.ts_dir) if name.endswith('.json') and name[:-5].isdigit())
+
+    def pixel_series(self, latitude: float, longitude: float, start: date, end: date) -> Tuple[List[date], np.ndarray]:
+        """
+        Raw SSM values for one pixel between start and end inclusive
+
+        Days that are missing from the archive or hold nodata are left out.
+
+        Returns:
+            tuple: (dates, raw values as float64)
+
+        Raises:
+            PixelOutOfBounds: If the coordinates are outside the grid
+        """
+        dates: List[date] = []
+        chunks: List[np.ndarray] = []
+        for year in range(start.year, end.year + 1):
+            series = self._get_year(year)
+            if series is None:
+                continue
+            row, col = pixel_index(series.transform, latitude, longitude)
+            if not (0 <= row < series.data.shape[0] and 0 <= col < series.data.shape[1]):
+                raise PixelOutOfBounds(
+                    f"Coordinates ({latitude}, {longitude}) are out of bounds for the raster"
+                )
+
+            first = (max(start, date(year, 1, 1)) - date(year, 1, 1)).days
+            last = (min(end, date(year, 12, 31)) - date(year, 1, 1)).days
+            values = np.asarray(series.data[row, col, first:last + 1], dtype=np.float64)
+            keep = series.present[first:last + 1] & np.isfinite(values)
+            if series.nodata is not None:
+                keep &= values != series.nodata
+
+            offsets = np.flatnonzero(keep) + first
+            dates.extend(date(year, 1, 1) + timedelta(days=int(offset)) for offset in offsets)
+            chunks.append(values[keep])
+
+        values = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.float64)
+        return dates, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the pixel-major soil moisture time series from the GeoTIFF archive")
+    parser.add_argument('--raster-dir', default=os.environ.get('RASTER_BASE_PATH', '/app/sm_tif'))
+    parser.add_argument('--ts-dir', default=os.environ.get('SM_TIMESERIES_PATH', '/app/data/sm_timeseries'))
+    parser.add_argument('--date', help="Only add this YYYYMMDD date")
+    parser.add_argument('--year', type=int, help="Only add rasters from this year")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.date:
+        append_day(raster_path_for(args.raster_dir, args.date), args.ts_dir, args.date)
+    else:
+        written = build_all(args.raster_dir, args.ts_dir, year=args.year)
+        logger.info(f"Added {len(written)} day(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Spatial index over the soil parameter table.
+
+Soil sample points are projected to a local equirectangular plane (km) and
+stored in a KD-tree, so a farm location resolves to its nearest soil record,
+or an inverse-distance weighted blend of its k nearest records, in O(log n).
+"""
+import math
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+SOIL_COLUMNS = ['SAND', 'SILT', 'CLAY', 'BD', 'HC']
+
+
+@dataclass(frozen=True)
+class SoilRecord:
+    sand: float
+    silt: float
+    clay: float
+    bd: float
+    hc: float
+    distance_km: float = 0.0
+
+
+class SoilIndex:
+    """KD-tree over soil sample coordinates"""
+
+    def __init__(self, df: pd.DataFrame, max_distance_km: float = 10.0, neighbours: int = 1, power: float = 2.0):
+        """
+        Args:
+            df: Soil table with LATITUDE, LONGITUDE and SOIL_COLUMNS
+            max_distance_km: Locations further than this from every sample get no record
+            neighbours: Number of samples to blend; 1 returns the nearest record as-is
+            power: Inverse-distance weighting exponent
+        """
+        df = df.dropna(subset=['LATITUDE', 'LONGITUDE'])
+        if df.empty:
+            raise ValueError("Soil table has no rows with coordinates")
+
+        lat = df['LATITUDE'].to_numpy(dtype=np.float64)
+        lon = df['LONGITUDE'].to_numpy(dtype=np.float64)
+        # Reference latitude for the projection; good to well under 1% over a state
+        self._cos_lat0 = math.cos(math.radians(float(np.mean(lat))))
+
+        self.values = df[SOIL_COLUMNS].to_numpy(dtype=np.float64)
+        self.tree = cKDTree(self._project(lat, lon))
+        self.max_distance_km = max_distance_km
+        self.neighbours = max(1, min(neighbours, len(df)))
+        self.power = power
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def _project(self, lat, lon) -> np.ndarray:
+        lat_rad = np.radians(lat)
+        lon_rad = np.radians(lon)
+        return np.column_stack((
+            EARTH_RADIUS_KM * lon_rad * self._cos_lat0,
+            EARTH_RADIUS_KM * lat_rad,
+        ))
+
+    def query(self, latitude, longitude):
+        """
+        Vectorized lookup for many locations
+
+        Args:
+            latitude: Array of latitudes
+            longitude: Array of longitudes
+
+        Returns:
+            tuple: (values, distances, found) where values is an (n, 5) array in
+            SOIL_COLUMNS order, distances is the distance to the nearest sample
+            in km and found marks locations within max_distance_km
+        """
+        points = self._project(np.atleast_1d(np.asarray(latitude, dtype=np.float64)),
+                               np.atleast_1d(np.asarray(longitude, dtype=np.float64)))
+        k = self.neighbours
+        dist, idx = self.tree.query(points, k=k, distance_upper_bound=self.max_distance_km)
+        if k == 1:
+            dist = dist[:, None]
+            idx = idx[:, None]
+
+        # Missing neighbours come back as inf distance and index == len(self)
+        valid = np.isfinite(dist)
+        found = valid[:, 0]
+        values = np.full((points.shape[0], self.values.shape[1]), np.nan)
+
+        if k == 1:
+            values[found] = self.values[idx[found, 0]]
+        else:
+            safe_idx = np.where(valid, idx, 0)
+            exact = valid & (dist == 0)
+            with np.errstate(divide='ignore'):
+                weights = np.where(valid, 1.0 / np.power(dist, self.power), 0.0)
+            # A sample sitting exactly on the location wins outright
+            has_exact = exact.any(axis=1)
+            weights[has_exact] = exact[has_exact].astype(np.float64)
+            weights_sum = weights.sum(axis=1, keepdims=True)
+            blended = np.einsum('nk,nkc->nc', weights, self.values[safe_idx])
+            values[found] = blended[found] / weights_sum[found]
+
+        return values, dist[:, 0], found
+
+    def lookup(self, latitude: float, longitude: float) -> Optional[SoilRecord]:
+        """Return the soil record for a single location, or None if out of range"""
+        values, dist, found = self.query(latitude, longitude)
+        if not found[0]:
+            return None
+        sand, silt, clay, bd, hc = (float(v) for v in values[0])
+        return SoilRecord(sand=sand, silt=silt, clay=clay, bd=bd, hc=hc, distance_km=float(dist[0]))
+
+    def sample_key(self, latitude: float, longitude: float) -> Optional[Hashable]:
+        """
+        Identify the soil record a location resolves to, for use in cache keys
+
+        With a single neighbour this is the nearest sample's row; blended
+        lookups vary with position, so the coordinates (to ~10 m) are used.
+        """
+        if self.neighbours > 1:
+            return (round(latitude, 4), round(longitude, 4))
+        point = self._project(np.atleast_1d(latitude), np.atleast_1d(longitude))
+        dist, idx = self.tree.query(point, k=1, distance_upper_bound=self.max_distance_km)
+        if not np.isfinite(dist[0]):
+            return None
+        return int(idx[0])
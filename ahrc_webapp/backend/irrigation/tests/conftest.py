@@ -0,0 +1,48 @@
+"""
+The irrigation app reads its configuration at import time, so it is imported
+once per test session against the synthetic environment benchmark.py builds.
+"""
+import asyncio
+import importlib
+import os
+from argparse import Namespace
+
+import pytest
+import rasterio
+
+import benchmark
+from raster_sampling import pixel_index
+from sm_cube import find_rasters, ingest_raster
+
+ARGS = Namespace(
+    seed=7, soil_points=3000, trees=10, max_depth=6, sklearn_model=False,
+    raster_size=(600, 700), days=1, cube=False, cache_size=0,
+    concurrency=4, batch_size=100, farms=80,
+)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    work_dir = str(tmp_path_factory.mktemp("irrigation"))
+    env = benchmark.build_environment(work_dir, ARGS)
+    fields = benchmark.make_inputs(80, ARGS)
+
+    # The first field's pixel value becomes the raster's nodata value, so
+    # some fields fall on nodata pixels
+    (date_str, raster_path), = find_rasters(env['RASTER_BASE_PATH']).items()
+    with rasterio.open(raster_path, 'r+') as dataset:
+        row, col = pixel_index(dataset.transform, fields[0]['latitude'], fields[0]['longitude'])
+        dataset.nodata = int(dataset.read(1)[row, col])
+    ingest_raster(raster_path, env['SM_CUBE_PATH'], date_str)
+
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in env.items():
+            mp.setenv(key, value)
+        # Cube mode is switched on per test; start from an empty cube
+        mp.setenv('SM_CUBE_PATH', os.path.join(work_dir, 'no_cube'))
+        module = importlib.import_module('app')
+        asyncio.run(module.startup_event())
+        try:
+            yield module, env, fields
+        finally:
+            asyncio.run(module.shutdown_event())
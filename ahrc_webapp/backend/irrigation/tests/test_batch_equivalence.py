@@ -0,0 +1,78 @@
+"""
+/process/batch must give every field exactly what /process gives it
+
+Both endpoints are driven through the ASGI app for the GeoTIFF
+bounding-box read, the GeoTIFF block-by-block read and the memory-mapped cube.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from sm_cube import SoilMoistureCube
+
+
+def equivalence_fields(fields):
+    """Synthetic farms plus edge cases built from a usable farm, fields[1]"""
+    template = fields[1]
+    return fields + [
+        dict(template, latitude=30.0, longitude=70.0),     # outside the raster
+        dict(template, cropName='Dragonfruit'),            # not in the p-table
+        dict(template, cropName='RICE'),                   # crop names are matched case-insensitively
+        dict(template, cropName='  rice '),                # but not trimmed: an unknown crop on both paths
+        dict(template, latitude=17.85, longitude=87.55),   # corner, likely no soil sample nearby
+    ]
+
+
+async def post_both(module, fields):
+    transport = httpx.ASGITransport(app=module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        singles = [await client.post('/process', json=field) for field in fields]
+        batch = await client.post('/process/batch', json={'fields': fields})
+    return singles, batch
+
+
+def without_timestamp(result):
+    return {key: value for key, value in result.items() if key != 'timestamp'}
+
+
+@pytest.mark.parametrize("mode", ["window", "blocks", "cube"])
+def test_batch_matches_single_field_results(app_module, monkeypatch, mode):
+    module, env, fields = app_module
+    if mode == "blocks":
+        # Force the block-by-block read: no bounding box fits in one pixel
+        monkeypatch.setattr(module.raster_pool, "max_window_pixels", 1)
+    if mode == "cube":
+        monkeypatch.setattr(module, "sm_cube", SoilMoistureCube(env['SM_CUBE_PATH']))
+
+    fields = equivalence_fields(fields)
+    singles, batch = asyncio.run(post_both(module, fields))
+
+    assert batch.status_code == 200
+    results = batch.json()['results']
+    assert [item['index'] for item in results] == list(range(len(fields)))
+
+    statuses = set()
+    for field, single, item in zip(fields, singles, results):
+        statuses.add(single.status_code)
+        if single.status_code == 200:
+            assert item['error'] is None, field
+            assert without_timestamp(item['result']) == without_timestamp(single.json()), field
+        else:
+            assert item['result'] is None, field
+            assert item['error'] == single.json()['detail'], field
+
+    # The crop name edge cases behave as documented, not just identically
+    rice_upper, rice_padded = len(fields) - 3, len(fields) - 2
+    assert singles[1].status_code == 200
+    assert singles[rice_upper].status_code == 200
+    assert results[rice_upper]['result']['cropName'] == 'RICE'
+    assert "Crop '  rice ' not found" in results[rice_padded]['error']
+
+    # The comparison covered successes as well as each kind of per-field error
+    assert 200 in statuses
+    assert 400 in statuses
+    assert 404 in statuses
+    details = {single.json().get('detail', '') for single in singles if single.status_code != 200}
+    assert any(detail.startswith('No data at coordinates') for detail in details)
+    assert any('not found in the database' in detail for detail in details)
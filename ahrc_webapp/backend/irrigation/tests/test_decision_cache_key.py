@@ -0,0 +1,29 @@
+"""
+A decision computed before a reference data reload must not be served after it
+"""
+import dataclasses
+
+from decision_cache import DecisionCache
+
+
+def test_results_from_before_a_reload_are_not_served_after_it(app_module, monkeypatch):
+    module, env, fields = app_module
+    monkeypatch.setattr(module, "decision_cache", DecisionCache(max_entries=100))
+    data = module.IrrigationInput(**fields[1])
+    date_str, raster_path = module.raster_index.resolve(module.datetime.now() - module.timedelta(days=3))
+    old_ref = module.get_reference_data()
+
+    # A request keys its work against the loaded reference data...
+    old_key = module.decision_cache_key(data, date_str, raster_path)
+    assert old_key is not None
+
+    # ...the data is reloaded and a second request starts the new generation...
+    new_ref = dataclasses.replace(old_ref, loaded_at=old_ref.loaded_at + "-reloaded")
+    monkeypatch.setattr(module, "get_reference_data", lambda: new_ref)
+    new_key = module.decision_cache_key(data, date_str, raster_path)
+
+    # ...then the first request stores its result, computed from the old data
+    module.decision_cache.put(old_key, (True, 1.0, 2.0))
+
+    assert new_key != old_key
+    assert module.decision_cache.get(new_key) is None
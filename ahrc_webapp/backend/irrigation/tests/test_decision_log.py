@@ -0,0 +1,34 @@
+"""
+Date-range queries against the decision log
+"""
+from decision_log import DecisionLog
+
+
+def decision(timestamp, crop='rice'):
+    return {
+        'timestamp': timestamp, 'cropName': crop, 'latitude': 22.5, 'longitude': 85.0,
+        'turnOnPump': True, 'pumpRunningTime': 1.5, 'pumpDischargeRate': 2.0,
+    }
+
+
+def test_a_bare_end_date_covers_the_whole_day_and_no_more(tmp_path):
+    log = DecisionLog(str(tmp_path / 'decisions.db'), flush_interval=0.05)
+    log.open()
+    timestamps = [
+        '2026-10-16T23:59:59.999999',
+        '2026-10-17T00:00:00',
+        '2026-10-17T23:59:59.999999',
+        '2026-10-18T00:00:00',
+        '2026-10-18T00:00:00.000001',
+    ]
+    for timestamp in timestamps:
+        log.record(decision(timestamp))
+    log.close()
+
+    def recorded(**filters):
+        return sorted(row['timestamp'] for row in log.query(**filters))
+
+    assert recorded(start='2026-10-17', end='2026-10-17') == timestamps[1:3]
+    assert recorded(end='2026-10-17') == timestamps[:3]
+    # A full datetime is still an inclusive bound
+    assert recorded(end='2026-10-18T00:00:00') == timestamps[:4]
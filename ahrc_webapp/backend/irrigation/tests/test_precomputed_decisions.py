@@ -0,0 +1,55 @@
+import os
+import shutil
+
+import pytest
+
+from decision_rasters import build_decision_rasters
+from sm_cube import SoilMoistureCube, find_rasters
+
+
+@pytest.fixture
+def decision_rasters(app_module, monkeypatch):
+    """Build the day's decision rasters, then remove them so other tests run live"""
+    module, env, fields = app_module
+    (date_str, raster_path), = find_rasters(env['RASTER_BASE_PATH']).items()
+    monkeypatch.setattr(module, "sm_cube", SoilMoistureCube(env['SM_CUBE_PATH']))
+    build_decision_rasters(module.get_reference_data(), raster_path, env['DECISION_RASTER_PATH'], date_str)
+    try:
+        yield module, date_str, raster_path, env, fields
+    finally:
+        module.raster_pool.close_all()
+        shutil.rmtree(env['DECISION_RASTER_PATH'])
+
+
+def precomputed(module, date_str, raster_path, fields):
+    return [
+        module.get_precomputed_decision(date_str, raster_path, f['cropName'], f['latitude'], f['longitude'])
+        for f in fields
+    ]
+
+
+def newer_than_rasters(path, env, date_str):
+    built_at = os.path.getmtime(os.path.join(env['DECISION_RASTER_PATH'], date_str, 'rzsm.tif'))
+    original = os.path.getmtime(path)
+    os.utime(path, (built_at + 60, built_at + 60))
+    return original
+
+
+def test_fresh_rasters_answer_most_fields(decision_rasters):
+    module, date_str, raster_path, env, fields = decision_rasters
+    answers = precomputed(module, date_str, raster_path, fields)
+    assert sum(answer is not None for answer in answers) > len(fields) // 2
+
+
+@pytest.mark.parametrize("redelivered", ["geotiff", "cube"])
+def test_redelivered_soil_moisture_is_not_served_from_old_rasters(decision_rasters, redelivered):
+    module, date_str, raster_path, env, fields = decision_rasters
+    path = raster_path if redelivered == "geotiff" else os.path.join(env['SM_CUBE_PATH'], f"{date_str}.npy")
+
+    original = newer_than_rasters(path, env, date_str)
+    try:
+        assert precomputed(module, date_str, raster_path, fields) == [None] * len(fields)
+    finally:
+        os.utime(path, (original, original))
+
+    assert any(answer is not None for answer in precomputed(module, date_str, raster_path, fields))
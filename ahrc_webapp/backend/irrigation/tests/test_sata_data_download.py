@@ -0,0 +1,147 @@
+"""
+SmapDownloader against a local stand-in for the NSIDC archive and Earthdata login
+
+The data server listens on 127.0.0.1 and the auth server is reached as
+"localhost", so they are different hosts to the downloader, as in production.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+
+import pytest
+from aiohttp import web
+
+from sata_data_download import HDF5_SIGNATURE, DownloaderConfig, DownloadError, SmapDownloader
+
+USERNAME, PASSWORD = "farmer", "s3cret"
+GRANULE = "SMAP_L4_SM_gph_20261015T090000_Vv8011_001.h5"
+CONTENT = HDF5_SIGNATURE + os.urandom(200_000)
+
+
+class ArchiveStandIn:
+    """Serves one granule behind an Earthdata-style login redirect"""
+
+    def __init__(self, truncate_first=False, checksum=None):
+        self.truncate_first = truncate_first
+        self.checksum = checksum
+        self.data_requests = []
+        self.auth_requests = []
+
+    async def start(self):
+        data = web.Application()
+        data.router.add_get(f"/data/{GRANULE}", self.granule)
+        data.router.add_get(f"/data/{GRANULE}.md5", self.sidecar)
+        auth = web.Application()
+        auth.router.add_get("/oauth/authorize", self.authorize)
+
+        self._runners = [web.AppRunner(data), web.AppRunner(auth)]
+        for runner in self._runners:
+            await runner.setup()
+        data_site = web.TCPSite(self._runners[0], "127.0.0.1", 0)
+        auth_site = web.TCPSite(self._runners[1], "127.0.0.1", 0)
+        await data_site.start()
+        await auth_site.start()
+        self.data_url = f"http://127.0.0.1:{data_site._server.sockets[0].getsockname()[1]}/data"
+        self.auth_url = f"http://localhost:{auth_site._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+
+    async def authorize(self, request):
+        self.auth_requests.append(dict(request.headers))
+        expected = "Basic " + base64.b64encode(f"{USERNAME}:{PASSWORD}".encode()).decode()
+        if request.headers.get("Authorization") != expected:
+            return web.Response(status=401)
+        raise web.HTTPFound(request.query["redirect_uri"] + "?token=granted")
+
+    async def sidecar(self, request):
+        if self.checksum is None:
+            raise web.HTTPNotFound()
+        return web.Response(text=f"{self.checksum}  {GRANULE}\n")
+
+    async def granule(self, request):
+        self.data_requests.append(dict(request.headers))
+        if request.query.get("token") != "granted":
+            raise web.HTTPFound(f"{self.auth_url}/oauth/authorize?redirect_uri={request.url.with_query(None)}")
+
+        start = 0
+        if "Range" in request.headers:
+            start = int(request.headers["Range"].split("=")[1].rstrip("-"))
+        response = web.StreamResponse(status=206 if start else 200)
+        response.content_length = len(CONTENT) - start
+        if start:
+            response.headers["Content-Range"] = f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+        await response.prepare(request)
+
+        body = CONTENT[start:]
+        if self.truncate_first:
+            # Drop the connection half way through the first transfer
+            self.truncate_first = False
+            await response.write(body[:len(body) // 2])
+            request.transport.close()
+            return response
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+
+def run_download(tmp_path, stand_in, retry_count=3):
+    async def main():
+        await stand_in.start()
+        try:
+            config = DownloaderConfig(
+                base_url=stand_in.data_url,
+                out_dir=str(tmp_path),
+                username=USERNAME,
+                password=PASSWORD,
+                auth_host="localhost",
+                retry_count=retry_count,
+                chunk_size=16 * 1024,
+                timeout=10,
+            )
+            async with SmapDownloader(config) as downloader:
+                return await downloader.download(f"{stand_in.data_url}/{GRANULE}")
+        finally:
+            await stand_in.stop()
+
+    return asyncio.run(main())
+
+
+def test_login_redirect_sends_credentials_only_to_the_auth_host(tmp_path):
+    stand_in = ArchiveStandIn(checksum=hashlib.md5(CONTENT).hexdigest())
+
+    path = run_download(tmp_path, stand_in)
+
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(path + ".part")
+    assert len(stand_in.auth_requests) == 1
+    assert all("Authorization" not in headers for headers in stand_in.data_requests)
+
+
+def test_truncated_transfer_is_resumed_with_a_range_request(tmp_path):
+    stand_in = ArchiveStandIn(truncate_first=True)
+
+    path = run_download(tmp_path, stand_in)
+
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    ranges = [headers.get("Range") for headers in stand_in.data_requests]
+    # Each attempt starts unauthenticated and is redirected through the login
+    assert ranges[0] is None
+    resumed = [value for value in ranges if value]
+    assert resumed
+    offset = int(resumed[0].split("=")[1].rstrip("-"))
+    assert 0 < offset < len(CONTENT)
+
+
+def test_md5_mismatch_is_rejected_and_not_kept(tmp_path, caplog):
+    stand_in = ArchiveStandIn(checksum=hashlib.md5(b"something else").hexdigest())
+
+    with pytest.raises(DownloadError, match="after 1 attempts"):
+        run_download(tmp_path, stand_in, retry_count=1)
+
+    assert "Checksum mismatch" in caplog.text
+    assert os.listdir(tmp_path) == []
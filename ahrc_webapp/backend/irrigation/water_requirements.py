@@ -0,0 +1,135 @@
+"""
+Array-native irrigation formulas.
+
+The crop p-table is parsed once into a CropTable, with "a-b" rooting depth
+ranges resolved to their midpoint at load time. water_requirements and
+pump_discharge_rate take NumPy arrays (or scalars) and are used by both the
+single-field and the batch endpoints, so the two paths give identical
+results.
+
+Rounding is left to the caller: np.round and the built-in round() disagree
+on some halfway cases, and responses have always used round().
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_CROP = -1
+
+
+def parse_rooting_depth(zr_val) -> float:
+    """Parse a Zr cell: a number, or an "a-b" range which is averaged"""
+    if isinstance(zr_val, str) and '-' in zr_val:
+        zr_range = list(map(float, zr_val.split('-')))
+        return sum(zr_range) / len(zr_range)  # average if range
+    return float(zr_val)
+
+
+@dataclass(frozen=True)
+class CropTable:
+    """Pre-parsed crop parameters, indexed by lower-cased crop name"""
+    names: Tuple[str, ...]
+    index: Dict[str, int]
+    p: np.ndarray
+    zr: np.ndarray
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "CropTable":
+        names, index, p_values, zr_values = [], {}, [], []
+        for row in df.itertuples(index=False):
+            name = str(row.crop_name).strip()
+            key = name.lower()
+            # First row wins for duplicate names, as the old DataFrame lookup did
+            if key in index:
+                continue
+            try:
+                zr = parse_rooting_depth(row.Zr)
+            except (TypeError, ValueError):
+                logger.error(f"Invalid Zr value {row.Zr!r} for crop '{name}'")
+                zr = np.nan
+            index[key] = len(names)
+            names.append(name)
+            p_values.append(float(row.p))
+            zr_values.append(zr)
+        return cls(
+            names=tuple(names),
+            index=index,
+            p=np.array(p_values, dtype=np.float64),
+            zr=np.array(zr_values, dtype=np.float64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def lookup(self, crop_name: str) -> int:
+        """Crop index for a name, or UNKNOWN_CROP"""
+        return self.index.get(crop_name.lower(), UNKNOWN_CROP)
+
+    def lookup_many(self, crop_names: Iterable[str]) -> np.ndarray:
+        return np.array([self.lookup(name) for name in crop_names], dtype=np.int64)
+
+
+def water_requirements(sand, silt, clay, rsm, p, zr) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized irrigation decision
+
+    Args:
+        sand: Sand content percentage
+        silt: Silt content percentage
+        clay: Clay content percentage
+        rsm: Root zone soil moisture (percent)
+        p: Crop depletion fraction
+        zr: Rooting depth in metres
+
+    Returns:
+        tuple: (irrigation_needed, RAW in mm), unrounded
+    """
+    sand = np.asarray(sand, dtype=np.float64)
+    silt = np.asarray(silt, dtype=np.float64)
+    clay = np.asarray(clay, dtype=np.float64)
+    rsm = np.asarray(rsm, dtype=np.float64)
+    p = np.asarray(p, dtype=np.float64)
+    zr = np.asarray(zr, dtype=np.float64)
+
+    # Bulk density (Mg/m³), field capacity and wilting point (percent)
+    bd = 1.66 - 0.063 * np.log10(clay + 1)
+    theta_fc_percent = 56.37 - 0.51 * sand - 0.27 * silt
+    theta_wp_percent = 0.71 + 0.44 * clay
+
+    zr_mm = zr * 1000
+
+    taw = ((theta_fc_percent - theta_wp_percent) / 100) * bd * zr_mm
+    raw = p * taw
+
+    pa = ((theta_fc_percent - rsm) / theta_fc_percent)
+
+    return p <= pa, raw
+
+
+def pump_discharge_rate(well_depth, predicted_water_level, well_radius) -> np.ndarray:
+    """
+    Vectorized pump discharge rate, unrounded
+
+    Entries where log10(100 - well_radius) is zero or undefined come back as NaN.
+    """
+    well_depth = np.asarray(well_depth, dtype=np.float64)
+    predicted_water_level = np.asarray(predicted_water_level, dtype=np.float64)
+    well_radius = np.asarray(well_radius, dtype=np.float64)
+
+    numerator = 2.72 * (0.5 * well_depth) * (
+        predicted_water_level - (well_depth - (predicted_water_level / 3))
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominator = np.log10(100 - well_radius)
+        rate = np.where(denominator == 0, np.nan, numerator / denominator)
+    return rate
+
+
+def round3(values) -> list:
+    """Round an array to 3 decimals element-wise with the built-in round()"""
+    return [round(float(v), 3) for v in np.ravel(values)]
@@ -0,0 +1,79 @@
+"""
+Bounded worker pool for blocking work in the irrigation API.
+
+Raster reads, model inference and the formulas run in a thread pool so the
+event loop stays free for other requests (including /health). Admission is
+bounded: once every worker is busy and the wait queue is full, new work is
+rejected immediately with PoolSaturated instead of piling up.
+
+A job counts against the bound until its thread finishes, even if the
+request that submitted it was cancelled (client disconnect, timeout), since
+the thread keeps running either way.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool has no free worker and no queue slot"""
+
+
+class BoundedWorkerPool:
+    """Thread pool with a hard cap on queued work"""
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 32):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="irrigation-worker")
+        # Incremented on the event loop, decremented by the job's done-callback on a worker thread
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self.max_workers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+        }
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on a worker thread
+
+        Raises:
+            PoolSaturated: If all workers are busy and the queue is full
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise PoolSaturated(
+                    f"Worker pool saturated ({self.max_workers} running, {self.max_queue} queued)"
+                )
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Released when the job itself finishes (or is cancelled before starting),
+        # not when the awaiting request goes away
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,26 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Form
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, UpSampling2D, concatenate, Dropout
-from tensorflow.keras.models import Model
 from PIL import Image
 import io
+import os
+import re
+import asyncio
 import logging
 import base64
+import uuid
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from common.instrumentation import Instrumentation
+from common.inference import CompiledPredictor, TFLitePredictor
+from common.quantize import served_variant
+from batching import MicroBatcher, BatcherSaturated
+from model import NB_CLASSES, WEIGHTS_PATH, preprocess_image, unet
+from volume import VOLUME_EXTENSIONS, VolumeFormatError, open_volume, to_uint8, layer_thickness
+from tiling import segment_tiled
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,138 +37,278 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variable to store the model
+# Request/stage timings, served at /metrics
+metrics = Instrumentation("oct")
+metrics.install(app)
+
+# Global variables to store the model and its compiled inference function
 model = None
+predictor = None
 
-def unet(img_rows, img_cols, nb_classes):
-    """Define the U-Net architecture"""
-    inputs = tf.keras.Input(shape=(img_rows, img_cols, 1))
-    
-    conv1 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(inputs)
-    conv1 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv1)
-    pool1 = MaxPooling2D(pool_size=(2, 2))(conv1)
-    
-    conv2 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool1)
-    conv2 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv2)
-    pool2 = MaxPooling2D(pool_size=(2, 2))(conv2)
-    
-    conv3 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool2)
-    conv3 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv3)
-    pool3 = MaxPooling2D(pool_size=(2, 2))(conv3)
-    
-    conv4 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool3)
-    conv4 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv4)
-    drop4 = Dropout(0.5)(conv4)
-    pool4 = MaxPooling2D(pool_size=(1, 1))(drop4)
-    
-    conv5 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool4)
-    conv5 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv5)
-    drop5 = Dropout(0.5)(conv5)
-    
-    up6 = Conv2D(64, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(1,1))(drop5))
-    merge6 = concatenate([drop4, up6], axis=3)
-    conv6 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge6)
-    conv6 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv6)
-    
-    up7 = Conv2D(32, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(2,2))(conv6))
-    merge7 = concatenate([conv3, up7], axis=3)
-    conv7 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge7)
-    conv7 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv7)
-    
-    up8 = Conv2D(16, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(2,2))(conv7))
-    merge8 = concatenate([conv2, up8], axis=3)
-    conv8 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge8)
-    conv8 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv8)
-    
-    up9 = Conv2D(8, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(2,2))(conv8))
-    merge9 = concatenate([conv1, up9], axis=3)
-    conv9 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge9)
-    conv9 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv9)
-    
-    conv10 = Conv2D(nb_classes, 1, activation='softmax')(conv9)
-    
-    model = Model(inputs=[inputs], outputs=[conv10])
-    return model
+# "float32" serves the Keras graph; float16, dynamic or int8 serve the TFLite
+# export OCT_segmentation_jaccard_<variant>.tflite written by quantize_model.py
+MODEL_VARIANT = os.environ.get("OCT_MODEL_VARIANT", "float32")
+
+# Concurrent /segment requests are coalesced into one forward pass of up to
+# OCT_MAX_BATCH images; the first request waits at most OCT_BATCH_WAIT_MS for company
+MAX_BATCH = int(os.environ.get("OCT_MAX_BATCH", "8"))
+BATCH_WAIT_MS = float(os.environ.get("OCT_BATCH_WAIT_MS", "5"))
+MAX_QUEUED_IMAGES = int(os.environ.get("OCT_MAX_QUEUED_IMAGES", "256"))
+
+# /segment_volume decodes and submits this many slices at a time, which bounds its memory
+VOLUME_BATCH = int(os.environ.get("OCT_VOLUME_BATCH", str(MAX_BATCH)))
+MAX_VOLUME_SLICES = int(os.environ.get("OCT_MAX_VOLUME_SLICES", "1024"))
+
+# ?tiled=true segments the scan at full resolution with overlapping 200x400 tiles
+TILE_OVERLAP = int(os.environ.get("OCT_TILE_OVERLAP", "64"))
+TILE_BATCH = int(os.environ.get("OCT_TILE_BATCH", str(MAX_BATCH)))
+MAX_TILED_PIXELS = int(os.environ.get("OCT_MAX_TILED_PIXELS", str(4096 * 4096)))
+# Tiled requests bypass the micro-batcher queue, so they have their own limit;
+# further ones are rejected with 503
+MAX_TILED_REQUESTS = int(os.environ.get("OCT_MAX_TILED_REQUESTS", "2"))
+tiled_in_flight = 0
 
 def load_model():
     """Load the pre-trained model"""
-    global model
+    global model, predictor
     try:
         # Define model parameters (same as used during training)
         img_rows = 200  # Update based on your dataset
         img_cols = 400  # Update based on your dataset
-        nb_classes = 11  # Number of segmentation classes
+        nb_classes = NB_CLASSES  # Number of segmentation classes
         
-        # Create model
-        model = unet(img_rows, img_cols, nb_classes)
-        
-        # Load the saved weights
-        model.load_weights('OCT_segmentation_jaccard.h5')
+        with metrics.model_loading("unet"):
+            # Create model
+            model = unet(img_rows, img_cols, nb_classes)
+            
+            # Load the saved weights
+            model.load_weights(WEIGHTS_PATH)
         
         logger.info("Weights loaded successfully!")
+        
+        # Batch dimension stays dynamic for the micro-batcher; warm up both ends of its range
+        with metrics.model_loading("unet_warmup"):
+            tflite_path = served_variant(WEIGHTS_PATH, MODEL_VARIANT)
+            if tflite_path is None:
+                predictor = CompiledPredictor(model)
+            else:
+                predictor = TFLitePredictor(tflite_path)
+                logger.info(f"Serving the {MODEL_VARIANT} variant of the U-Net")
+            predictor.warm_up(batch_sizes=sorted({1, MAX_BATCH}))
     except Exception as e:
         logger.error(f"Error loading model: {e}")
         raise
 
+def predict_labels(batch):
+    """
+    Run the U-Net on a batch and return class indices
+
+    Args:
+        batch: Normalised images, (B, 200, 400, 1) float32
+
+    Returns:
+        np.ndarray: Label maps, (B, 200, 400) uint8
+    """
+    with metrics.span("predict_batch"):
+        prediction = predictor(batch)  # Shape: (B, 200, 400, num_classes)
+        return np.argmax(prediction, axis=-1).astype(np.uint8)
+
+batcher = MicroBatcher(
+    predict_labels,
+    max_batch=MAX_BATCH,
+    max_wait_ms=BATCH_WAIT_MS,
+    max_queue=MAX_QUEUED_IMAGES
+)
+metrics.gauge_callback("inference_queue_depth", "Images waiting for a batched forward pass", lambda: batcher.queued)
+metrics.gauge_callback("inference_mean_batch_size", "Mean images per forward pass since startup", lambda: batcher.stats()["mean_batch_size"])
+metrics.gauge_callback("tiled_requests_in_flight", "Tiled full-resolution requests being segmented", lambda: tiled_in_flight)
+
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
     load_model()
+    batcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
+
+async def segment(image):
+    """
+    Segment one preprocessed image through the micro-batcher
+
+    Args:
+        image: Grayscale image, (200, 400) uint8
+
+    Returns:
+        np.ndarray: Label map, (200, 400)
+
+    Raises:
+        HTTPException: 503 if the inference queue is full
+    """
+    # Normalize values to [0,1] and add the channel dimension (200, 400, 1)
+    image = np.expand_dims(image.astype(np.float32) / 255.0, axis=-1)
+    try:
+        return await batcher.submit(image)
+    except BatcherSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# Colour of each segmentation label (0 to 11)
+LABEL_COLORS = np.array([
+    [0, 0, 0],      # Background
+    [255, 0, 0],    # Red
+    [0, 255, 0],    # Green
+    [0, 0, 255],    # Blue
+    [255, 255, 0],  # Yellow
+    [255, 0, 255],  # Magenta
+    [0, 255, 255],  # Cyan
+    [255, 153, 51], # Orange
+    [255, 100, 10], # Dark Orange
+    [255, 50, 100], # Pinkish Red
+    [50, 50, 50],   # Gray
+    [255, 255, 255] # White
+], dtype=np.uint8)
+
+# 256-entry lookup table; labels without a colour stay black
+COLOR_LUT = np.zeros((256, 3), dtype=np.uint8)
+COLOR_LUT[:len(LABEL_COLORS)] = LABEL_COLORS
+# The PNG palette holds only the real colours; unknown labels are sent to index 0 (black)
+PNG_PALETTE = LABEL_COLORS.flatten().tolist()
+PNG_INDEX_LUT = np.where(np.arange(256) < len(LABEL_COLORS), np.arange(256), 0).astype(np.uint8)
 
 def process_label(label_file):
     """
     This function maps segmentation labels to their corresponding colors.
     Labels are assumed to be from 0 to 11.
     """
-    colors = np.array([
-        [0, 0, 0],      # Background
-        [255, 0, 0],    # Red
-        [0, 255, 0],    # Green
-        [0, 0, 255],    # Blue
-        [255, 255, 0],  # Yellow
-        [255, 0, 255],  # Magenta
-        [0, 255, 255],  # Cyan
-        [255, 153, 51], # Orange
-        [255, 100, 10], # Dark Orange
-        [255, 50, 100], # Pinkish Red
-        [50, 50, 50],   # Gray
-        [255, 255, 255] # White
-    ], dtype=np.uint8)
-    
-    H, W = label_file.shape
-    img = np.zeros((H, W, 3), dtype=np.uint8)
-    
-    # Apply color mapping efficiently
-    for label in np.unique(label_file):
-        if label < len(colors):  # Ensure we don't go out of bounds
-            img[label_file == label] = colors[label]
-    
-    return img
+    # One lookup per pixel instead of a masked assignment per label
+    return COLOR_LUT[np.asarray(label_file, dtype=np.uint8)]
+
+def label_png(label_file):
+    """
+    Encode a label map as a palette-mode PNG
+
+    The PNG stores one byte per pixel plus the colour table, so it is
+    built without an RGB intermediate and is smaller than the RGB
+    rendering while looking the same.
+
+    Args:
+        label_file: Label map, (H, W)
+
+    Returns:
+        bytes: PNG file contents
+    """
+    pil_image = Image.fromarray(PNG_INDEX_LUT[np.asarray(label_file, dtype=np.uint8)], mode='P')
+    pil_image.putpalette(PNG_PALETTE)
+    img_byte_arr = io.BytesIO()
+    pil_image.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+async def segment_full_resolution(image):
+    """
+    Segment a grayscale image of any size with overlapping model-sized tiles
+
+    Tile batches run on the batcher's inference thread, interleaved with
+    /segment batches, while blending happens in the threadpool.
+
+    Args:
+        image: Grayscale image, (H, W) uint8
 
-def preprocess_image(image_file_contents):
-    """Preprocess the uploaded image file to numpy array format"""
+    Returns:
+        np.ndarray: Label map, (H, W) uint8
+
+    Raises:
+        HTTPException: 413 if the image exceeds OCT_MAX_TILED_PIXELS, 503 if
+            OCT_MAX_TILED_REQUESTS tiled requests are already running
+    """
+    global tiled_in_flight
+    if image.size > MAX_TILED_PIXELS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image has {image.size} pixels; tiled mode accepts up to {MAX_TILED_PIXELS}"
+        )
+    if tiled_in_flight >= MAX_TILED_REQUESTS:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Tiled inference is busy ({MAX_TILED_REQUESTS} requests running)"
+        )
+    tiled_in_flight += 1
     try:
-        # Open the image
-        image = Image.open(io.BytesIO(image_file_contents))
-        
-        # Convert to grayscale if necessary
-        if image.mode != 'L':
-            image = image.convert('L')
-        
-        # Resize to expected dimensions (200x400)
-        image = image.resize((400, 200))
-        
-        # Convert to numpy array
-        image_array = np.array(image)
-        
-        return image_array
-    except Exception as e:
-        logger.error(f"Error preprocessing image: {e}")
-        raise
+        return await run_in_threadpool(
+            segment_tiled,
+            image,
+            lambda tiles: batcher.schedule(predictor, tiles),
+            (200, 400),
+            TILE_OVERLAP,
+            TILE_BATCH
+        )
+    finally:
+        tiled_in_flight -= 1
+
+def accepts_multipart(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for multipart/mixed"""
+    if not accept:
+        return False
+    return any(item.split(';')[0].strip().lower() == "multipart/mixed" for item in accept.split(','))
+
+def content_disposition(disposition: str, filename: str, name: Optional[str] = None) -> str:
+    """
+    Content-Disposition value for a filename derived from an upload
+
+    The upload's name is client-controlled, so it is never put in the header
+    as-is: any client-side path is dropped, the quoted filename parameter
+    only keeps safe ASCII characters, and the exact name goes in a
+    percent-encoded filename* parameter (RFC 6266) for clients that read it.
+
+    Args:
+        disposition: "inline" or "attachment"
+        filename: Suggested filename
+        name: Optional part name, for multipart bodies
+
+    Returns:
+        str: Header value
+    """
+    filename = re.split(r'[\\/]', filename)[-1]
+    fallback = re.sub(r'[^A-Za-z0-9._ -]', '_', filename)
+    params = [disposition]
+    if name is not None:
+        params.append(f'name="{name}"')
+    params.append(f'filename="{fallback}"')
+    params.append(f"filename*=UTF-8''{quote(filename, safe='')}")
+    return '; '.join(params)
+
+def multipart_response(parts: List[Tuple[str, str, bytes]]) -> Response:
+    """
+    Build a multipart/mixed response of raw PNG parts
+
+    Args:
+        parts: (name, filename, PNG bytes) for each part, in order
+
+    Returns:
+        Response: multipart/mixed body; each part carries its name and filename in Content-Disposition
+    """
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, filename, content in parts:
+        chunks.append(
+            f"--{boundary}\r\n"
+            f"Content-Type: image/png\r\n"
+            f"Content-Disposition: {content_disposition('inline', filename, name)}\r\n"
+            f"Content-Length: {len(content)}\r\n\r\n".encode()
+        )
+        chunks.append(content)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode())
+    return Response(content=b"".join(chunks), media_type=f"multipart/mixed; boundary={boundary}")
 
 @app.post("/segment")
-async def segment_image(file: UploadFile = File(...)):
-    """Process a JPEG/PNG file and return the colored segmentation result as PNG"""
+async def segment_image(file: UploadFile = File(...), tiled: bool = False):
+    """
+    Process a JPEG/PNG file and return the colored segmentation result as PNG
+
+    With ?tiled=true the scan is segmented at its full resolution with
+    overlapping tiles instead of being resized to 400x200.
+    """
     
     # Check file type
     if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
@@ -167,39 +319,22 @@ async def segment_image(file: UploadFile = File(...)):
         contents = await file.read()
         
         # Preprocess the image
-        image = preprocess_image(contents)
+        with metrics.span("decode"):
+            image = preprocess_image(contents, resize=not tiled)
         
-        # Store original image for later
-        original_image = image.copy()
-        
-        # Normalize and reshape correctly
-        image = image / 255.0  # Normalize values to [0,1]
-        image = np.expand_dims(image, axis=-1)  # Add channel dimension (200, 400, 1)
-        image = np.expand_dims(image, axis=0)  # Add batch dimension (1, 200, 400, 1)
-        
-        # Ensure correct type
-        image = np.array(image, dtype=np.float32)
-        
-        # Debugging: Print input shape
         logger.info(f"Processing {file.filename}, input shape: {image.shape}")
         
-        # Run prediction through the model
-        prediction = model.predict(image)  # Shape: (1, 200, 400, num_classes)
-        prediction = np.argmax(prediction, axis=-1)  # Convert to class indices
-        
-        # Remove batch dimension
-        prediction = prediction.squeeze()  # Shape: (200, 400)
+        if tiled:
+            with metrics.span("predict_tiled"):
+                prediction = await segment_full_resolution(image)  # Shape: (H, W)
+        else:
+            # Run prediction through the model, batched with concurrent requests
+            with metrics.span("predict"):
+                prediction = await segment(image)  # Shape: (200, 400)
         
-        # Apply process_label function to visualize the segmentation labels
-        processed_image = process_label(prediction)
-        
-        # Convert to PIL Image for saving
-        pil_image = Image.fromarray(processed_image)
-        
-        # Save as PNG in memory
-        img_byte_arr = io.BytesIO()
-        pil_image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
+        with metrics.span("encode"):
+            # Colour the segmentation labels straight into a palette PNG
+            img_byte_arr = io.BytesIO(label_png(prediction))
         
         # Return the image
         filename_base = file.filename.rsplit('.', 1)[0]
@@ -207,17 +342,28 @@ async def segment_image(file: UploadFile = File(...)):
             img_byte_arr, 
             media_type="image/png",
             headers={
-                "Content-Disposition": f'inline; filename="{filename_base}_segmented.png"'
+                "Content-Disposition": content_disposition("inline", f"{filename_base}_segmented.png")
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/segment_both")
-async def segment_image_both(file: UploadFile = File(...)):
-    """Process a JPEG/PNG file and return both original and segmented images"""
+async def segment_image_both(file: UploadFile = File(...), accept: Optional[str] = Header(None), tiled: bool = False):
+    """
+    Process a JPEG/PNG file and return both original and segmented images
+
+    ?tiled=true works as for /segment; both images are then full resolution.
+
+    By default both PNGs come back base64-encoded in JSON. Clients sending
+    "Accept: multipart/mixed" get a multipart/mixed body with the raw PNGs
+    instead, parts named "original" and "segmented", which skips the base64
+    encode/decode and its 33% size overhead.
+    """
     
     # Check file type
     if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png')):
@@ -228,60 +374,149 @@ async def segment_image_both(file: UploadFile = File(...)):
         contents = await file.read()
         
         # Preprocess the image
-        image = preprocess_image(contents)
-        
-        # Store original image
-        original_normalized = (image / image.max() * 255).astype(np.uint8)
-        original_pil = Image.fromarray(original_normalized)
-        
-        # Convert grayscale to RGB for display
-        if original_pil.mode == 'L':
-            original_pil = original_pil.convert('RGB')
-        
-        # Save original as PNG
-        original_byte_arr = io.BytesIO()
-        original_pil.save(original_byte_arr, format='PNG')
-        original_byte_arr.seek(0)
-        original_base64 = base64.b64encode(original_byte_arr.getvalue()).decode()
-        
-        # Process segmentation
-        image = image / 255.0  # Normalize values to [0,1]
-        image = np.expand_dims(image, axis=-1)  # Add channel dimension (200, 400, 1)
-        image = np.expand_dims(image, axis=0)  # Add batch dimension (1, 200, 400, 1)
-        
-        # Ensure correct type
-        image = np.array(image, dtype=np.float32)
-        
-        # Run prediction through the model
-        prediction = model.predict(image)  # Shape: (1, 200, 400, num_classes)
-        prediction = np.argmax(prediction, axis=-1)  # Convert to class indices
-        
-        # Remove batch dimension
-        prediction = prediction.squeeze()  # Shape: (200, 400)
-        
-        # Apply process_label function to visualize the segmentation labels
-        processed_image = process_label(prediction)
-        
-        # Convert to PIL Image for saving
-        pil_image = Image.fromarray(processed_image)
-        
-        # Save as PNG in memory
-        img_byte_arr = io.BytesIO()
-        pil_image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        segmented_base64 = base64.b64encode(img_byte_arr.getvalue()).decode()
+        with metrics.span("decode"):
+            image = preprocess_image(contents, resize=not tiled)
+        
+        with metrics.span("encode_original"):
+            # Store original image
+            original_normalized = (image / image.max() * 255).astype(np.uint8)
+            original_pil = Image.fromarray(original_normalized)
+            
+            # Convert grayscale to RGB for display
+            if original_pil.mode == 'L':
+                original_pil = original_pil.convert('RGB')
+            
+            # Save original as PNG
+            original_byte_arr = io.BytesIO()
+            original_pil.save(original_byte_arr, format='PNG')
+            original_png = original_byte_arr.getvalue()
+        
+        if tiled:
+            with metrics.span("predict_tiled"):
+                prediction = await segment_full_resolution(image)  # Shape: (H, W)
+        else:
+            # Run prediction through the model, batched with concurrent requests
+            with metrics.span("predict"):
+                prediction = await segment(image)  # Shape: (200, 400)
+        
+        with metrics.span("encode"):
+            # Colour the segmentation labels straight into a palette PNG
+            segmented_png = label_png(prediction)
+        
+        if accepts_multipart(accept):
+            filename_base = file.filename.rsplit('.', 1)[0]
+            return multipart_response([
+                ("original", f"{filename_base}_original.png", original_png),
+                ("segmented", f"{filename_base}_segmented.png", segmented_png),
+            ])
         
         # Return both images as JSON
         return JSONResponse(content={
-            "original": f"data:image/png;base64,{original_base64}",
-            "segmented": f"data:image/png;base64,{segmented_base64}",
+            "original": f"data:image/png;base64,{base64.b64encode(original_png).decode()}",
+            "segmented": f"data:image/png;base64,{base64.b64encode(segmented_png).decode()}",
             "filename": file.filename
         })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def read_volume_chunk(slices, size):
+    """
+    Decode up to size slices and prepare them like preprocess_image
+
+    Returns:
+        list: (200x400 uint8 image, original row count) per slice
+    """
+    chunk = []
+    for slice_array in slices:
+        image = Image.fromarray(to_uint8(slice_array)).resize((400, 200))
+        chunk.append((np.array(image), slice_array.shape[0]))
+        if len(chunk) == size:
+            break
+    return chunk
+
+@app.post("/segment_volume")
+async def segment_volume(file: UploadFile = File(...), axial_resolution_um: Optional[float] = Form(None)):
+    """
+    Segment every B-scan of an OCT volume in one request
+
+    Accepts a multi-frame TIFF, a zip of slice images or a .npy array
+    shaped (slices, height, width). Slices are decoded OCT_VOLUME_BATCH at
+    a time and go through the same batched inference as /segment.
+
+    Returns an .npz archive with:
+        labels: (slices, 200, 400) uint8 label volume
+        thickness: (slices, classes, 400) float32 thickness of each class per
+            A-scan column, in original-image pixels, or micrometres when
+            axial_resolution_um is given
+        units: "px" or "um"
+    """
+    if not file.filename.lower().endswith(VOLUME_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=f"Volume must be one of {', '.join(VOLUME_EXTENSIONS)}")
+    
+    try:
+        try:
+            count, slices = await run_in_threadpool(open_volume, file.file, file.filename)
+        except VolumeFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if count == 0:
+            raise HTTPException(status_code=400, detail="Volume contains no slices")
+        if count > MAX_VOLUME_SLICES:
+            raise HTTPException(status_code=413, detail=f"Volume has {count} slices; the limit is {MAX_VOLUME_SLICES}")
+        
+        logger.info(f"Processing volume {file.filename} with {count} slices")
+        labels = np.zeros((count, 200, 400), dtype=np.uint8)
+        # Accumulated per chunk, so the class masks never span the whole volume
+        thickness = np.zeros((count, NB_CLASSES, 400), dtype=np.float32)
+        
+        done = 0
+        while done < count:
+            with metrics.span("volume_decode"):
+                try:
+                    chunk = await run_in_threadpool(read_volume_chunk, slices, VOLUME_BATCH)
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail=f"Could not read slice {done}: {e}")
+            if not chunk:
+                break
+            
+            with metrics.span("volume_predict"):
+                predictions = await asyncio.gather(*[segment(image) for image, _ in chunk])
+            
+            end = done + len(chunk)
+            labels[done:end] = predictions
+            # Original rows per model row, to report thickness at the scan's own resolution
+            row_scale = np.array([rows / 200 for _, rows in chunk], dtype=np.float32)
+            thickness[done:end] = layer_thickness(labels[done:end], NB_CLASSES) * row_scale[:, None, None]
+            done = end
+        
+        with metrics.span("volume_encode"):
+            units = "px"
+            if axial_resolution_um is not None:
+                thickness *= axial_resolution_um
+                units = "um"
+            
+            archive = io.BytesIO()
+            np.savez_compressed(archive, labels=labels, thickness=thickness, units=np.array(units))
+        
+        filename_base = file.filename.rsplit('.', 1)[0]
+        return Response(
+            content=archive.getvalue(),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": content_disposition("attachment", f"{filename_base}_segmented.npz"),
+                "X-Volume-Slices": str(count)
+            }
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing volume: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/original")
 async def return_original(file: UploadFile = File(...)):
     """Process a JPEG/PNG file and return the original image as PNG"""
@@ -311,7 +546,7 @@ async def return_original(file: UploadFile = File(...)):
             img_byte_arr, 
             media_type="image/png",
             headers={
-                "Content-Disposition": f'inline; filename="{filename_base}_original.png"'
+                "Content-Disposition": content_disposition("inline", f"{filename_base}_original.png")
             }
         )
         
@@ -322,7 +557,12 @@ async def return_original(file: UploadFile = File(...)):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    return {
+        "status": "healthy",
+        "model_loaded": model is not None,
+        "model_variant": MODEL_VARIANT,
+        "batching": batcher.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,169 @@
+"""
+Dynamic micro-batching for U-Net inference.
+
+Each /segment request used to call model.predict on a batch of one, paying
+Keras' fixed per-call overhead every time. MicroBatcher collects concurrent
+requests for up to max_wait_ms (or until max_batch images are waiting),
+runs one forward pass on the stacked batch in a dedicated inference thread
+and hands each caller its own label map.
+
+While a batch is running new requests keep queueing, so under load the next
+batch is formed immediately from whatever arrived in the meantime.
+"""
+import asyncio
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherSaturated(Exception):
+    """Raised when the request queue is full"""
+
+
+class MicroBatcher:
+    """Coalesces single-image inference requests into batched forward passes"""
+
+    def __init__(
+        self,
+        infer: Callable[[np.ndarray], np.ndarray],
+        max_batch: int = 8,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 256
+    ):
+        """
+        Args:
+            infer: Blocking function mapping a (B, ...) batch to B results
+            max_batch: Largest batch run in one forward pass
+            max_wait_ms: How long the first request of a batch waits for company
+            max_queue: Requests allowed to wait before new ones are rejected
+        """
+        self.infer = infer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._arrived: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.images = 0
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        if self._task is not None:
+            return
+        # One inference thread: TensorFlow already parallelises inside a forward pass
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="oct-inference")
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._arrived = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference server is shutting down"))
+        self._executor.shutdown(wait=False)
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self.queued,
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": round(self.images / self.batches, 2) if self.batches else 0.0,
+        }
+
+    async def submit(self, item: np.ndarray):
+        """
+        Queue one input and wait for its result
+
+        Raises:
+            BatcherSaturated: If max_queue requests are already waiting
+            RuntimeError: If the batcher has not been started
+        """
+        if self._task is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise BatcherSaturated(f"Inference queue is full ({self.max_queue} waiting)")
+        self._arrived.set()
+        return await future
+
+    def schedule(self, fn: Callable, *args) -> Future:
+        """
+        Run fn on the inference thread, in turn with the batched forward passes
+
+        For callers that already form their own batches (such as tiled
+        inference) and must not run the model concurrently with the batcher.
+        Safe to call from any thread.
+        """
+        if self._executor is None:
+            raise RuntimeError("Micro-batcher is not running")
+        return self._executor.submit(fn, *args)
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Wait for one request, then gather more until max_batch or the deadline"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            # Waiting on an event rather than queue.get() means a timeout never drops an item
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (client disconnects) are dropped before inference
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            try:
+                inputs = np.stack([item for item, _ in batch])
+                results = await loop.run_in_executor(self._executor, self.infer, inputs)
+            except Exception as e:
+                logger.error(f"Batched inference failed for {len(batch)} request(s): {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
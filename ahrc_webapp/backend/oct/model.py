@@ -0,0 +1,95 @@
+"""
+OCT U-Net definition and input preprocessing.
+
+Shared by the API (app.py) and quantize_model.py, so the quantization script
+can build the float model and prepare scans exactly as /segment does without
+importing the web app.
+"""
+import io
+import logging
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+from tensorflow.keras.layers import Conv2D, MaxPooling2D, UpSampling2D, concatenate, Dropout
+from tensorflow.keras.models import Model
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS_PATH = 'OCT_segmentation_jaccard.h5'
+# Number of segmentation classes the trained U-Net predicts
+NB_CLASSES = 11
+
+
+def unet(img_rows, img_cols, nb_classes):
+    """Define the U-Net architecture"""
+    inputs = tf.keras.Input(shape=(img_rows, img_cols, 1))
+    
+    conv1 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(inputs)
+    conv1 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv1)
+    pool1 = MaxPooling2D(pool_size=(2, 2))(conv1)
+    
+    conv2 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool1)
+    conv2 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv2)
+    pool2 = MaxPooling2D(pool_size=(2, 2))(conv2)
+    
+    conv3 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool2)
+    conv3 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv3)
+    pool3 = MaxPooling2D(pool_size=(2, 2))(conv3)
+    
+    conv4 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool3)
+    conv4 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv4)
+    drop4 = Dropout(0.5)(conv4)
+    pool4 = MaxPooling2D(pool_size=(1, 1))(drop4)
+    
+    conv5 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(pool4)
+    conv5 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv5)
+    drop5 = Dropout(0.5)(conv5)
+    
+    up6 = Conv2D(64, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(1,1))(drop5))
+    merge6 = concatenate([drop4, up6], axis=3)
+    conv6 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge6)
+    conv6 = Conv2D(64, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv6)
+    
+    up7 = Conv2D(32, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(2,2))(conv6))
+    merge7 = concatenate([conv3, up7], axis=3)
+    conv7 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge7)
+    conv7 = Conv2D(32, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv7)
+    
+    up8 = Conv2D(16, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(2,2))(conv7))
+    merge8 = concatenate([conv2, up8], axis=3)
+    conv8 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge8)
+    conv8 = Conv2D(16, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv8)
+    
+    up9 = Conv2D(8, 2, activation='elu', padding='same', kernel_initializer='he_normal')(UpSampling2D(size=(2,2))(conv8))
+    merge9 = concatenate([conv1, up9], axis=3)
+    conv9 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(merge9)
+    conv9 = Conv2D(8, 3, activation='elu', padding='same', kernel_initializer='he_normal')(conv9)
+    
+    conv10 = Conv2D(nb_classes, 1, activation='softmax')(conv9)
+    
+    model = Model(inputs=[inputs], outputs=[conv10])
+    return model
+
+
+def preprocess_image(image_file_contents, resize=True):
+    """Preprocess the uploaded image file to numpy array format; resize=False keeps full resolution"""
+    try:
+        # Open the image
+        image = Image.open(io.BytesIO(image_file_contents))
+        
+        # Convert to grayscale if necessary
+        if image.mode != 'L':
+            image = image.convert('L')
+        
+        # Resize to expected dimensions (200x400)
+        if resize:
+            image = image.resize((400, 200))
+        
+        # Convert to numpy array
+        image_array = np.array(image)
+        
+        return image_array
+    except Exception as e:
+        logger.error(f"Error preprocessing image: {e}")
+        raise
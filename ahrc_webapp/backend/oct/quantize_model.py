@@ -0,0 +1,88 @@
+"""
+Export and evaluate reduced-precision variants of the OCT U-Net.
+
+    python quantize_model.py export --variant int8 --calibration-dir scans/
+    python quantize_model.py compare --variant int8 --holdout-dir heldout/ --out int8.json
+
+export writes OCT_segmentation_jaccard_<variant>.tflite next to the weights.
+compare runs the float U-Net and that variant over a held-out folder of
+JPEG/PNG scans, preprocessed exactly as /segment does, and reports latency,
+speedup, pixel agreement and per-class IoU of the variant against the float
+labels. Serve a variant with OCT_MODEL_VARIANT=<variant>.
+
+Outside the Docker image, run it with backend/ on the path (PYTHONPATH=..).
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from common.inference import CompiledPredictor, TFLitePredictor
+from common.quantize import VARIANTS, compare, convert, image_files, variant_path
+from model import WEIGHTS_PATH, preprocess_image, unet
+
+
+def load_inputs(folder, limit):
+    """Scans from a folder as (1, 200, 400, 1) float32 model inputs"""
+    inputs = []
+    for path in image_files(folder, limit):
+        with open(path, 'rb') as f:
+            image = preprocess_image(f.read())
+        inputs.append((image.astype(np.float32) / 255.0)[None, ..., None])
+    if not inputs:
+        raise SystemExit(f"No images found in {folder}")
+    return inputs
+
+
+def float_model(weights):
+    model = unet(200, 400, 11)
+    model.load_weights(weights)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the OCT U-Net and compare it against the float model")
+    parser.add_argument('command', choices=('export', 'compare'))
+    parser.add_argument('--variant', choices=VARIANTS, default='int8')
+    parser.add_argument('--weights', default=WEIGHTS_PATH)
+    parser.add_argument('--calibration-dir', help="Representative scans for int8 calibration")
+    parser.add_argument('--calibration-samples', type=int, default=100)
+    parser.add_argument('--holdout-dir', help="Held-out scans for compare")
+    parser.add_argument('--holdout-samples', type=int)
+    parser.add_argument('--out', help="Where to write the compare report (JSON)")
+    args = parser.parse_args()
+
+    model = float_model(args.weights)
+    output = variant_path(args.weights, args.variant)
+
+    if args.command == 'export':
+        calibration = None
+        if args.variant == 'int8':
+            if not args.calibration_dir:
+                parser.error("int8 export needs --calibration-dir")
+            samples = load_inputs(args.calibration_dir, args.calibration_samples)
+            calibration = lambda: samples
+        with open(output, 'wb') as f:
+            f.write(convert(model, args.variant, calibration))
+        print(f"Wrote {output} ({os.path.getsize(output) / 1e6:.2f} MB)")
+        return
+
+    if not args.holdout_dir:
+        parser.error("compare needs --holdout-dir")
+    report = compare(
+        CompiledPredictor(model, batch_size=1),
+        TFLitePredictor(output),
+        load_inputs(args.holdout_dir, args.holdout_samples),
+        task="segmentation"
+    )
+    report = {"variant": args.variant, "model": output, **report}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
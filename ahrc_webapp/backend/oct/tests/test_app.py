@@ -0,0 +1,227 @@
+import asyncio
+import io
+import threading
+import zipfile
+
+import httpx
+import numpy as np
+import pytest
+from PIL import Image
+
+import app as oct_app
+from batching import MicroBatcher
+from volume import layer_thickness
+
+
+def png_upload(name="scan.png"):
+    buffer = io.BytesIO()
+    Image.fromarray(np.full((50, 80), 128, dtype=np.uint8)).save(buffer, format="PNG")
+    return {"file": (name, buffer.getvalue(), "image/png")}
+
+
+def run_with_batcher(monkeypatch, batcher, scenario):
+    """Run scenario(client) against the app with batcher standing in for the model"""
+    monkeypatch.setattr(oct_app, "batcher", batcher)
+
+    async def main():
+        batcher.start()
+        try:
+            transport = httpx.ASGITransport(app=oct_app.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+def fake_labels(batch):
+    return np.ones(batch.shape[:3], dtype=np.uint8)
+
+
+def test_segment_returns_a_label_png(monkeypatch):
+    async def scenario(client):
+        return await client.post("/segment", files=png_upload())
+
+    response = run_with_batcher(monkeypatch, MicroBatcher(fake_labels), scenario)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    labels = np.array(Image.open(io.BytesIO(response.content)))
+    assert labels.shape == (200, 400)
+    assert (labels == 1).all()
+
+
+def test_segment_returns_503_when_the_inference_queue_is_full(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked(batch):
+        started.set()
+        release.wait(5)
+        return fake_labels(batch)
+
+    async def scenario(client):
+        try:
+            # One request holds the inference thread, one fills the queue
+            running = asyncio.ensure_future(client.post("/segment", files=png_upload()))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            queued = asyncio.ensure_future(client.post("/segment", files=png_upload()))
+            while not oct_app.batcher.queued:
+                await asyncio.sleep(0.01)
+
+            rejected = await client.post("/segment", files=png_upload())
+            release.set()
+            return rejected, await running, await queued
+        finally:
+            release.set()
+
+    batcher = MicroBatcher(blocked, max_batch=1, max_wait_ms=0, max_queue=1)
+    rejected, running, queued = run_with_batcher(monkeypatch, batcher, scenario)
+
+    assert rejected.status_code == 503
+    assert "queue is full" in rejected.json()["detail"]
+    assert running.status_code == 200
+    assert queued.status_code == 200
+
+
+@pytest.mark.parametrize("filename, fallback, encoded", [
+    ("scan_01.png", "scan_01.png", "scan_01.png"),
+    ('a"; filename="evil.exe', "a__ filename__evil.exe", "a%22%3B%20filename%3D%22evil.exe"),
+    ("line\r\nSet-Cookie: x=1.png", "line__Set-Cookie_ x_1.png", "line%0D%0ASet-Cookie%3A%20x%3D1.png"),
+    ("C:\\scans\\eye.png", "eye.png", "eye.png"),
+    ("../../etc/passwd", "passwd", "passwd"),
+    ("rétine.png", "r_tine.png", "r%C3%A9tine.png"),
+])
+def test_content_disposition_never_echoes_the_raw_filename(filename, fallback, encoded):
+    header = oct_app.content_disposition("inline", filename, name="segmented")
+    assert header == f"inline; name=\"segmented\"; filename=\"{fallback}\"; filename*=UTF-8''{encoded}"
+    header.encode("latin-1")
+
+
+def test_uploaded_filename_is_escaped_in_response_headers(monkeypatch):
+    # Non-latin-1 names used to fail header encoding; ';' split the header
+    name = "eye; scan été.png"
+
+    async def scenario(client):
+        single = await client.post("/segment", files=png_upload(name))
+        both = await client.post(
+            "/segment_both", files=png_upload(name), headers={"Accept": "multipart/mixed"}
+        )
+        return single, both
+
+    single, both = run_with_batcher(monkeypatch, MicroBatcher(fake_labels), scenario)
+
+    assert single.status_code == 200
+    assert single.headers["content-disposition"] == (
+        "inline; filename=\"eye_ scan _t__segmented.png\"; "
+        "filename*=UTF-8''eye%3B%20scan%20%C3%A9t%C3%A9_segmented.png"
+    )
+    assert both.status_code == 200
+    part_headers = [
+        line.decode() for line in both.content.split(b"\r\n") if line.startswith(b"Content-Disposition")
+    ]
+    assert part_headers == [
+        "Content-Disposition: inline; name=\"original\"; filename=\"eye_ scan _t__original.png\"; "
+        "filename*=UTF-8''eye%3B%20scan%20%C3%A9t%C3%A9_original.png",
+        "Content-Disposition: inline; name=\"segmented\"; filename=\"eye_ scan _t__segmented.png\"; "
+        "filename*=UTF-8''eye%3B%20scan%20%C3%A9t%C3%A9_segmented.png",
+    ]
+
+
+def banded_labels(batch):
+    """Class r // 20 at row r: ten bands of 20 rows, class 10 never appears"""
+    rows = np.arange(batch.shape[1], dtype=np.uint8) // 20
+    return np.broadcast_to(rows[None, :, None], batch.shape[:3]).copy()
+
+
+def zip_volume(heights):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        # Natural order: slice_2 comes before slice_10
+        for index, height in zip((1, 2, 10), heights):
+            image = io.BytesIO()
+            Image.fromarray(np.full((height, 300), 20 * index, dtype=np.uint8)).save(image, format="PNG")
+            archive.writestr(f"slice_{index}.png", image.getvalue())
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("axial_resolution_um, units", [(None, "px"), (3.5, "um")])
+def test_segment_volume_returns_labels_and_thickness(monkeypatch, axial_resolution_um, units):
+    heights = (100, 200, 600)
+    monkeypatch.setattr(oct_app, "VOLUME_BATCH", 2)
+
+    async def scenario(client):
+        data = {} if axial_resolution_um is None else {"axial_resolution_um": str(axial_resolution_um)}
+        return await client.post(
+            "/segment_volume",
+            files={"file": ("eye.zip", zip_volume(heights), "application/zip")},
+            data=data,
+        )
+
+    response = run_with_batcher(monkeypatch, MicroBatcher(banded_labels), scenario)
+
+    assert response.status_code == 200
+    assert response.headers["x-volume-slices"] == "3"
+    result = np.load(io.BytesIO(response.content))
+    assert str(result["units"]) == units
+
+    labels = result["labels"]
+    assert labels.shape == (3, 200, 400)
+    np.testing.assert_array_equal(labels, banded_labels(np.zeros((3, 200, 400, 1))))
+
+    thickness = result["thickness"]
+    assert thickness.shape == (3, oct_app.NB_CLASSES, 400)
+    scale = 1.0 if axial_resolution_um is None else axial_resolution_um
+    for index, height in enumerate(heights):
+        # 20 model rows per band, each worth height / 200 rows of the original slice
+        np.testing.assert_allclose(thickness[index, :10], 20 * height / 200 * scale)
+        np.testing.assert_array_equal(thickness[index, 10], 0)
+
+
+def test_layer_thickness_counts_each_class_per_column():
+    labels = np.array([[[0, 1], [1, 1], [2, 0]]], dtype=np.uint8)
+    np.testing.assert_array_equal(
+        layer_thickness(labels, 4),
+        [[[1, 1], [1, 2], [1, 0], [0, 0]]]
+    )
+
+
+def test_tiled_requests_beyond_the_limit_get_503(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked_predictor(tiles):
+        started.set()
+        release.wait(5)
+        probabilities = np.zeros(tiles.shape[:3] + (oct_app.NB_CLASSES,), dtype=np.float32)
+        probabilities[..., 1] = 1
+        return probabilities
+
+    monkeypatch.setattr(oct_app, "predictor", blocked_predictor)
+    monkeypatch.setattr(oct_app, "MAX_TILED_REQUESTS", 1)
+
+    async def scenario(client):
+        try:
+            running = asyncio.ensure_future(client.post("/segment?tiled=true", files=png_upload()))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            rejected = await client.post("/segment?tiled=true", files=png_upload())
+            # Untiled requests go through the micro-batcher and are unaffected
+            untiled = asyncio.ensure_future(client.post("/segment", files=png_upload()))
+            release.set()
+            return rejected, await running, await untiled
+        finally:
+            release.set()
+
+    rejected, running, untiled = run_with_batcher(monkeypatch, MicroBatcher(fake_labels), scenario)
+
+    assert rejected.status_code == 503
+    assert "Tiled inference is busy" in rejected.json()["detail"]
+    assert running.status_code == 200
+    labels = np.array(Image.open(io.BytesIO(running.content)))
+    assert labels.shape == (50, 80)
+    assert (labels == 1).all()
+    assert untiled.status_code == 200
+    assert oct_app.tiled_in_flight == 0
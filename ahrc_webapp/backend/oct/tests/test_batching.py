@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from batching import BatcherSaturated, MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_requests_share_one_forward_pass():
+    batch_sizes = []
+
+    def infer(batch):
+        batch_sizes.append(len(batch))
+        return batch * 2
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch=8, max_wait_ms=200)
+        batcher.start()
+        try:
+            items = [np.full((2, 3), i, dtype=np.float32) for i in range(8)]
+            results = await asyncio.gather(*(batcher.submit(item) for item in items))
+        finally:
+            await batcher.stop()
+        return items, results, batcher.stats()
+
+    items, results, stats = run(scenario())
+    assert batch_sizes == [8]
+    for item, result in zip(items, results):
+        np.testing.assert_array_equal(result, item * 2)
+    assert stats["batches"] == 1
+    assert stats["images"] == 8
+
+
+def test_batches_are_capped_at_max_batch():
+    batch_sizes = []
+
+    def infer(batch):
+        batch_sizes.append(len(batch))
+        return batch
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch=3, max_wait_ms=50)
+        batcher.start()
+        try:
+            await asyncio.gather(*(batcher.submit(np.zeros(1)) for _ in range(7)))
+        finally:
+            await batcher.stop()
+
+    run(scenario())
+    assert sum(batch_sizes) == 7
+    assert max(batch_sizes) <= 3
+
+
+def test_full_queue_rejects_new_requests():
+    started = threading.Event()
+    release = threading.Event()
+
+    def infer(batch):
+        started.set()
+        release.wait(5)
+        return batch
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch=1, max_wait_ms=0, max_queue=2)
+        batcher.start()
+        try:
+            running = asyncio.ensure_future(batcher.submit(np.zeros(1)))
+            # Hold the inference thread so later requests stay queued
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            waiting = [asyncio.ensure_future(batcher.submit(np.zeros(1))) for _ in range(2)]
+            await asyncio.sleep(0)
+            assert batcher.queued == 2
+            with pytest.raises(BatcherSaturated):
+                await batcher.submit(np.zeros(1))
+            release.set()
+            await asyncio.gather(running, *waiting)
+        finally:
+            release.set()
+            await batcher.stop()
+
+    run(scenario())
+
+
+def test_cancelled_requests_are_dropped_before_inference():
+    seen = []
+    release = threading.Event()
+
+    def infer(batch):
+        seen.append(batch[:, 0].tolist())
+        release.wait(5)
+        return batch
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch=4, max_wait_ms=0)
+        batcher.start()
+        try:
+            first = asyncio.ensure_future(batcher.submit(np.array([0.0])))
+            while not seen:
+                await asyncio.sleep(0.01)
+            # Queued behind the running batch; one of them gives up
+            kept = asyncio.ensure_future(batcher.submit(np.array([1.0])))
+            cancelled = asyncio.ensure_future(batcher.submit(np.array([2.0])))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            release.set()
+            results = await asyncio.gather(first, kept)
+        finally:
+            release.set()
+            await batcher.stop()
+        return results, cancelled
+
+    results, cancelled = run(scenario())
+    assert seen == [[0.0], [1.0]]
+    assert [float(r[0]) for r in results] == [0.0, 1.0]
+    assert cancelled.cancelled()
+
+
+def test_stop_fails_requests_still_queued():
+    started = threading.Event()
+    release = threading.Event()
+
+    def infer(batch):
+        started.set()
+        release.wait(5)
+        return batch
+
+    async def scenario():
+        batcher = MicroBatcher(infer, max_batch=1, max_wait_ms=0)
+        batcher.start()
+        running = asyncio.ensure_future(batcher.submit(np.zeros(1)))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(batcher.submit(np.zeros(1)))
+        await asyncio.sleep(0)
+        await batcher.stop()
+        release.set()
+        with pytest.raises(RuntimeError):
+            await queued
+        running.cancel()
+
+    run(scenario())
+
+
+def test_submit_before_start_is_an_error():
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await MicroBatcher(lambda batch: batch).submit(np.zeros(1))
+
+    run(scenario())
@@ -0,0 +1,68 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from tiling import blend_window, segment_tiled, tile_starts
+
+TILE = (20, 40)
+CLASSES = 4
+
+
+def pointwise_probabilities(pixels):
+    """A 'model' whose output at each pixel depends only on that pixel"""
+    centres = np.linspace(0, 1, CLASSES, dtype=np.float32)
+    logits = -((pixels - centres) ** 2) * 50
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def pointwise_labels(image):
+    return np.argmax(pointwise_probabilities(image[..., None] / np.float32(255)), axis=-1).astype(np.uint8)
+
+
+def make_infer(calls):
+    def infer(batch):
+        assert batch.shape[1:] == TILE + (1,)
+        assert batch.dtype == np.float32
+        assert 0 <= batch.min() and batch.max() <= 1
+        calls.append(len(batch))
+        future = Future()
+        future.set_result(pointwise_probabilities(batch))
+        return future
+    return infer
+
+
+@pytest.mark.parametrize("shape", [
+    (7, 13),      # smaller than a tile: edge-padded
+    TILE,         # exactly one tile
+    (20, 95),     # one strip, tile width does not divide the width
+    (57, 40),     # one column of tiles, several strips
+    (63, 101),    # neither dimension a multiple of the tile
+])
+@pytest.mark.parametrize("batch_size", [1, 3, 64])
+def test_tiled_labels_match_a_pointwise_model(shape, batch_size):
+    image = np.random.default_rng(sum(shape)).integers(0, 256, shape, dtype=np.uint8)
+    calls = []
+
+    labels = segment_tiled(image, make_infer(calls), TILE, overlap=8, batch_size=batch_size)
+
+    assert labels.shape == shape
+    assert labels.dtype == np.uint8
+    np.testing.assert_array_equal(labels, pointwise_labels(image))
+    assert max(calls) <= batch_size
+
+
+def test_tiles_cover_the_image_with_the_requested_overlap():
+    starts = tile_starts(101, 40, 8)
+    assert starts[0] == 0
+    assert starts[-1] == 101 - 40
+    assert all(b - a <= 40 - 8 for a, b in zip(starts, starts[1:]))
+    assert tile_starts(30, 40, 8) == [0]
+
+
+def test_blend_window_is_positive_everywhere():
+    window = blend_window(*TILE, overlap=8)
+    assert window.shape == TILE
+    assert (window > 0).all()
+    assert window.max() == 1
@@ -0,0 +1,22 @@
+import pytest
+
+from common.quantize import served_variant
+
+
+def test_float32_serves_the_keras_model(tmp_path):
+    assert served_variant(str(tmp_path / "weights.h5"), "float32") is None
+
+
+def test_exported_variant_is_served(tmp_path):
+    (tmp_path / "weights_int8.tflite").write_bytes(b"")
+    assert served_variant(str(tmp_path / "weights.h5"), "int8") == str(tmp_path / "weights_int8.tflite")
+
+
+def test_missing_export_fails_loudly(tmp_path):
+    with pytest.raises(FileNotFoundError, match="quantize_model.py"):
+        served_variant(str(tmp_path / "weights.h5"), "dynamic")
+
+
+def test_unknown_variant_fails_loudly(tmp_path):
+    with pytest.raises(ValueError, match="int4"):
+        served_variant(str(tmp_path / "weights.h5"), "int4")
@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pytest
+
+from volume import VolumeFormatError, open_volume
+
+
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def test_npy_volume_is_read_slice_by_slice():
+    volume = np.arange(3 * 4 * 5, dtype=np.uint16).reshape(3, 4, 5)
+
+    count, slices = open_volume(io.BytesIO(npy_bytes(volume)), "scan.NPY")
+
+    assert count == 3
+    read = list(slices)
+    assert len(read) == 3
+    for expected, actual in zip(volume, read):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_npy_volume_with_channel_axis_is_accepted():
+    volume = np.zeros((2, 4, 5, 1), dtype=np.float32)
+    count, slices = open_volume(io.BytesIO(npy_bytes(volume)), "scan.npy")
+    assert count == 2
+    assert [s.shape for s in slices] == [(4, 5), (4, 5)]
+
+
+def test_truncated_npy_fails_at_the_missing_slice():
+    volume = np.ones((4, 8, 8), dtype=np.uint8)
+    data = npy_bytes(volume)
+    # Drop the last slice and a half
+    truncated = data[:len(data) - 8 * 8 - 32]
+
+    count, slices = open_volume(io.BytesIO(truncated), "scan.npy")
+    assert count == 4
+    assert next(slices).shape == (8, 8)
+    assert next(slices).shape == (8, 8)
+    with pytest.raises(VolumeFormatError, match="truncated at slice 2"):
+        next(slices)
+
+
+def test_npy_header_only_fails_on_first_slice():
+    data = npy_bytes(np.ones((2, 3, 3), dtype=np.uint8))
+    count, slices = open_volume(io.BytesIO(data[:-18]), "scan.npy")
+    assert count == 2
+    with pytest.raises(VolumeFormatError, match="truncated at slice 0"):
+        list(slices)
+
+
+@pytest.mark.parametrize("array, message", [
+    (np.zeros((4, 5), dtype=np.uint8), "slices, height, width"),
+    (np.zeros((2, 4, 5), dtype=np.complex64), "Unsupported NumPy dtype"),
+    (np.asfortranarray(np.zeros((2, 4, 5), dtype=np.uint8)), "C order"),
+])
+def test_unsupported_npy_volumes_are_rejected(array, message):
+    with pytest.raises(VolumeFormatError, match=message):
+        open_volume(io.BytesIO(npy_bytes(array)), "scan.npy")
+
+
+def test_corrupt_npy_header_is_a_format_error():
+    with pytest.raises(VolumeFormatError):
+        open_volume(io.BytesIO(b"not a numpy file"), "scan.npy")
+
+
+def test_unknown_extension_is_rejected():
+    with pytest.raises(VolumeFormatError):
+        open_volume(io.BytesIO(b""), "scan.dcm")
@@ -0,0 +1,119 @@
+"""
+Sliding-window inference for full-resolution OCT scans.
+
+The U-Net takes 200x400 inputs, and /segment normally shrinks the whole
+scan to that size. segment_tiled() instead covers the full-resolution scan
+with overlapping 200x400 tiles, runs them through the model in batches and
+blends the overlapping class probabilities with a window that fades towards
+each tile's edges, which hides tile seams.
+
+Tiles are visited in row-major order. Once every tile of a strip has been
+blended, the rows above the next strip are final: they are turned into
+labels and the accumulator slides down. The probability accumulator is
+therefore one strip (tile height x image width x classes) whatever the
+image height, and at most two tile batches exist at a time: one running in
+the model while the previous one is blended.
+"""
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+
+def tile_starts(length: int, tile: int, overlap: int) -> List[int]:
+    """
+    Start offsets of tiles covering [0, length) with at least overlap pixels of overlap
+
+    The last tile is aligned to the end, so it may overlap its neighbour by more.
+    """
+    if length <= tile:
+        return [0]
+    stride = max(tile - overlap, 1)
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def blend_window(height: int, width: int, overlap: int) -> np.ndarray:
+    """
+    Tile weights rising linearly over the overlap at every edge
+
+    Weights stay strictly positive so pixels covered by a single tile
+    (at the image border) are still classified.
+    """
+    def ramp(n):
+        weights = np.ones(n, dtype=np.float32)
+        k = min(overlap, n // 2)
+        if k > 0:
+            rise = np.linspace(0, 1, k + 2, dtype=np.float32)[1:-1]
+            weights[:k] = rise
+            weights[n - k:] = rise[::-1]
+        return weights
+
+    return np.outer(ramp(height), ramp(width))
+
+
+def segment_tiled(
+    image: np.ndarray,
+    infer: Callable,
+    tile_shape: Tuple[int, int],
+    overlap: int,
+    batch_size: int
+) -> np.ndarray:
+    """
+    Segment an image of any size with overlapping tiles
+
+    Args:
+        image: Grayscale image, (H, W) uint8; tiles are scaled to [0, 1]
+            float32 as each batch is cut, so no float copy of the whole
+            image is made
+        infer: Takes a (B, tile_h, tile_w, 1) batch and returns a future whose
+            result() is the (B, tile_h, tile_w, classes) probabilities
+        tile_shape: Model input size (tile_h, tile_w)
+        overlap: Minimum overlap between neighbouring tiles in pixels
+        batch_size: Tiles per forward pass
+
+    Returns:
+        np.ndarray: Label map, (H, W) uint8
+    """
+    tile_h, tile_w = tile_shape
+    height, width = image.shape
+    # Scans smaller than a tile are edge-padded up to it; larger ones are used in place
+    if height < tile_h or width < tile_w:
+        padded = np.pad(image, ((0, max(0, tile_h - height)), (0, max(0, tile_w - width))), mode='edge')
+    else:
+        padded = image
+    padded_h, padded_w = padded.shape
+
+    tiles = [(y, x) for y in tile_starts(padded_h, tile_h, overlap) for x in tile_starts(padded_w, tile_w, overlap)]
+    batches = [tiles[i:i + batch_size] for i in range(0, len(tiles), batch_size)]
+    window = blend_window(tile_h, tile_w, overlap)[..., None]
+
+    def submit(batch):
+        tiles = np.stack([padded[y:y + tile_h, x:x + tile_w] for y, x in batch])
+        return infer((tiles.astype(np.float32) / 255.0)[..., None])
+
+    labels = np.empty((padded_h, padded_w), dtype=np.uint8)
+    # Weighted probabilities for rows [strip, strip + tile_h); argmax needs no normalisation
+    accumulator = None
+    strip = 0
+
+    pending = submit(batches[0])
+    for index, batch in enumerate(batches):
+        probabilities = pending.result()
+        # Keep the model busy with the next batch while this one is blended
+        pending = submit(batches[index + 1]) if index + 1 < len(batches) else None
+        if accumulator is None:
+            accumulator = np.zeros((tile_h, padded_w, probabilities.shape[-1]), dtype=np.float32)
+
+        for (y, x), tile_probabilities in zip(batch, probabilities):
+            if y != strip:
+                # Every tile touching rows [strip, y) has been blended
+                step = y - strip
+                labels[strip:y] = np.argmax(accumulator[:step], axis=-1)
+                accumulator[:tile_h - step] = accumulator[step:]
+                accumulator[tile_h - step:] = 0
+                strip = y
+            accumulator[:, x:x + tile_w] += tile_probabilities * window
+
+    labels[strip:strip + tile_h] = np.argmax(accumulator, axis=-1)
+    return labels[:height, :width]
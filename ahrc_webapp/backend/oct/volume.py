@@ -0,0 +1,162 @@
+"""
+Readers for whole OCT volumes (stacks of B-scans).
+
+A volume can be uploaded as a multi-frame TIFF, a zip of slice images or a
+NumPy .npy array shaped (slices, height, width) or (slices, height, width, 1).
+open_volume() reports the slice count up front and returns an iterator that
+decodes one slice at a time, so a volume is never held in memory as
+full-resolution frames; only the 200x400 label volume and its per-column
+layer thickness are accumulated.
+"""
+import io
+import re
+import zipfile
+from typing import BinaryIO, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+VOLUME_EXTENSIONS = ('.tif', '.tiff', '.zip', '.npy')
+SLICE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+
+
+class VolumeFormatError(ValueError):
+    """Raised when an uploaded volume cannot be read"""
+
+
+def _natural_key(name: str):
+    """Sort slice_2.png before slice_10.png"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def _image_to_array(image: Image.Image) -> np.ndarray:
+    """Grayscale array of a PIL image; 16-bit and float frames keep their range"""
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I', 'F'):
+        return np.array(image)
+    if image.mode != 'L':
+        image = image.convert('L')
+    return np.array(image)
+
+
+def _tiff_slices(fileobj: BinaryIO) -> Tuple[int, Iterator[np.ndarray]]:
+    image = Image.open(fileobj)
+    count = getattr(image, 'n_frames', 1)
+
+    def slices():
+        for index in range(count):
+            image.seek(index)
+            yield _image_to_array(image)
+
+    return count, slices()
+
+
+def _zip_slices(fileobj: BinaryIO) -> Tuple[int, Iterator[np.ndarray]]:
+    archive = zipfile.ZipFile(fileobj)
+    names = sorted(
+        (
+            name for name in archive.namelist()
+            if name.lower().endswith(SLICE_EXTENSIONS)
+            and not name.startswith('__MACOSX/')
+            and not name.rsplit('/', 1)[-1].startswith('.')
+        ),
+        key=_natural_key
+    )
+
+    def slices():
+        for name in names:
+            with Image.open(io.BytesIO(archive.read(name))) as image:
+                yield _image_to_array(image)
+
+    return len(names), slices()
+
+
+def _npy_slices(fileobj: BinaryIO) -> Tuple[int, Iterator[np.ndarray]]:
+    version = np.lib.format.read_magic(fileobj)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fileobj)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fileobj)
+
+    if len(shape) == 4 and shape[3] == 1:
+        shape = shape[:3]
+    if len(shape) != 3:
+        raise VolumeFormatError(f"NumPy volume must be (slices, height, width), got shape {shape}")
+    if fortran_order:
+        raise VolumeFormatError("NumPy volume must be saved in C order")
+    if dtype.hasobject or dtype.kind not in 'uif':
+        raise VolumeFormatError(f"Unsupported NumPy dtype {dtype}")
+
+    count, height, width = shape
+    frame_bytes = height * width * dtype.itemsize
+
+    def slices():
+        # Slices are contiguous in a C-order array, so read them one at a time
+        for index in range(count):
+            buffer = fileobj.read(frame_bytes)
+            if len(buffer) != frame_bytes:
+                raise VolumeFormatError(f"NumPy volume is truncated at slice {index}")
+            yield np.frombuffer(buffer, dtype=dtype).reshape(height, width)
+
+    return count, slices()
+
+
+def open_volume(fileobj: BinaryIO, filename: str) -> Tuple[int, Iterator[np.ndarray]]:
+    """
+    Open an uploaded OCT volume
+
+    Args:
+        fileobj: Seekable file object holding the upload
+        filename: Upload filename; its extension selects the reader
+
+    Returns:
+        tuple: (slice count, iterator of 2D grayscale slices)
+
+    Raises:
+        VolumeFormatError: If the file type is unsupported or the header is unreadable
+    """
+    name = filename.lower()
+    try:
+        if name.endswith(('.tif', '.tiff')):
+            return _tiff_slices(fileobj)
+        if name.endswith('.zip'):
+            return _zip_slices(fileobj)
+        if name.endswith('.npy'):
+            return _npy_slices(fileobj)
+    except VolumeFormatError:
+        raise
+    except Exception as e:
+        raise VolumeFormatError(f"Could not read volume: {e}")
+    raise VolumeFormatError(f"Volume must be one of {', '.join(VOLUME_EXTENSIONS)}")
+
+
+def to_uint8(slice_array: np.ndarray) -> np.ndarray:
+    """
+    Scale a slice to uint8 the way /segment sees 8-bit images
+
+    uint8 slices are used as-is; anything else is min-max scaled per slice.
+    """
+    if slice_array.dtype == np.uint8:
+        return slice_array
+    values = slice_array.astype(np.float32)
+    low, high = float(values.min()), float(values.max())
+    if high <= low:
+        return np.zeros(values.shape, dtype=np.uint8)
+    return ((values - low) * (255.0 / (high - low))).astype(np.uint8)
+
+
+def layer_thickness(labels: np.ndarray, n_classes: int) -> np.ndarray:
+    """
+    Per-column thickness of every segmentation class
+
+    Args:
+        labels: Label maps, (slices, rows, columns)
+        n_classes: Number of classes the model predicts
+
+    Returns:
+        np.ndarray: Pixels of each class in each A-scan column, (slices, n_classes, columns)
+    """
+    # One class at a time: a single mask the size of labels instead of one per class
+    thickness = np.empty((labels.shape[0], n_classes, labels.shape[2]), dtype=np.int32)
+    for c in range(n_classes):
+        thickness[:, c] = (labels == c).sum(axis=1, dtype=np.int32)
+    return thickness